@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import AccessToken, Annotation, Lamning, LamningWikipediaLink, Comment, Feedback, CustomTag, KMRLamningType, UserDetails
+from .models import AccessToken, Annotation, Lamning, LamningWikipediaLink, Comment, Feedback, CustomTag, KMRLamningType, KMRRecord, LNumberResolution, UserDetails
 
 class LamningAdmin(admin.ModelAdmin):
     list_display = ['title', 'user', 'created_time', 'changed_time']
@@ -28,6 +28,15 @@ class KMRLamningTypeAdmin(admin.ModelAdmin):
     list_filter = ['raa_id']
     search_fields = ['name', 'description']
 
+class KMRRecordAdmin(admin.ModelAdmin):
+    list_display = ['title', 'uuid', 'author', 'fetched_time']
+    list_filter = ['fetched_time']
+    search_fields = ['title', 'uuid']
+
+class LNumberResolutionAdmin(admin.ModelAdmin):
+    list_display = ['l_number', 'uuid', 'resolved_time']
+    search_fields = ['l_number', 'uuid']
+
 class CustomTagAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'created_time']
     list_filter = ['created_time']
@@ -55,5 +64,7 @@ admin.site.register(Comment, CommentAdmin)
 admin.site.register(Feedback, FeedbackAdmin)
 admin.site.register(CustomTag, CustomTagAdmin)
 admin.site.register(KMRLamningType, KMRLamningTypeAdmin)
+admin.site.register(KMRRecord, KMRRecordAdmin)
+admin.site.register(LNumberResolution, LNumberResolutionAdmin)
 admin.site.register(AccessToken, AccessTokenAdmin)
 admin.site.register(UserDetails, UserDetailsAdmin)
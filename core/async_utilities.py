@@ -0,0 +1,254 @@
+"""
+Async counterparts of the upstream helpers in core.utilities, used by the views in core.async_views.
+
+They share cache keys, formatting and error handling with the sync helpers so that both kinds of views can be
+served side by side and fill the same cache.
+"""
+
+import asyncio
+import weakref
+from uuid import uuid4
+
+import requests
+import sentry_sdk as sentry
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from . import kmr_index, upstream
+from .utilities import (COALESCE_TIMEOUT, FORNSOK_SEARCH_URL,
+                        REFRESH_LOCK_TIMEOUT, SOCH_API_URL, SOCH_PAGE_SIZE,
+                        UpstreamTimeoutExeption, cache_is_shared,
+                        cached_upstream_entry, coalesce_lock_key,
+                        coalesce_poll_intervals, coalesce_result_key,
+                        format_raa_lamning, format_soch_search_result,
+                        fornsok_search_query, is_possible_raa_id, is_stale,
+                        lamning_id_from_search, raa_lamning_url,
+                        refresh_lock_key, soch_search_params, soch_type_query,
+                        store_l_number_resolutions,
+                        stored_l_number_resolution)
+
+# calls in flight per event loop, futures can only be awaited on the loop they belong to
+_in_flight = weakref.WeakKeyDictionary()
+
+# references to background refreshes, the event loop only keeps weak references to tasks
+_background_tasks = set()
+
+
+def _run_in_background(coroutine):
+    task = asyncio.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _acoalesce_across_workers(key, fetch):
+    """Async version of utilities._coalesce_across_workers(), uses the same cache keys."""
+    if not cache_is_shared():
+        return await fetch()
+
+    lock_key = coalesce_lock_key(key)
+    token = uuid4().hex
+    if await cache.aadd(lock_key, token, timeout=COALESCE_TIMEOUT):
+        try:
+            value = await fetch()
+            await cache.aset(coalesce_result_key(key, token), {"value": value}, timeout=COALESCE_TIMEOUT)
+            return value
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    leader = await cache.aget(lock_key)
+    if leader is not None:
+        result_key = coalesce_result_key(key, leader)
+        for interval in coalesce_poll_intervals():
+            await asyncio.sleep(interval)
+            result = await cache.aget(result_key)
+            if result is not None:
+                return result["value"]
+            if await cache.aget(lock_key) != leader:
+                result = await cache.aget(result_key)
+                if result is not None:
+                    return result["value"]
+                break
+
+    return await fetch()
+
+
+async def acoalesced_call(key, fetch):
+    """Async version of utilities.coalesced_call(), fetch is a coroutine function."""
+    loop = asyncio.get_running_loop()
+    in_flight = _in_flight.setdefault(loop, dict())
+    future = in_flight.get(key)
+    if future is not None:
+        # shielded so that a cancelled follower does not cancel the call of the others
+        return await asyncio.shield(future)
+
+    future = in_flight[key] = loop.create_future()
+    try:
+        value = await _acoalesce_across_workers(key, fetch)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        # retrieve the exception so that it is not logged when nobody else is waiting
+        future.exception()
+        raise
+    finally:
+        del in_flight[key]
+        if not future.done():
+            # the leader was cancelled
+            future.cancel()
+
+
+async def _astore_cached_upstream_value(key, value, ttl, stale_ttl, not_found_ttl):
+    stored = cached_upstream_entry(value, ttl, stale_ttl, not_found_ttl)
+    if stored:
+        await cache.aset(key, stored["entry"], timeout=stored["timeout"])
+
+
+async def _arefresh_cached_upstream_value(key, fetch, ttl, stale_ttl, not_found_ttl):
+    try:
+        await _astore_cached_upstream_value(key, await fetch(), ttl, stale_ttl, not_found_ttl)
+    except Exception as e:
+        sentry.capture_exception(e)
+    finally:
+        await cache.adelete(refresh_lock_key(key))
+
+
+async def acached_upstream_call(key, fetch, ttl, stale_ttl=0, not_found_ttl=0):
+    """Async version of utilities.cached_upstream_call(), stale values are refreshed in a background task."""
+    entry = await cache.aget(key)
+    if entry is None:
+        value = await acoalesced_call(key, fetch)
+        await _astore_cached_upstream_value(key, value, ttl, stale_ttl, not_found_ttl)
+        return value
+
+    if is_stale(entry) and await cache.aadd(refresh_lock_key(key), True, timeout=REFRESH_LOCK_TIMEOUT):
+        _run_in_background(_arefresh_cached_upstream_value(key, fetch, ttl, stale_ttl, not_found_ttl))
+
+    return entry["value"]
+
+
+async def aprefetch_upstream_call(key, fetch, ttl, stale_ttl=0, not_found_ttl=0):
+    """Async version of utilities.prefetch_upstream_call()."""
+    if await cache.aget(key) is None and await cache.aadd(refresh_lock_key(key), True, timeout=REFRESH_LOCK_TIMEOUT):
+        _run_in_background(_arefresh_cached_upstream_value(key, fetch, ttl, stale_ttl, not_found_ttl))
+
+
+async def ais_raa_id(identifier: str):
+    """Async version of utilities.is_raa_id()."""
+    if not is_possible_raa_id(identifier):
+        return False
+
+    index = kmr_index.get_index()
+    if index is not None and identifier in index:
+        return True
+
+    try:
+        r = await upstream.ahead("kulturarvsdata", f"https://kulturarvsdata.se/raa/lamning/{identifier}")
+    except requests.exceptions.RequestException:
+        return False
+    return r.status_code == 200
+
+
+async def aresolve_l_number(l_number: str):
+    """Async version of utilities.resolve_l_number()."""
+    r = await upstream.apost("raa", FORNSOK_SEARCH_URL, json=fornsok_search_query(l_number))
+    return lamning_id_from_search(r.json())
+
+
+async def acached_resolve_l_number(l_number: str):
+    """Async version of utilities.cached_resolve_l_number()."""
+    stored, uuid = await sync_to_async(stored_l_number_resolution)(l_number)
+    if stored:
+        return uuid
+
+    uuid = await acoalesced_call(f"l-number:{l_number}", lambda: aresolve_l_number(l_number))
+    await sync_to_async(store_l_number_resolutions)({l_number: uuid})
+    return uuid
+
+
+async def afetch_raa_lamning(uuid):
+    """Async version of utilities.fetch_raa_lamning()."""
+    if not is_possible_raa_id(uuid):
+        return False
+
+    try:
+        r = await upstream.aget("raa", raa_lamning_url(uuid))
+        raa_data = r.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise Exception("RAA services are not available.") from e
+
+    if r.status_code == 404:
+        return False
+
+    return format_raa_lamning(raa_data)
+
+
+async def afetch_raa_lamning_for_view(uuid):
+    """Async version of utilities.fetch_raa_lamning_for_view()."""
+    # avoid a circular import, models depends on core.utilities
+    from .models import KMRRecord
+
+    if not is_possible_raa_id(uuid):
+        raise Http404("Lamningen finns inte.")
+
+    record = await KMRRecord.objects.filter(uuid=uuid).afirst()
+    if record:
+        return record.as_raa_lamning
+
+    try:
+        lamning = await acached_upstream_call(
+            f"raa-lamning:{uuid}",
+            lambda: afetch_raa_lamning(uuid),
+            ttl=settings.RAA_LAMNING_CACHE_TTL,
+            stale_ttl=settings.RAA_LAMNING_CACHE_STALE_TTL,
+            not_found_ttl=settings.RAA_LAMNING_NOT_FOUND_CACHE_TTL,
+        )
+    except Exception as e:
+        raise UpstreamTimeoutExeption() from e
+
+    if not lamning:
+        raise Http404("Lamningen finns inte.")
+
+    return lamning
+
+
+async def aget_soch_search_result(query, offset=0, limit=100):
+    """Async version of utilities.get_soch_search_result()."""
+    try:
+        response = await upstream.aget(
+            "kulturarvsdata",
+            SOCH_API_URL,
+            params=soch_search_params(query, offset, limit),
+            headers={"Accept": "application/json"},
+        )
+        data = response.json()
+    except ValueError as e:
+        raise Exception("RAA services are not available.") from e
+
+    if response.status_code != 200:
+        raise Exception("RAA services are not available.")
+
+    return format_soch_search_result(data)
+
+
+def _asoch_type_page_call(type_id: int, type_name: str, page: int) -> dict:
+    """Same as utilities._soch_type_page_call() with an async fetch."""
+    return {
+        "key": f"soch-type:{type_id}:{page}",
+        "fetch": lambda: aget_soch_search_result(
+            soch_type_query(type_name), offset=(page - 1) * SOCH_PAGE_SIZE, limit=SOCH_PAGE_SIZE
+        ),
+        "ttl": settings.SOCH_PAGE_CACHE_TTL,
+        "stale_ttl": settings.SOCH_PAGE_CACHE_STALE_TTL,
+    }
+
+
+async def acached_soch_type_page(type_id: int, type_name: str, page: int) -> dict:
+    return await acached_upstream_call(**_asoch_type_page_call(type_id, type_name, page))
+
+
+async def aprefetch_soch_type_page(type_id: int, type_name: str, page: int):
+    await aprefetch_upstream_call(**_asoch_type_page_call(type_id, type_name, page))
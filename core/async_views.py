@@ -0,0 +1,151 @@
+"""
+Async versions of the views that mostly wait for upstream services, served instead of their sync counterparts in
+core.views when ASYNC_UPSTREAM_VIEWS is enabled and FornPunkt is deployed with fornfind/asgi.py.
+
+Upstream calls are made with the async client in core.upstream so that a single process can wait for hundreds of
+them at once, the ORM and template rendering are reused from the sync views through sync_to_async.
+"""
+
+import asyncio
+
+import requests
+import sentry_sdk
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404, render
+
+from . import tile_cache, upstream
+from .async_utilities import (acached_resolve_l_number, acached_soch_type_page,
+                              acached_upstream_call,
+                              afetch_raa_lamning_for_view, ais_raa_id,
+                              aprefetch_soch_type_page)
+from .models import KMRLamningType
+from .utilities import (L_NUMBER_REGEX, UpstreamTimeoutExeption,
+                        normalize_feature_info_query)
+from .views import (FEATURE_INFO_URL, cached_tile, cached_tile_response,
+                    feature_info_cache_key, fetched_tile_response,
+                    identification_resolver_response,
+                    lantmateriet_request_headers, raa_lamning_annotations,
+                    raa_type_context, raa_type_page, raa_type_page_exists,
+                    render_raa_lamning, revalidated_tile_response,
+                    tile_upstream_error_response, update_raa_type_total_hits,
+                    upstream_timeout_response)
+
+
+async def raa_lamning(request, record_id):
+    """View for displaying a single lamning from KMR."""
+    try:
+        lamning, annotations = await asyncio.gather(
+            afetch_raa_lamning_for_view(record_id), sync_to_async(raa_lamning_annotations)(record_id)
+        )
+    except Http404:
+        return HttpResponse(
+            "Kunde inte hitta någon lämning ifrån Riksantikvarieämbetet med den identifieraren.", status=404
+        )
+    except UpstreamTimeoutExeption:
+        return upstream_timeout_response()
+
+    return await sync_to_async(render_raa_lamning)(request, lamning, annotations)
+
+
+async def get_feature_info(request):
+    """Proxy for getting feature info from the RAÄ, responses are cached per clicked pixel."""
+    try:
+        params = normalize_feature_info_query(request.GET)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({"error": "Felaktig förfrågan."}, status=400)
+
+    async def fetch():
+        r = await upstream.aget("raa_karta", FEATURE_INFO_URL, params=params)
+        if r.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{r.status_code} from {FEATURE_INFO_URL}")
+        return r.json()
+
+    try:
+        data = await acached_upstream_call(feature_info_cache_key(params), fetch, ttl=settings.FEATURE_INFO_CACHE_TTL)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        sentry_sdk.capture_exception(e)
+        return JsonResponse({"error": "Kunde inte hämta information ifrån Riksantikvarieämbetet."}, status=504)
+
+    return JsonResponse(data, safe=False)
+
+
+async def lantmateriet_proxy(request, route):
+    """
+    Proxies WMS/MWTS requests to Lantmäteriet while adding Basic Auth headers.
+    Tiles are cached on disk and revalidated according to the upstream caching headers.
+    """
+    remote_path = route.strip("/")
+    url = f"https://maps.lantmateriet.se/{remote_path}"
+
+    key = tile_cache.cache_key(remote_path, request.GET)
+    tile, body = await sync_to_async(cached_tile)(key)
+    if tile and tile["fresh"]:
+        tile_cache.count("hits")
+        return cached_tile_response(tile, body, "HIT")
+
+    headers = lantmateriet_request_headers(tile)
+
+    try:
+        r = await upstream.aget("lantmateriet", url, headers=headers, params=request.GET)
+
+        if r.status_code == 304 and tile:
+            return await sync_to_async(revalidated_tile_response)(key, tile, body, r.headers)
+
+        if r.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{r.status_code} from Lantmäteriet")
+    except requests.RequestException as e:
+        if tile:
+            tile_cache.count("stale")
+            return cached_tile_response(tile, body, "STALE")
+
+        sentry_sdk.capture_exception(e)
+        return tile_upstream_error_response()
+
+    if body:
+        body.close()
+
+    # tiles are small so they are read into memory instead of being streamed
+    return await sync_to_async(fetched_tile_response)(key, r.headers, [r.content])
+
+
+async def identification_resolver(request, identifier):
+    """'View for resolving KMR identifiers to a specific record"""
+    if await ais_raa_id(identifier):
+        result = identifier
+    elif L_NUMBER_REGEX.match(identifier):
+        try:
+            result = await acached_resolve_l_number(identifier)
+        except (requests.exceptions.RequestException, ValueError):
+            return upstream_timeout_response()
+        if not result:
+            raise Http404
+    else:
+        raise Http404
+
+    return identification_resolver_response(request, result)
+
+
+async def raa_type(request, slug):
+    """List of RAA records of a specific type."""
+    page = raa_type_page(request)
+    lamning_type = await aget_object_or_404(KMRLamningType, slug=slug)
+    if not raa_type_page_exists(lamning_type, page):
+        raise Http404
+
+    try:
+        object_list = await acached_soch_type_page(lamning_type.raa_id, lamning_type.name, page)
+    except Exception:
+        return upstream_timeout_response()
+
+    await sync_to_async(update_raa_type_total_hits)(lamning_type, object_list["total"])
+
+    context = {"object": lamning_type, "kmrlamningtype": lamning_type, "object_list": object_list["results"]}
+    context.update(raa_type_context(lamning_type, page, object_list["total"]))
+
+    if context["page_obj"].get("has_next"):
+        # crawlers and visitors tend to continue to the next page
+        await aprefetch_soch_type_page(lamning_type.raa_id, lamning_type.name, page + 1)
+
+    return await sync_to_async(render)(request, "core/raa_type.html", context)
@@ -1,12 +1,19 @@
-import geojson
-from django.core.exceptions import PermissionDenied
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.contrib.auth.models import User
 from django.contrib.syndication.views import Feed
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.utils.feedgenerator import Rss201rev2Feed
+from django.utils.http import quote_etag
 
 from .models import Comment, CustomTag, Lamning, UserDetails
-from .utilities import fetch_raa_lamning_for_view
+from .utilities import (UpstreamTimeoutExeption, fetch_raa_lamning_for_view,
+                        georss_from_feature)
 
 
 class SimpleGeoRSSAtomFeed(Rss201rev2Feed):
@@ -22,16 +29,59 @@ class SimpleGeoRSSAtomFeed(Rss201rev2Feed):
 
     def add_item_elements(self, handler, item):
         super().add_item_elements(handler, item)
-        parsed_geojson = geojson.loads(item.get('geojson'))
-        if parsed_geojson.geometry.type.lower() == 'point':
-            handler.addQuickElement('georss:point', f'{parsed_geojson.geometry.coordinates[1]} {parsed_geojson.geometry.coordinates[0]}')
-        elif parsed_geojson.geometry.type.lower() == 'linestring':
-            handler.addQuickElement('georss:line', ' '.join(f'{c[1]} {c[0]}' for c in parsed_geojson.geometry.coordinates))
-        elif parsed_geojson.geometry.type.lower() == 'polygon':
-            handler.addQuickElement('georss:polygon', ' '.join(f'{c[1]} {c[0]}' for c in parsed_geojson.geometry.coordinates[0]))
-
-
-class TaggedLamningsFeed(Feed):
+        georss = georss_from_feature(item.get('geojson'))
+        if georss:
+            handler.addQuickElement(*georss)
+
+
+class ConditionalFeedMixin:
+    '''
+    Answers conditional requests with 304 before anything is rendered and caches rendered feeds.
+    Both use an ETag built from the newest change time and the number of items in feed_queryset(), which subclasses
+    define to return the unsliced queryset the feed items are taken from, together with feed_version().
+    No Last-Modified header is sent as the newest change time decreases when the newest item is removed.
+    '''
+
+    validator_field = 'created_time'
+    cache_timeout = 60 * 60 * 24
+
+    def feed_version(self, obj):
+        '''Returns the state of the feed object shown in the feed, such as its title'''
+        return ''
+
+    def get_validator(self, obj):
+        validator = self.feed_queryset(obj).order_by().aggregate(last_modified=Max(self.validator_field), count=Count('pk'))
+        timestamp = validator['last_modified'].timestamp() if validator['last_modified'] else 0
+        version = hashlib.sha1(str(self.feed_version(obj)).encode('utf-8')).hexdigest()[:16]
+        return quote_etag(f'{validator["count"]}-{int(timestamp * 1000000)}-{version}')
+
+    def __call__(self, request, *args, **kwargs):
+        # same as Feed.__call__() apart from the validator and the cache
+        try:
+            obj = self.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            raise Http404('Feed object does not exist.')
+
+        etag = self.get_validator(obj)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        key = f'feed:{request.path}:{etag}'
+        cached = cache.get(key)
+        if cached is None:
+            feedgen = self.get_feed(obj, request)
+            response = HttpResponse(content_type=feedgen.content_type)
+            feedgen.write(response, 'utf-8')
+            cache.set(key, {'content': response.content, 'content_type': response['Content-Type']}, self.cache_timeout)
+        else:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+
+        response['ETag'] = etag
+        return response
+
+
+class TaggedLamningsFeed(ConditionalFeedMixin, Feed):
 
     feed_type = SimpleGeoRSSAtomFeed
 
@@ -65,10 +115,18 @@ class TaggedLamningsFeed(Feed):
         extra_kwargs['geojson'] = item.geojson
         return extra_kwargs
 
+    validator_field = 'changed_time'
+
+    def feed_version(self, obj):
+        return obj.name
+
+    def feed_queryset(self, obj):
+        return Lamning.objects.filter(tags__slug=obj.slug).filter(hidden=False).order_by('-created_time').select_related(('user'))
+
     def items(self, obj):
-        return Lamning.objects.filter(tags__slug=obj.slug).filter(hidden=False).order_by('-created_time').select_related(('user'))[:30]
+        return self.feed_queryset(obj)[:30]
 
-class UserLamningsFeed(Feed):
+class UserLamningsFeed(ConditionalFeedMixin, Feed):
     '''Feed for lamnings by a given user'''
 
     def get_object(self, request, slug):
@@ -105,11 +163,19 @@ class UserLamningsFeed(Feed):
         extra_kwargs['geojson'] = item.geojson
         return extra_kwargs
 
+    validator_field = 'changed_time'
+
+    def feed_version(self, obj):
+        return obj.username
+
+    def feed_queryset(self, obj):
+        return Lamning.objects.filter(user=obj).filter(hidden=False).order_by('-created_time').select_related('user')
+
     def items(self, obj):
-        return Lamning.objects.filter(user=obj).filter(hidden=False).order_by('-created_time')[:30]
+        return self.feed_queryset(obj)[:30]
 
 
-class LamningCommentFeed(Feed):
+class LamningCommentFeed(ConditionalFeedMixin, Feed):
     '''Comment feed for a given FP lamning'''
     def get_object(self, request, pk):
         self.object = Lamning.objects.get(id=pk)
@@ -139,12 +205,24 @@ class LamningCommentFeed(Feed):
     def item_pubdate(self, item):
         return item.created_time
 
+    def feed_version(self, obj):
+        return (obj.title, obj.changed_time)
+
+    def feed_queryset(self, obj):
+        return Comment.objects.filter(hidden=False).filter(lamning = obj.id).order_by('-created_time')
+
     def items(self, obj):
-        return Comment.objects.filter(hidden=False).filter(lamning = obj.id).order_by('-created_time')[:30]
+        return self.feed_queryset(obj)[:30]
 
 
-class RaaLamningCommentFeed(Feed):
+class RaaLamningCommentFeed(ConditionalFeedMixin, Feed):
     '''Comment feed for a given RAÄ lamning'''
+    def __call__(self, request, *args, **kwargs):
+        try:
+            return super().__call__(request, *args, **kwargs)
+        except UpstreamTimeoutExeption:
+            return HttpResponse('Kunde inte hämta infromation ifrån Riksantikvarieämbetet.', status=504)
+
     def get_object(self, request, record_id):
         self.lamning = fetch_raa_lamning_for_view(record_id)
         self.url = reverse(viewname='raa_lamning', args=(self.lamning['uuid'],)) + '#kommentarer'
@@ -174,11 +252,17 @@ class RaaLamningCommentFeed(Feed):
     def item_pubdate(self, item):
         return item.created_time
 
+    def feed_version(self, obj):
+        return obj['title']
+
+    def feed_queryset(self, obj):
+        return Comment.objects.filter(hidden=False).filter(raa_lamning = obj['uuid']).order_by('-created_time')
+
     def items(self, obj):
-        return Comment.objects.filter(hidden=False).filter(raa_lamning = obj['uuid']).order_by('-created_time')[:30]
+        return self.feed_queryset(obj)[:30]
 
 
-class SkaderapporterFeed(Feed):
+class SkaderapporterFeed(ConditionalFeedMixin, Feed):
     '''Lists all comments with comment_type set to SR'''
 
     language = 'sv'
@@ -201,5 +285,8 @@ class SkaderapporterFeed(Feed):
     def item_pubdate(self, item):
         return item.created_time
 
+    def feed_queryset(self, obj):
+        return Comment.objects.filter(hidden=False).filter(comment_type='SR').exclude(raa_lamning__isnull=True).order_by('-created_time')
+
     def items(self):
-        return Comment.objects.filter(hidden=False).filter(comment_type='SR').exclude(raa_lamning__isnull=True).order_by('-created_time')[:50]
+        return self.feed_queryset(None)[:50]
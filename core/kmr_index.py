@@ -0,0 +1,80 @@
+"""
+Compact membership index of the UUIDs known to KMR.
+
+The index is a file of sorted 16-byte UUIDs (about 12 MB for 750k records) that is memory-mapped
+so that all workers on a host share the same pages. Lookups are a binary search over the records.
+"""
+
+import mmap
+import os
+import threading
+import uuid
+
+from django.conf import settings
+
+RECORD_SIZE = 16
+
+
+def build_index(identifiers, path):
+    """Writes a sorted, de-duplicated index of the given UUID strings, returns the number of records."""
+    records = sorted(set(uuid.UUID(identifier).bytes for identifier in identifiers))
+
+    # replaced atomically so that running workers never map a partially written file
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"".join(records))
+    os.replace(path + ".tmp", path)
+    return len(records)
+
+
+class KMRIndex:
+    """Read-only view of an index file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            size = os.fstat(f.fileno()).st_size
+            # mmap can't map empty files
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.length = size // RECORD_SIZE
+
+    def __len__(self):
+        return self.length
+
+    def __contains__(self, identifier):
+        try:
+            key = uuid.UUID(str(identifier)).bytes
+        except ValueError:
+            return False
+
+        low, high = 0, self.length
+        while low < high:
+            middle = (low + high) // 2
+            record = self.data[middle * RECORD_SIZE : (middle + 1) * RECORD_SIZE]
+            if record < key:
+                low = middle + 1
+            elif record > key:
+                high = middle
+            else:
+                return True
+        return False
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Returns the index of this process, reopening it when the file has been rebuilt. Returns None without an index."""
+    global _index
+    try:
+        mtime = os.stat(settings.KMR_INDEX_PATH).st_mtime
+    except FileNotFoundError:
+        return None
+
+    index = _index
+    if index is None or index.mtime != mtime:
+        with _index_lock:
+            if _index is None or _index.mtime != mtime:
+                _index = KMRIndex(settings.KMR_INDEX_PATH)
+            index = _index
+    return index
@@ -0,0 +1,140 @@
+"""
+Gzipped sitemap XML shards of the KMR lamnings shown at FornPunkt, built by the build-kmr-sitemaps command and
+listed in the sitemap index next to our own sections.
+
+Lamnings are assigned to shards by the leading bits of their UUID rather than by their position in a sorted list,
+so adding or removing a lamning only changes the shard it belongs to.
+
+A manifest stores a digest of the content of every shard and when that content last changed, so rebuilds only
+rewrite changed shards and the lastmod in the index tells crawlers which shards to fetch again.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+# the sitemap protocol allows 50 000 URLs per sitemap
+SHARD_SIZE = 50000
+MANIFEST_NAME = "manifest.json"
+SHARD_NAME_REGEX = re.compile(r"^\d{2,}$")
+LAMNING_URL = "https://fornpunkt.se/raa/lamning/{}"
+
+
+def get_directory():
+    return settings.KMR_XML_SITEMAPS_DIR
+
+
+def shard_path(name, directory=None):
+    return os.path.join(directory or get_directory(), f"{name}.xml.gz")
+
+
+def read_manifest(directory=None) -> dict:
+    """Returns the shards of the last build as a mapping of names to digests and lastmods, empty if none exists."""
+    try:
+        with open(os.path.join(directory or get_directory(), MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return dict()
+
+
+class ShardTooLarge(ValueError):
+    """Raised when more lamnings than SHARD_SIZE fall in the same shard."""
+
+
+def shard_count(total, previous=0) -> int:
+    """
+    Returns the number of shards for total lamnings, a power of two filling shards to half of SHARD_SIZE on average.
+    The previous number of shards is kept while they are filled to between a quarter and three quarters of it, so
+    lamnings only move between shards once their number has changed a lot.
+    """
+    is_power_of_two = previous > 0 and previous & (previous - 1) == 0
+    if is_power_of_two and previous * SHARD_SIZE / 4 <= total <= previous * SHARD_SIZE * 3 / 4:
+        return previous
+
+    count = 1
+    while total > count * SHARD_SIZE / 2:
+        count *= 2
+    return count
+
+
+def shard_number(uuid, count) -> int:
+    # KMR UUIDs are random, so their leading 32 bits spread them evenly over the shards
+    return int(uuid.replace("-", "")[:8], 16) * count >> 32
+
+
+def group_shards(entries, count):
+    """
+    Groups (uuid, version) entries sorted by UUID into (name, entries) pairs of count shards.
+    Raises ShardTooLarge if a shard exceeds SHARD_SIZE.
+    """
+    for number, shard in groupby(entries, key=lambda entry: shard_number(entry[0], count)):
+        shard = list(shard)
+        if len(shard) > SHARD_SIZE:
+            raise ShardTooLarge(f"Shard {number} of {count} has {len(shard)} lamnings, more than {SHARD_SIZE}.")
+        yield f"{number:02d}", shard
+
+
+def _write_atomically(path, content: bytes):
+    # replaced atomically so that a shard is never served half written
+    with open(path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def shard_digest(entries) -> str:
+    """Digest of a shard's (uuid, version) entries, the version is any string that changes with the record."""
+    digest = hashlib.sha1()
+    for uuid, version in entries:
+        digest.update(f"{uuid} {version}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_shard(entries) -> bytes:
+    """Returns the gzipped sitemap XML of a shard."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    lines.extend(f"<url><loc>{escape(LAMNING_URL.format(uuid))}</loc></url>" for uuid, _ in entries)
+    lines.append("</urlset>")
+    # a fixed mtime keeps the output identical for identical content
+    return gzip.compress("\n".join(lines).encode("utf-8"), mtime=0)
+
+
+def build(shards, directory=None):
+    """
+    Writes the shards that changed since the last build and removes those no longer present.
+    shards is an iterable of (name, entries) pairs, returns the names of the written, unchanged and removed shards.
+    """
+    directory = directory or get_directory()
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    manifest = dict()
+    written, unchanged = list(), list()
+    now = timezone.now().isoformat(timespec="seconds")
+
+    for name, entries in shards:
+        entries = list(entries)
+        digest = shard_digest(entries)
+        if previous.get(name, {}).get("digest") == digest and os.path.exists(shard_path(name, directory)):
+            manifest[name] = previous[name]
+            unchanged.append(name)
+            continue
+
+        _write_atomically(shard_path(name, directory), render_shard(entries))
+        manifest[name] = {"digest": digest, "lastmod": now, "count": len(entries)}
+        written.append(name)
+
+    removed = sorted(set(previous) - set(manifest))
+    _write_atomically(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest, indent=2).encode("utf-8"))
+    for name in removed:
+        try:
+            os.remove(shard_path(name, directory))
+        except FileNotFoundError:
+            pass
+
+    return written, unchanged, removed
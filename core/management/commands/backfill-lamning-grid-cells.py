@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+
+from core.models import Lamning
+from core.utilities import set_grid_cells, update_in_batches
+
+
+class Command(BaseCommand):
+    help = "Recalculates the grid cell used by the bounding box API, missing grid cells are filled by migration 0043"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recalculate grid cells for all lamnings")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        lamnings = Lamning.objects.only("id", "center_lat", "center_lon", "grid_cell").order_by("id")
+        if not options["all"]:
+            lamnings = lamnings.filter(grid_cell__isnull=True)
+
+        updated = update_in_batches(lamnings, ["grid_cell"], set_grid_cells, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated the grid cell of {updated} lamnings"))
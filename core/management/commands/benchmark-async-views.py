@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import httpx
+import requests
+from django.core.cache import cache
+from django.core.management import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+
+from core import async_views, upstream, views
+
+LAYERS = "arkreg_v1.0:publicerade_lamningar_geometrier,arkreg_v1.0:publicerade_lamningar_centrumpunkt"
+FEATURES = {"type": "FeatureCollection", "features": []}
+
+
+def feature_info_query(number):
+    """A map click on its own tile so that every request misses the cache."""
+    west = number * 10000
+    return {
+        "SERVICE": "WMS",
+        "VERSION": "1.3.0",
+        "REQUEST": "GetFeatureInfo",
+        "QUERY_LAYERS": LAYERS,
+        "LAYERS": LAYERS,
+        "INFO_FORMAT": "application/json",
+        "CRS": "EPSG:3857",
+        "WIDTH": 256,
+        "HEIGHT": 256,
+        "I": 128,
+        "J": 128,
+        "BBOX": f"{west},0,{west + 2560},2560",
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares the throughput of the sync and async map click (GetFeatureInfo) views under a simulated upstream latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Number of requests per view")
+        parser.add_argument("--latency", type=float, default=0.5, help="Simulated upstream latency in seconds")
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Threads serving the sync view, like sync gunicorn workers"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=200, help="Requests in flight at once for the async view"
+        )
+
+    def report(self, name, count, duration):
+        self.stdout.write(f"{name}: {count} requests in {duration:.2f} s, {count / duration:.1f} requests/s")
+
+    def benchmark_sync(self, options):
+        factory = RequestFactory()
+
+        def slow_request(service, method, url, **kwargs):
+            time.sleep(options["latency"])
+            response = requests.Response()
+            response.status_code = 200
+            response._content = json.dumps(FEATURES).encode()
+            return response
+
+        def click(number):
+            return views.get_feature_info(factory.get("/raa/wms-proxy", feature_info_query(number))).status_code
+
+        with mock.patch.object(upstream, "request", slow_request), ThreadPoolExecutor(options["workers"]) as executor:
+            start = time.perf_counter()
+            statuses = list(executor.map(click, range(options["requests"])))
+            return time.perf_counter() - start, statuses
+
+    async def benchmark_async(self, options):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def slow_request(service, method, url, **kwargs):
+            await asyncio.sleep(options["latency"])
+            return httpx.Response(200, json=FEATURES)
+
+        async def click(number):
+            async with semaphore:
+                response = await async_views.get_feature_info(factory.get("/raa/wms-proxy", feature_info_query(number)))
+                return response.status_code
+
+        with mock.patch.object(upstream, "arequest", slow_request):
+            start = time.perf_counter()
+            statuses = await asyncio.gather(*(click(number) for number in range(options["requests"])))
+            return time.perf_counter() - start, statuses
+
+    def handle(self, *args, **options):
+        cache.clear()
+        duration, statuses = self.benchmark_sync(options)
+        self.report(f"sync ({options['workers']} workers)", statuses.count(200), duration)
+
+        # the async requests reuse the same map clicks
+        cache.clear()
+        duration, statuses = asyncio.run(self.benchmark_async(options))
+        self.report(f"async ({options['concurrency']} in flight)", statuses.count(200), duration)
@@ -0,0 +1,52 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management import BaseCommand, CommandError
+
+from core import upstream
+from core.kmr_index import get_index
+from core.utilities import list_kmr_sitemaps, read_kmr_sitemap
+
+
+class Command(BaseCommand):
+    help = "Compares the lookup latency of the KMR UUID index with a HTTP HEAD request to kulturarvsdata.se"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lookups", type=int, default=100000, help="Number of index lookups")
+        parser.add_argument("--requests", type=int, default=10, help="Number of HEAD requests, 0 to skip them")
+
+    def report(self, name, durations):
+        durations = sorted(durations)
+        self.stdout.write(
+            f"{name}: mean {statistics.mean(durations) * 1e6:.1f} µs, "
+            f"p50 {durations[len(durations) // 2] * 1e6:.1f} µs, "
+            f"p99 {durations[int(len(durations) * 0.99)] * 1e6:.1f} µs"
+        )
+
+    def handle(self, *args, **options):
+        index = get_index()
+        if index is None:
+            raise CommandError("No KMR index found, run build-kmr-index first")
+
+        known = read_kmr_sitemap(list_kmr_sitemaps()[0])
+        # half of the lookups are for UUIDs not in the index
+        identifiers = [
+            random.choice(known) if i % 2 else str(uuid.uuid4()) for i in range(options["lookups"])
+        ]
+
+        durations = list()
+        for identifier in identifiers:
+            start = time.perf_counter()
+            identifier in index
+            durations.append(time.perf_counter() - start)
+        self.report(f"index ({len(index)} UUIDs)", durations)
+
+        durations = list()
+        for identifier in random.sample(known, min(options["requests"], len(known))):
+            start = time.perf_counter()
+            upstream.head("kulturarvsdata", f"https://kulturarvsdata.se/raa/lamning/{identifier}")
+            durations.append(time.perf_counter() - start)
+        if durations:
+            self.report("HEAD kulturarvsdata.se", durations)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from core.kmr_index import build_index
+from core.utilities import list_kmr_sitemaps, read_kmr_sitemap
+
+
+class Command(BaseCommand):
+    help = "Builds the KMR UUID index used by is_raa_id() from the KMR sitemaps"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="Defaults to the KMR_INDEX_PATH setting")
+
+    def handle(self, *args, **options):
+        identifiers = list()
+        for path in list_kmr_sitemaps():
+            identifiers.extend(read_kmr_sitemap(path))
+
+        output = options["output"] or settings.KMR_INDEX_PATH
+        count = build_index(identifiers, output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} UUIDs to {output}"))
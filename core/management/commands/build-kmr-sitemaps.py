@@ -0,0 +1,56 @@
+import hashlib
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from core import kmr_sitemaps
+from core.models import KMRRecord
+from core.utilities import list_kmr_sitemaps, read_kmr_sitemap
+
+
+class Command(BaseCommand):
+    help = "Builds gzipped sitemap shards of KMR lamnings from the KMR record table or the plain text KMR sitemaps, only changed shards are rewritten"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="Defaults to the KMR_XML_SITEMAPS_DIR setting")
+        parser.add_argument(
+            "--source",
+            choices=["auto", "records", "lists"],
+            default="auto",
+            help="The KMR record table, the plain text KMR sitemaps or the records if any are stored (default)",
+        )
+
+    def record_entries(self):
+        records = KMRRecord.objects.order_by("uuid").values_list("uuid", "payload").iterator(chunk_size=5000)
+        for uuid, payload in records:
+            # changes of a record change the digest of its shard and thereby the lastmod of the shard
+            yield str(uuid), hashlib.md5(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def list_entries(self):
+        # sorted as the shards are ranges of UUIDs
+        uuids = sorted({uuid.lower() for path in list_kmr_sitemaps() for uuid in read_kmr_sitemap(path)})
+        return [(uuid, "") for uuid in uuids]
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if source == "auto":
+            source = "records" if KMRRecord.objects.exists() else "lists"
+        if source == "records":
+            total, entries = KMRRecord.objects.count(), self.record_entries()
+        else:
+            entries = self.list_entries()
+            total = len(entries)
+
+        count = kmr_sitemaps.shard_count(total, previous=len(kmr_sitemaps.read_manifest(options["output"])))
+        try:
+            written, unchanged, removed = kmr_sitemaps.build(
+                kmr_sitemaps.group_shards(entries, count), options["output"]
+            )
+        except kmr_sitemaps.ShardTooLarge as e:
+            raise CommandError(e) from e
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built the KMR sitemaps from the {source}: {len(written)} written, "
+                f"{len(unchanged)} unchanged, {len(removed)} removed"
+            )
+        )
@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+
+from core.models import KMRRecord
+from core.utilities import L_NUMBER_REGEX, store_l_number_resolutions
+
+
+class Command(BaseCommand):
+    help = "Fills the L-number resolution table from the mirrored KMR records"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        records = KMRRecord.objects.values_list("payload__lamningsnummer", "uuid").order_by("id")
+
+        batch = dict()
+        stored = 0
+        for l_number, uuid in records.iterator(chunk_size=options["batch_size"]):
+            if not l_number or not L_NUMBER_REGEX.match(l_number):
+                continue
+            batch[l_number] = uuid
+
+            if len(batch) >= options["batch_size"]:
+                store_l_number_resolutions(batch)
+                stored += len(batch)
+                batch = dict()
+
+        if batch:
+            store_l_number_resolutions(batch)
+            stored += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} L-number resolutions"))
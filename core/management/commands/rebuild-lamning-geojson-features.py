@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from core.models import Lamning
+from core.utilities import update_in_batches
+
+
+def build_geojson_features(lamnings):
+    for lamning in lamnings:
+        lamning.geojson_feature = lamning.build_geojson_feature()
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the pre-encoded GeoJSON features served by the map and export APIs, for example after changing their format, use --missing to fill them in after migration 0044"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--missing", action="store_true", help="Only build features for lamnings without one")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        lamnings = Lamning.objects.select_related("user").prefetch_related("tags").order_by("id")
+        if options["missing"]:
+            lamnings = lamnings.filter(geojson_feature="")
+
+        updated = update_in_batches(
+            lamnings, ["geojson_feature"], build_geojson_features, batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the GeoJSON feature of {updated} lamnings"))
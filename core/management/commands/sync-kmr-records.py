@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from core.models import KMRRecord
+from core.utilities import fetch_raa_lamning, list_kmr_sitemaps, read_kmr_sitemap
+
+
+class RateLimiter:
+    """Spaces out calls from multiple threads to at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = "Mirrors the KMR records listed in the KMR sitemaps to the local database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent requests to RAÄ")
+        parser.add_argument("--rate", type=float, default=5, help="Maximum number of requests per second")
+        parser.add_argument(
+            "--max-age", type=int, default=7, help="Records fetched within this many days are not fetched again"
+        )
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--checkpoint", default="kmr-sync-checkpoint.json", help="File used to resume an interrupted sync"
+        )
+        parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_checkpoint(self, path, shard, position):
+        # written to a temporary file first so an interrupted write can't corrupt the checkpoint
+        with open(path + ".tmp", "w") as f:
+            json.dump({"shard": shard, "position": position}, f)
+        os.replace(path + ".tmp", path)
+
+    def handle(self, *args, **options):
+        checkpoint_path = options["checkpoint"]
+        checkpoint = None if options["restart"] else self.read_checkpoint(checkpoint_path)
+        if checkpoint:
+            self.stdout.write(f"Resuming from {checkpoint['shard']} at position {checkpoint['position']}")
+
+        limiter = RateLimiter(options["rate"])
+        batch_size = options["batch_size"]
+        stats = {"fetched": 0, "skipped": 0, "removed": 0, "failed": 0}
+
+        def fetch(uuid):
+            limiter.wait()
+            try:
+                return uuid, fetch_raa_lamning(uuid)
+            except Exception:
+                return uuid, None
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            for path in list_kmr_sitemaps():
+                shard = os.path.basename(path)
+                if checkpoint and shard < checkpoint["shard"]:
+                    continue
+                start = checkpoint["position"] if checkpoint and shard == checkpoint["shard"] else 0
+
+                uuids = read_kmr_sitemap(path)
+                for position in range(start, len(uuids), batch_size):
+                    batch = uuids[position : position + batch_size]
+                    # the sitemaps list some UUIDs twice, a bulk upsert can't write the same row twice on Postgres
+                    unique_batch = list(dict.fromkeys(batch))
+
+                    fresh = set(
+                        str(uuid)
+                        for uuid in KMRRecord.objects.filter(
+                            uuid__in=unique_batch, fetched_time__gte=timezone.now() - timedelta(days=options["max_age"])
+                        ).values_list("uuid", flat=True)
+                    )
+                    stats["skipped"] += len(fresh)
+
+                    records = list()
+                    removed = list()
+                    for uuid, item in executor.map(fetch, [uuid for uuid in unique_batch if uuid not in fresh]):
+                        if item is None:
+                            stats["failed"] += 1
+                        elif item is False:
+                            removed.append(uuid)
+                        else:
+                            records.append(KMRRecord.from_raa_lamning(item, timezone.now()))
+
+                    # database writes stay in the main thread
+                    KMRRecord.objects.bulk_create(
+                        records,
+                        update_conflicts=True,
+                        unique_fields=["uuid"],
+                        update_fields=["title", "description", "geojson", "author", "payload", "fetched_time"],
+                    )
+                    stats["removed"] += KMRRecord.objects.filter(uuid__in=removed).delete()[0]
+                    stats["fetched"] += len(records)
+
+                    self.write_checkpoint(checkpoint_path, shard, position + len(batch))
+
+        # a completed sync starts over on the next run
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced {stats['fetched']} records, skipped {stats['skipped']} fresh records, "
+                f"removed {stats['removed']} records and failed to fetch {stats['failed']} records"
+            )
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:47
+
+import math
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+
+# frozen copy of the grid in core.utilities at the time of this migration, cells are 0.1 degrees in both directions
+GRID_CELLS_PER_DEGREE = 10
+GRID_ROWS = 180 * GRID_CELLS_PER_DEGREE
+GRID_COLUMNS = 360 * GRID_CELLS_PER_DEGREE
+
+
+def grid_cell(lat, lon):
+    row = min(max(math.floor((lat + 90) * GRID_CELLS_PER_DEGREE), 0), GRID_ROWS - 1)
+    column = min(max(math.floor((lon + 180) * GRID_CELLS_PER_DEGREE), 0), GRID_COLUMNS - 1)
+    return row * GRID_COLUMNS + column
+
+
+def fill_grid_cells(apps, schema_editor):
+    '''The bounding box API only finds lamnings with a grid cell'''
+    Lamning = apps.get_model('core', 'Lamning')
+    lamnings = Lamning.objects.only('id', 'center_lat', 'center_lon').order_by('id').iterator(chunk_size=1000)
+    while batch := list(islice(lamnings, 1000)):
+        for lamning in batch:
+            lamning.grid_cell = grid_cell(lamning.center_lat, lamning.center_lon)
+        Lamning.objects.bulk_update(batch, ['grid_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_alter_lamning_observation_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lamning',
+            name='grid_cell',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lamning',
+            index=models.Index(fields=['hidden', 'grid_cell'], name='lamning_hidden_grid_cell_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # existing lamnings are left without a feature, which the map APIs build on request until
+    # `python manage.py rebuild-lamning-geojson-features --missing` has stored them
+
+    dependencies = [
+        ('core', '0043_lamning_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lamning',
+            name='geojson_feature',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
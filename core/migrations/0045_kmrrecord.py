@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_lamning_geojson_feature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KMRRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(unique=True)),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('geojson', models.TextField()),
+                ('author', models.TextField()),
+                ('payload', models.JSONField()),
+                ('fetched_time', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_kmrrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LNumberResolution',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('l_number', models.CharField(max_length=20, unique=True)),
+                ('uuid', models.UUIDField(blank=True, null=True)),
+                ('resolved_time', models.DateTimeField()),
+            ],
+        ),
+    ]
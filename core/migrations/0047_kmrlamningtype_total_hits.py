@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_lnumberresolution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kmrlamningtype',
+            name='total_hits',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,20 +2,25 @@ import json
 import secrets
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import models
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from taggit.managers import TaggableManager
 from taggit.models import GenericTaggedItemBase, TagBase
 
+from . import page_cache
 from .utilities import (
+    DATASET_DESCRIPTION_CACHE_KEY,
     centroid_from_feature,
     convert_geojson_to_schema_org,
+    grid_cell_from_coordinates,
     h_decode,
     h_encode,
     ld_make_identifier,
     validate_geojson,
     validate_observation_type,
+    verbose_lamning_feature,
 )
 
 
@@ -114,6 +119,10 @@ class Lamning(models.Model):
     geojson = models.TextField(validators=[validate_geojson])
     center_lat = models.FloatField()
     center_lon = models.FloatField()
+    # spatial key used by the bounding box API, see grid_cell_from_coordinates()
+    grid_cell = models.IntegerField(null=True, editable=False)
+    # verbose_geojson encoded as JSON, kept up to date by save() and the signal handlers below
+    geojson_feature = models.TextField(blank=True, editable=False)
 
     created_time = models.DateTimeField(auto_now_add=True)
     changed_time = models.DateTimeField(auto_now=True)
@@ -129,14 +138,26 @@ class Lamning(models.Model):
 
     class Meta:
         ordering = ["-created_time"]
+        indexes = [
+            models.Index(fields=["hidden", "grid_cell"], name="lamning_hidden_grid_cell_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         center = centroid_from_feature(str(self.geojson))
         self.center_lat = center[1]
         self.center_lon = center[0]
+        self.grid_cell = grid_cell_from_coordinates(self.center_lat, self.center_lon)
+
+        # the hashid is based on the primary key so the feature of a new lamning is first built after its insert
+        created = self.pk is None
+        if not created:
+            self.geojson_feature = self.build_geojson_feature()
 
         super(Lamning, self).save(*args, **kwargs)
 
+        if created:
+            self.update_geojson_feature()
+
     @property
     def hashid(self):
         return h_encode(self.id)
@@ -150,17 +171,29 @@ class Lamning(models.Model):
 
     @property
     def verbose_geojson(self):
-        geojson = json.loads(self.geojson)
-        geojson["properties"] = dict()
-        geojson["properties"]["title"] = self.title
-        geojson["properties"]["description"] = self.description
-        geojson["properties"]["lamning_id"] = self.hashid
-        geojson["properties"]["creator"] = self.user.username
-        geojson["properties"]["tags"] = [tag.name for tag in self.tags.all()]
-        geojson["properties"]["uri"] = f"https://fornpunkt.se{self.get_absolute_url()}"
-        geojson["properties"]["observation_type"] = "falt" if self.observation_type == "FO" else "fjarr"
-
-        return geojson
+        return verbose_lamning_feature(
+            self.geojson,
+            self.id,
+            self.title,
+            self.description,
+            self.user.username if self.user else None,
+            [tag.name for tag in self.tags.all()],
+            self.observation_type,
+        )
+
+    def build_geojson_feature(self):
+        """Returns verbose_geojson encoded as JSON."""
+        return json.dumps(self.verbose_geojson, ensure_ascii=False)
+
+    def update_geojson_feature(self):
+        """Rebuilds and stores the pre-encoded GeoJSON feature without touching changed_time."""
+        self.geojson_feature = self.build_geojson_feature()
+        Lamning.objects.filter(pk=self.pk).update(geojson_feature=self.geojson_feature)
+
+    @property
+    def encoded_geojson(self):
+        """The pre-encoded GeoJSON feature, built on the fly for lamnings which has not been rebuilt yet."""
+        return self.geojson_feature or self.build_geojson_feature()
 
     @property
     def json_ld(self):
@@ -183,19 +216,95 @@ class Lamning(models.Model):
                 "@type": observation_type,
             }
 
+        # tags.all() rather than tags.slugs() so that prefetched tags are used
         tags = list()
-        for tag in self.tags.slugs():
-            tags.append(ld_make_identifier(f"https://fornpunkt.se/tagg/{tag}"))
+        for tag in self.tags.all():
+            tags.append(ld_make_identifier(f"https://fornpunkt.se/tagg/{tag.slug}"))
         graph["schema:keywords"] = tags
 
         graph["schema:contentLocation"] = convert_geojson_to_schema_org(self.geojson)
 
         return graph
 
+    TSV_HEADER = ["id", "titel", "beskrivning", "geojson", "taggar", "användare", "skapad", "ändrad"]
+
+    @property
+    def tsv_row(self):
+        return [
+            self.hashid,
+            self.title,
+            self.description,
+            self.geojson,
+            "|".join([tag.name for tag in self.tags.all()]),
+            self.user,
+            self.created_time,
+            self.changed_time,
+        ]
+
+    @staticmethod
+    def iterate_with_relations(queryset, chunk_size=2000):
+        """
+        Iterates over a queryset in chunks while loading the users and tags of each chunk in bulk.
+        This ensures that verbose_geojson, json_ld and tsv_row does not query the database per lamning.
+        """
+        return queryset.select_related("user").prefetch_related("tags").iterator(chunk_size=chunk_size)
+
     def __str__(self):
         return f"{self.title} by {self.user} at {self.created_time}"
 
 
+def rebuild_geojson_features(lamnings):
+    """Rebuilds the pre-encoded GeoJSON feature of the given lamnings"""
+    for lamning in lamnings.select_related("user").prefetch_related("tags"):
+        lamning.update_geojson_feature()
+
+
+def update_geojson_feature_on_tag_change(sender, instance, action, reverse, **kwargs):
+    """Rebuild the GeoJSON feature of a lamning when its tags has changed"""
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, Lamning):
+        instance.update_geojson_feature()
+
+
+def track_renames(sender, instance, **kwargs):
+    """Notes if the name of a user or tag is about to change as it is part of the GeoJSON feature"""
+    field = "username" if sender == User else "name"
+    previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first() if instance.pk else None
+    instance._geojson_feature_renamed = previous is not None and previous != getattr(instance, field)
+
+
+def update_geojson_features_on_rename(sender, instance, **kwargs):
+    """Rebuild the GeoJSON features of the lamnings of a renamed user or tag"""
+    if not getattr(instance, "_geojson_feature_renamed", False):
+        return
+
+    if sender == User:
+        rebuild_geojson_features(Lamning.objects.filter(user=instance))
+    else:
+        rebuild_geojson_features(Lamning.objects.filter(tags=instance))
+
+
+def track_related_lamnings(sender, instance, **kwargs):
+    """Notes the lamnings of a user or tag about to be deleted"""
+    lamnings = Lamning.objects.filter(user=instance) if sender == User else Lamning.objects.filter(tags=instance)
+    instance._geojson_feature_lamnings = list(lamnings.values_list("id", flat=True))
+
+
+def update_geojson_features_on_delete(sender, instance, **kwargs):
+    """Rebuild the GeoJSON features of the lamnings which belonged to a deleted user or tag"""
+    rebuild_geojson_features(Lamning.objects.filter(id__in=getattr(instance, "_geojson_feature_lamnings", [])))
+
+
+models.signals.m2m_changed.connect(update_geojson_feature_on_tag_change, sender=TaggedThing)
+models.signals.pre_save.connect(track_renames, sender=User)
+models.signals.post_save.connect(update_geojson_features_on_rename, sender=User)
+models.signals.pre_save.connect(track_renames, sender=CustomTag)
+models.signals.post_save.connect(update_geojson_features_on_rename, sender=CustomTag)
+models.signals.pre_delete.connect(track_related_lamnings, sender=User)
+models.signals.post_delete.connect(update_geojson_features_on_delete, sender=User)
+models.signals.pre_delete.connect(track_related_lamnings, sender=CustomTag)
+models.signals.post_delete.connect(update_geojson_features_on_delete, sender=CustomTag)
+
+
 class LamningWikipediaLink(models.Model):
     """Holds a link between a KMR lamning and a Wikipedia article"""
 
@@ -239,6 +348,7 @@ class KMRLamningType(models.Model):
     raa_id = models.IntegerField()
     description = models.TextField()
     slug = models.SlugField(max_length=75)
+    total_hits = models.IntegerField(null=True, blank=True, editable=False)  # last known number of lamnings in SOCH
 
     class Meta:
         ordering = ["name"]
@@ -247,6 +357,57 @@ class KMRLamningType(models.Model):
         return self.name
 
 
+class KMRRecord(models.Model):
+    """Local mirror of a KMR lamning, populated by the sync-kmr-records command"""
+
+    uuid = models.UUIDField(unique=True)
+    title = models.TextField()
+    description = models.TextField()
+    geojson = models.TextField()
+    author = models.TextField()
+    payload = models.JSONField()  # the record as returned by RAÄ
+    fetched_time = models.DateTimeField()
+
+    def __str__(self):
+        return self.title
+
+    @staticmethod
+    def from_raa_lamning(item, fetched_time):
+        """Creates an unsaved record from the output of fetch_raa_lamning()"""
+        return KMRRecord(
+            uuid=item["uuid"],
+            title=item["title"],
+            description=item["description"],
+            geojson=item["geojson"],
+            author=item["author"],
+            payload=item["object"],
+            fetched_time=fetched_time,
+        )
+
+    @property
+    def as_raa_lamning(self):
+        """Returns the record in the same format as fetch_raa_lamning()"""
+        return {
+            "object": self.payload,
+            "geojson": self.geojson,
+            "description": self.description,
+            "author": self.author,
+            "uuid": str(self.uuid),
+            "title": self.title,
+        }
+
+
+class LNumberResolution(models.Model):
+    """Cached resolution of a L-number to the UUID of a KMR lamning, uuid is null for L-numbers without a match"""
+
+    l_number = models.CharField(max_length=20, unique=True)
+    uuid = models.UUIDField(null=True, blank=True)
+    resolved_time = models.DateTimeField()
+
+    def __str__(self):
+        return self.l_number
+
+
 class Comment(models.Model):
     """Generic comment model that is used for both FP sites and KMR ones"""
 
@@ -360,3 +521,65 @@ class AccessToken(models.Model):
 
     def __str__(self):
         return f"{self.user} ({self.rights})"
+
+
+def invalidate_dataset_description(sender, **kwargs):
+    """Removes the cached DCAT/VoID description as its statistics have changed"""
+    cache.delete(DATASET_DESCRIPTION_CACHE_KEY)
+
+
+for model in (Lamning, Comment, Annotation, LamningWikipediaLink, CustomTag):
+    models.signals.post_save.connect(invalidate_dataset_description, sender=model)
+    models.signals.post_delete.connect(invalidate_dataset_description, sender=model)
+
+
+def invalidate_lamning_pages(sender, instance, **kwargs):
+    """Purges the cached pages showing the lamning, connected to pre_delete as its tags are removed before deletion"""
+    tags = instance.tags.values_list("slug", flat=True)
+    page_cache.invalidate(f"lamning:{instance.pk}", *(f"tag:{slug}" for slug in tags))
+
+
+def invalidate_tagged_lamning_pages(sender, instance, action, pk_set, **kwargs):
+    """Purges the cached pages of a lamning and the tags added to or removed from it"""
+    if action in ("post_add", "post_remove"):
+        tags = CustomTag.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        tags = instance.tags.all()
+    else:
+        return
+    page_cache.invalidate(f"lamning:{instance.pk}", *(f"tag:{slug}" for slug in tags.values_list("slug", flat=True)))
+
+
+def invalidate_comment_pages(sender, instance, **kwargs):
+    if instance.lamning_id:
+        page_cache.invalidate(f"lamning:{instance.lamning_id}")
+
+
+def invalidate_tag_pages(sender, instance, **kwargs):
+    # pages of lamnings with the tag depend on it as well
+    page_cache.invalidate(f"tag:{instance.slug}", "tags")
+
+
+def invalidate_user_pages(sender, instance, update_fields=None, **kwargs):
+    # logging in only updates last_login which is not shown on any page
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    page_cache.invalidate(f"user:{instance.pk}")
+
+
+def invalidate_raa_type_pages(sender, **kwargs):
+    page_cache.invalidate("raa-types")
+
+
+models.signals.post_save.connect(invalidate_lamning_pages, sender=Lamning)
+models.signals.pre_delete.connect(invalidate_lamning_pages, sender=Lamning)
+models.signals.m2m_changed.connect(invalidate_tagged_lamning_pages, sender=Lamning.tags.through)
+models.signals.post_save.connect(invalidate_user_pages, sender=User)
+models.signals.post_delete.connect(invalidate_user_pages, sender=User)
+for model, receiver in (
+    (Comment, invalidate_comment_pages),
+    (CustomTag, invalidate_tag_pages),
+    (KMRLamningType, invalidate_raa_type_pages),
+):
+    models.signals.post_save.connect(receiver, sender=model)
+    models.signals.post_delete.connect(receiver, sender=model)
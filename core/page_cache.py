@@ -0,0 +1,110 @@
+"""
+Cache of full pages rendered for anonymous visitors.
+
+Pages are keyed by their path, query string and content type and depend on tags such as "lamning:<id>",
+"tag:<slug>" or "user:<id>". Every tag has a version stored in the cache, a page is stored together with the
+versions of its tags and is only served while they are unchanged. Invalidating a tag replaces its version, which
+purges exactly the pages depending on it without having to know their keys.
+
+Pages are only cached with a cache shared by all workers, a cache private to each process would only be invalidated
+in the worker handling the change.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .utilities import cache_is_shared
+
+PAGE_KEY_PREFIX = "page-cache:"
+TAG_KEY_PREFIX = "page-cache-tag:"
+
+# headers of the rendered page stored with it, the rest are added by the middlewares on every response
+STORED_HEADERS = ["Content-Type", "Content-Language", "Last-Modified", "ETag"]
+
+
+def page_key(request, content_type):
+    path = request.get_full_path()
+    return PAGE_KEY_PREFIX + hashlib.sha1(f"{content_type} {path}".encode("utf-8")).hexdigest()
+
+
+def _tag_key(tag):
+    return TAG_KEY_PREFIX + tag
+
+
+def tag_versions(tags) -> dict:
+    """Returns the current version of each tag, tags without a version are given one."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # add() keeps a version set by a concurrent request, so the versions are read again
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def tag_version(tag):
+    """
+    Returns the current version of a tag, for other caches depending on the same changes as the pages.
+    None with a cache private to the process, where versions are only replaced in the worker making a change.
+    """
+    if not cache_is_shared():
+        return None
+    return tag_versions([tag])[_tag_key(tag)]
+
+
+def invalidate(*tags):
+    """Purges all pages depending on any of the tags."""
+    if tags:
+        cache.set_many({_tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None)
+
+
+def is_cacheable_request(request):
+    """Only anonymous page views without pending messages are served from and stored in a shared cache."""
+    return (
+        cache_is_shared()
+        and request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def is_cacheable_response(request, response):
+    """Pages that set cookies or use a CSRF token are specific to the visitor and are never stored."""
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def get(request, content_type):
+    """Returns the cached page for the request or None if it is missing or one of its tags was invalidated."""
+    page = cache.get(page_key(request, content_type))
+    if page is None:
+        return None
+
+    if cache.get_many(page["versions"].keys()) != page["versions"]:
+        return None
+
+    response = HttpResponse(page["content"], headers=page["headers"])
+    response["X-Page-Cache"] = "HIT"
+    return response
+
+
+def store(request, content_type, response, tags):
+    """Stores a rendered page that depends on the tags."""
+    page = {
+        "content": response.content,
+        "headers": {header: response[header] for header in STORED_HEADERS if response.has_header(header)},
+        "versions": tag_versions(tags),
+    }
+    cache.set(page_key(request, content_type), page, timeout=settings.PAGE_CACHE_TTL)
+    response["X-Page-Cache"] = "MISS"
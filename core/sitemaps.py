@@ -1,8 +1,22 @@
+from functools import cached_property
+from urllib.parse import quote
+
 from django.contrib.flatpages.sitemaps import FlatPageSitemap
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Count, Max
 from django.urls import reverse
 
+from . import page_cache
 from .models import CustomTag, KMRLamningType, Lamning
+from .utilities import h_encode
+
+# the sitemap protocol allows 50 000 URLs per sitemap, larger sections are split into pages listed in the index
+SITEMAP_LIMIT = 50000
+
+
+def url_prefix(viewname, placeholder, encoded_placeholder):
+    '''Returns the path of a view without its last argument so that locations can be built without reverse() per row'''
+    return reverse(viewname, args=[placeholder])[:-len(encoded_placeholder)]
 
 
 class StaticViewSitemap(Sitemap):
@@ -15,31 +29,69 @@ class StaticViewSitemap(Sitemap):
         return reverse(item)
 
 class LamningSitemap(Sitemap):
-    '''Sitemap for FP-lamnings'''
+    '''Sitemap for FP-lamnings, built from (id, changed_time) rows rather than model instances'''
+
+    limit = SITEMAP_LIMIT
+
+    @cached_property
+    def prefix(self):
+        return url_prefix('lamning', 1, h_encode(1))
 
     def items(self):
-        return Lamning.objects.filter(hidden=False)
+        # ordered so that the pages are stable, each page is a single sliced query
+        return Lamning.objects.filter(hidden=False).order_by('id').values_list('id', 'changed_time')
+
+    def location(self, item):
+        return self.prefix + h_encode(item[0])
 
-    def lastmod(self, obj):
-        return obj.changed_time
+    def lastmod(self, item):
+        return item[1]
+
+    def get_latest_lastmod(self):
+        return Lamning.objects.filter(hidden=False).aggregate(Max('changed_time'))['changed_time__max']
+
+    def cache_version(self):
+        '''Changes whenever a listed lamning is added, changed or removed'''
+        validator = Lamning.objects.filter(hidden=False).aggregate(last_modified=Max('changed_time'), count=Count('id'))
+        return f'{validator["count"]}-{validator["last_modified"].timestamp() if validator["last_modified"] else 0}'
 
 class TagSitemap(Sitemap):
     '''Sitemap for tags'''
 
+    limit = SITEMAP_LIMIT
+
+    @cached_property
+    def prefix(self):
+        return url_prefix('tag', 'x', 'x')
+
     def items(self):
-        return CustomTag.objects.all().order_by('slug')
+        return CustomTag.objects.all().order_by('slug').values_list('slug', flat=True)
 
     def location(self, item):
-        return reverse('tag', kwargs={'slug': item.slug})
+        return self.prefix + quote(item)
+
+    def cache_version(self):
+        '''Changes whenever a tag is added, changed or removed, None unless the cache is shared'''
+        return page_cache.tag_version('tags')
 
 class RaaTypeSitemap(Sitemap):
     '''Sitemap for RAA types'''
 
+    limit = SITEMAP_LIMIT
+
+    @cached_property
+    def prefix(self):
+        return url_prefix('raa_type', 'x', 'x')
+
     def items(self):
-        return KMRLamningType.objects.all().order_by('slug')
+        return KMRLamningType.objects.all().order_by('slug').values_list('slug', flat=True)
 
     def location(self, item):
-        return reverse('raa_type', kwargs={'slug': item.slug})
+        return self.prefix + quote(item)
+
+    def cache_version(self):
+        '''Changes whenever a RAÄ type is added, changed or removed, None unless the cache is shared'''
+        return page_cache.tag_version('raa-types')
 
 sitemaps = {
     'lamnings': LamningSitemap,
@@ -287,19 +287,17 @@ const fpStyles = {
   }),
 };
 
+// fixed tile URLs, unlike arbitrary bounding boxes, can be cached by browsers and proxies
+const fpTileGrid = ol.tilegrid.createXYZ({tileSize: 512});
+
 const fpGeojsonSource = new ol.source.Vector({
   format: new ol.format.GeoJSON({
     dataProjection: 'EPSG:4326',
     featureProjection: 'EPSG:3857'
   }),
   loader: function(extent, resolution, projection, success, failure) {
-    const southWest = ol.proj.transform([extent[0], extent[1]], 'EPSG:3857', 'EPSG:4326');
-    const northEast = ol.proj.transform([extent[2], extent[3]], 'EPSG:3857', 'EPSG:4326');
-    const url = '/api/lamnings/bbox?south='
-      + southWest[1] + '&east='
-      + northEast[0] + '&north='
-      + northEast[1] + '&west='
-      + southWest[0];
+    const tileCoord = fpTileGrid.getTileCoordForCoordAndResolution(ol.extent.getCenter(extent), resolution);
+    const url = '/api/lamnings/tiles/' + tileCoord.join('/') + '.geojson';
 
     fetch(url)
       .then((response) => response.json())
@@ -317,7 +315,7 @@ const fpGeojsonSource = new ol.source.Vector({
           failure();
       });
   },
-  strategy: ol.loadingstrategy.bbox
+  strategy: ol.loadingstrategy.tile(fpTileGrid)
 });
 
 const fpGeojsonLayer = new ol.layer.Vector({
@@ -1,8 +1,9 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
-from ...models import Lamning, UserDetails
+from ...models import CustomTag, Lamning, UserDetails
 
 
 class GeoRSSTest(TestCase):
@@ -96,3 +97,88 @@ class UserFeedAccessTest(TestCase):
         '''Tests that the inactive user is not public'''
         response = self.client.get(reverse('user_lamnings_rss', kwargs={'slug': 'banned'}))
         self.assertEqual(response.status_code, 403)
+
+
+class ConditionalFeedTest(TestCase):
+    '''Tests conditional requests and the cache of rendered feeds'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='31(21)2HJHJ')
+        cls.lamning = Lamning.objects.create(
+            title='Testlämning',
+            description='Testlämning',
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+            observation_type='FO',
+            user=cls.user
+        )
+        cls.lamning.tags.add('testtagg')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('tag_rss', kwargs={'slug': 'testtagg'})
+
+    def test_not_modified(self):
+        '''Tests that unchanged feeds are answered with 304'''
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.has_header('Last-Modified'))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        '''Tests that changed and removed items change the validator and the cached body'''
+        etag = self.client.get(self.url)['ETag']
+
+        self.lamning.title = 'Ändrad lämning'
+        self.lamning.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ändrad lämning')
+        self.assertNotEqual(response['ETag'], etag)
+
+        Lamning.objects.filter(pk=self.lamning.pk).update(hidden=True)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Ändrad lämning')
+
+    def test_feed_object_changes_invalidate(self):
+        '''Tests that changes of the object a feed belongs to change the validator and the cached body'''
+        etag = self.client.get(self.url)['ETag']
+        CustomTag.objects.filter(slug='testtagg').update(name='Omdöpt tagg')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Omdöpt tagg')
+
+        url = reverse('lamning_comment_rss', kwargs={'pk': self.lamning.pk})
+        etag = self.client.get(url)['ETag']
+        self.lamning.title = 'Ändrad lämning'
+        self.lamning.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Ändrad lämning')
+
+    def test_rendered_feed_is_cached(self):
+        '''Tests that unconditional polls of an unchanged feed are served from the cache'''
+        first = self.client.get(self.url)
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+
+    def test_user_feed_queries(self):
+        '''Tests that the authors of the items in a user feed are not queried per item'''
+        UserDetails.objects.filter(user=self.user).update(profile_privacy='PU')
+        for number in range(3):
+            Lamning.objects.create(
+                title=f'Lämning {number}',
+                description='Testlämning',
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+                observation_type='FO',
+                user=self.user
+            )
+
+        # user, user details, validator and items
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('user_lamnings_rss', kwargs={'slug': 'testuser'}))
+        self.assertContains(response, '<georss:point>60.5963 13.0743</georss:point>', count=4)
@@ -0,0 +1,9 @@
+class SynchronousThread:
+    """Runs the target of a thread directly so that background refreshes and prefetches can be asserted"""
+
+    def __init__(self, target, args, daemon):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
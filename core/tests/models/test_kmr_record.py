@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ...models import KMRRecord
+from ...utilities import format_raa_lamning
+
+UUID = "401055fc-e795-4e2c-8e34-c45dfde18e61"
+REMOVED_UUID = "5c1a9a1c-6f4a-4f0e-9d0a-3a1d2c1e4b7f"
+
+
+def raa_payload(uuid):
+    return {
+        "lamning_id": uuid,
+        "lamningsnummer": "L1975:5318",
+        "lamningstyp_namn": "Borg",
+        "beskrivning": "Borgruin, 150x100 m.",
+        "publicerad_av_organisation": "Riksantikvarieämbetet",
+        "nuvarande_lage": {
+            "geometri": {"type": "Point", "coordinates": [17.0122, 58.7527]},
+            "geografisk_indelning": {
+                "socken": [{"socken_namn": "Nyköping"}],
+                "landskap": [{"landskap_namn": "Södermanland"}],
+            },
+        },
+    }
+
+
+class KMRRecordTest(TestCase):
+    """Tests the local mirror of KMR records"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.record = KMRRecord.from_raa_lamning(format_raa_lamning(raa_payload(UUID)), timezone.now())
+        cls.record.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_record_in_raa_lamning_format(self):
+        """Tests that a stored record matches the output of fetch_raa_lamning()"""
+        record = KMRRecord.objects.get(uuid=UUID)
+        self.assertEqual(record.as_raa_lamning, format_raa_lamning(raa_payload(UUID)))
+
+    def test_raa_lamning_view_served_from_record(self):
+        """Tests that the lamning view renders a stored record without contacting RAÄ"""
+        with mock.patch("core.utilities.upstream.get", side_effect=requests.exceptions.ConnectTimeout) as get:
+            response = self.client.get(reverse("raa_lamning", kwargs={"record_id": UUID}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Borg (L1975:5318) Nyköping socken, Södermanland")
+        get.assert_not_called()
+
+    def test_sync_command(self):
+        """Tests that the sync command stores new records, removes missing ones and clears its checkpoint"""
+        KMRRecord.from_raa_lamning(format_raa_lamning(raa_payload(REMOVED_UUID)), timezone.now()).save()
+        KMRRecord.objects.update(fetched_time=timezone.now() - timedelta(days=30))
+
+        def fetch(uuid):
+            if uuid == REMOVED_UUID:
+                return False
+            payload = raa_payload(uuid)
+            payload["lamningstyp_namn"] = "Gravfält"
+            return payload
+
+        new_uuid = "0a7a7fc2-4f43-4f0f-a7c4-66a0f6b7b8a1"
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "0.txt"), "w") as f:
+                for uuid in (UUID, REMOVED_UUID, new_uuid):
+                    f.write(f"https://fornpunkt.se/raa/lamning/{uuid}\n")
+            checkpoint = os.path.join(directory, "checkpoint.json")
+
+            with mock.patch("core.utilities.KMR_SITEMAPS_DIR", directory), mock.patch(
+                "core.utilities.request_raa_lamning", side_effect=fetch
+            ):
+                call_command("sync-kmr-records", rate=0, batch_size=2, checkpoint=checkpoint, stdout=io.StringIO())
+
+            self.assertFalse(os.path.exists(checkpoint))
+
+        self.assertEqual(KMRRecord.objects.get(uuid=UUID).title, "Gravfält (L1975:5318) Nyköping socken, Södermanland")
+        self.assertTrue(KMRRecord.objects.filter(uuid=new_uuid).exists())
+        self.assertFalse(KMRRecord.objects.filter(uuid=REMOVED_UUID).exists())
+
+    def test_sync_command_resumes_from_checkpoint(self):
+        """Tests that the sync command continues where an interrupted run stopped"""
+        fetch = mock.Mock(side_effect=raa_payload)
+        uuids = [f"0a7a7fc2-4f43-4f0f-a7c4-66a0f6b7b8a{i}" for i in range(4)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "0.txt"), "w") as f:
+                f.write("\n".join(f"https://fornpunkt.se/raa/lamning/{uuid}" for uuid in uuids))
+            checkpoint = os.path.join(directory, "checkpoint.json")
+            with open(checkpoint, "w") as f:
+                json.dump({"shard": "0.txt", "position": 2}, f)
+
+            with mock.patch("core.utilities.KMR_SITEMAPS_DIR", directory), mock.patch(
+                "core.utilities.request_raa_lamning", fetch
+            ):
+                call_command("sync-kmr-records", rate=0, checkpoint=checkpoint, stdout=io.StringIO())
+
+        self.assertEqual(sorted(call.args[0] for call in fetch.call_args_list), uuids[2:])
+
+    def test_sync_command_with_duplicated_uuids(self):
+        """Tests that a UUID listed twice within a batch is fetched and written once"""
+        fetch = mock.Mock(side_effect=raa_payload)
+        new_uuid = "0a7a7fc2-4f43-4f0f-a7c4-66a0f6b7b8a1"
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "0.txt"), "w") as f:
+                f.write("\n".join(f"https://fornpunkt.se/raa/lamning/{uuid}" for uuid in (new_uuid, new_uuid)))
+            checkpoint = os.path.join(directory, "checkpoint.json")
+
+            with mock.patch("core.utilities.KMR_SITEMAPS_DIR", directory), mock.patch(
+                "core.utilities.request_raa_lamning", fetch
+            ):
+                call_command("sync-kmr-records", rate=0, checkpoint=checkpoint, stdout=io.StringIO())
+
+        fetch.assert_called_once_with(new_uuid)
+        self.assertTrue(KMRRecord.objects.filter(uuid=new_uuid).exists())
@@ -1,7 +1,11 @@
+import json
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ...models import Lamning, User
+from ...models import CustomTag, Lamning, User
 
 class LamningModelTest(TestCase):
     '''Tests the Lamning model'''
@@ -35,3 +39,45 @@ class LamningModelTest(TestCase):
         lamning = Lamning.objects.get(id=self.lamning.id)
         self.assertEqual(lamning.center_lat, 60.5963)
         self.assertEqual(lamning.center_lon, 13.0743)
+
+    def test_geojson_feature(self):
+        '''Test that the pre-encoded GeoJSON feature matches verbose_geojson'''
+
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature), lamning.verbose_geojson)
+
+    def test_geojson_feature_follows_tags(self):
+        '''Test that the pre-encoded GeoJSON feature is rebuilt when tags are changed or renamed'''
+
+        self.lamning.tags.remove('testtagg_2')
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature)['properties']['tags'], ['testtagg'])
+
+        tag = CustomTag.objects.get(name='testtagg')
+        tag.name = 'omdöpt'
+        tag.save()
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature)['properties']['tags'], ['omdöpt'])
+
+        tag.delete()
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature)['properties']['tags'], [])
+
+    def test_geojson_feature_follows_user(self):
+        '''Test that the pre-encoded GeoJSON feature is rebuilt when the user is renamed'''
+
+        self.user.username = 'omdopt'
+        self.user.save()
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature)['properties']['creator'], 'omdopt')
+
+    def test_geojson_feature_is_saved_with_lamning(self):
+        '''Test that saving a lamning stores its rebuilt GeoJSON feature without a second update'''
+
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        lamning.title = 'Ändrad'
+        with CaptureQueriesContext(connection) as queries:
+            lamning.save()
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        lamning = Lamning.objects.get(id=self.lamning.id)
+        self.assertEqual(json.loads(lamning.geojson_feature)['properties']['title'], 'Ändrad')
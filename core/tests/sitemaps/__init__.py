@@ -1,12 +1,199 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+
+from ... import kmr_sitemaps
+from ...models import CustomTag, KMRLamningType, KMRRecord, Lamning
+from ...sitemaps import LamningSitemap
+
+UUIDS = [
+    '401055fc-e795-4e2c-8e34-c45dfde18e61',
+    'c51a9a1c-6f4a-4f0e-9d0a-3a1d2c1e4b7f',
+    '13dfb99b-db36-4ac6-975c-1bc606dea81b',
+    'e1a4c5d2-7b3e-4f6a-8c9d-0e1f2a3b4c5d',
+    '0a2b3c4d-5e6f-4a7b-8c9d-a1b2c3d4e5f6',
+]
 
 class SitemapTest(TestCase):
     '''Tests of the sitemap'''
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='31(21)2HJHJ')
+        cls.lamnings = [
+            Lamning.objects.create(
+                title=f'Testlämning {number}',
+                description='Testlämning',
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+                observation_type='FO',
+                user=cls.user
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def section(self, section, page=None):
+        url = reverse('django.contrib.sitemaps.views.sitemap', kwargs={'section': section})
+        return self.client.get(url + (f'?p={page}' if page else ''))
+
     def test_sitemap(self):
         '''Tests that the sitemap is generated correctly'''
-        response = self.client.get(reverse('django.contrib.sitemaps.views.sitemap'))
+        response = self.section('static')
         self.assertEqual(response.status_code, 200)
         # /karta is a static page, so it should allways be in the sitemap
         self.assertContains(response, '/karta</loc>')
+
+    def test_sitemap_index(self):
+        '''Tests that the sitemap index lists the sections'''
+        response = self.client.get(reverse('django.contrib.sitemaps.views.index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/fp-internal-sitemap-lamnings.xml</loc>')
+        self.assertContains(response, '/fp-internal-sitemap-static.xml</loc>')
+
+    def test_lamning_locations(self):
+        '''Tests that locations built from rows match the URLs of the lamnings'''
+        response = self.section('lamnings')
+        for lamning in self.lamnings:
+            self.assertContains(response, f'{lamning.get_absolute_url()}</loc>')
+        self.assertContains(response, '<lastmod>')
+
+    def test_lamning_section_is_paginated(self):
+        '''Tests that sections larger than the limit are split into pages'''
+        original_limit = LamningSitemap.limit
+        LamningSitemap.limit = 2
+        try:
+            self.assertContains(self.section('lamnings', 2), '</loc>', count=1)
+            self.assertContains(
+                self.client.get(reverse('django.contrib.sitemaps.views.index')), '/fp-internal-sitemap-lamnings.xml?p=2'
+            )
+        finally:
+            LamningSitemap.limit = original_limit
+
+    def test_section_cache(self):
+        '''Tests that a cached section is served until a lamning changes'''
+        self.section('lamnings')
+        with self.assertNumQueries(1):
+            self.section('lamnings')
+
+        self.lamnings[0].hidden = True
+        self.lamnings[0].save()
+        response = self.section('lamnings')
+        self.assertNotContains(response, f'{self.lamnings[0].get_absolute_url()}</loc>')
+
+    @mock.patch('core.page_cache.cache_is_shared', return_value=True)
+    def test_tag_section_cache(self, shared):
+        '''Tests that cached tag and RAÄ type sections are purged when a tag or type is changed'''
+        tag = CustomTag.objects.create(name='testtagg', slug='testtagg')
+        self.assertContains(self.section('tags'), '/testtagg</loc>')
+        with self.assertNumQueries(0):
+            self.section('tags')
+
+        tag.slug = 'omdopt'
+        tag.save()
+        self.assertContains(self.section('tags'), '/omdopt</loc>')
+
+        self.section('raa_types')
+        KMRLamningType.objects.create(name='Boplats', slug='boplats', raa_id=1, description='')
+        self.assertContains(self.section('raa_types'), '/boplats</loc>')
+
+
+    def test_tag_section_without_shared_cache(self):
+        '''Tests that tag sections are not cached in a cache private to the process, which other workers can't purge'''
+        CustomTag.objects.create(name='testtagg', slug='testtagg')
+        self.section('tags')
+        # update() sends no signals, like a change made by another worker
+        CustomTag.objects.filter(slug='testtagg').update(slug='omdopt')
+        self.assertContains(self.section('tags'), '/omdopt</loc>')
+
+
+class KMRSitemapTest(TestCase):
+    '''Tests the gzipped KMR sitemap shards'''
+
+    def setUp(self):
+        self.lists = tempfile.TemporaryDirectory()
+        self.output = tempfile.TemporaryDirectory()
+        self.settings = override_settings(KMR_XML_SITEMAPS_DIR=self.output.name)
+        self.settings.enable()
+        self.patch = mock.patch('core.utilities.KMR_SITEMAPS_DIR', self.lists.name)
+        self.patch.start()
+        for name, uuids in (('00', [UUIDS[0]]), ('01', [UUIDS[1]])):
+            self.write_list(name, uuids)
+
+    def tearDown(self):
+        self.patch.stop()
+        self.settings.disable()
+        self.lists.cleanup()
+        self.output.cleanup()
+
+    def write_list(self, name, uuids):
+        with open(os.path.join(self.lists.name, f'{name}.txt'), 'w') as f:
+            f.write(''.join(f'https://fornpunkt.se/raa/lamning/{uuid}\n' for uuid in uuids))
+
+    def build(self, shard_size=2, **options):
+        with mock.patch('core.kmr_sitemaps.SHARD_SIZE', shard_size):
+            call_command('build-kmr-sitemaps', stdout=io.StringIO(), **options)
+        return kmr_sitemaps.read_manifest()
+
+    def test_shards_are_served_and_indexed(self):
+        '''Tests that the shards are gzipped sitemaps listed in the sitemap index'''
+        self.build()
+
+        response = self.client.get(reverse('kmr_sitemap', kwargs={'name': '01'}))
+        self.assertEqual(response.status_code, 200)
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertIn(f'<loc>https://fornpunkt.se/raa/lamning/{UUIDS[1]}</loc>', content)
+
+        response = self.client.get(reverse('django.contrib.sitemaps.views.index'))
+        self.assertContains(response, '/kmr-sitemap-00.xml.gz</loc>')
+        self.assertContains(response, '/kmr-sitemap-01.xml.gz</loc>')
+
+        self.assertEqual(self.client.get('/kmr-sitemap-02.xml.gz').status_code, 404)
+
+    def test_incremental_rebuild(self):
+        '''Tests that only changed shards are rewritten and that removed shards are deleted'''
+        first = self.build()
+
+        self.write_list('01', [UUIDS[3]])
+        with mock.patch('core.kmr_sitemaps.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            second = self.build()
+        self.assertEqual(second['00'], first['00'])
+        self.assertNotEqual(second['01']['digest'], first['01']['digest'])
+        self.assertGreater(second['01']['lastmod'], first['01']['lastmod'])
+
+        os.remove(os.path.join(self.lists.name, '01.txt'))
+        self.assertEqual(list(self.build()), ['00'])
+        self.assertFalse(os.path.exists(kmr_sitemaps.shard_path('01')))
+
+    def test_insertion_only_changes_its_shard(self):
+        '''Tests that adding a lamning to a shard with several lamnings leaves the other shards unchanged'''
+        self.write_list('00', [UUIDS[0], UUIDS[2]])
+        self.write_list('01', [UUIDS[1], UUIDS[3]])
+        first = self.build(shard_size=4)
+        self.assertEqual({name: shard['count'] for name, shard in first.items()}, {'00': 2, '01': 2})
+
+        self.write_list('02', [UUIDS[4]])
+        second = self.build(shard_size=4)
+        self.assertEqual(second['00']['count'], 3)
+        self.assertEqual(second['01'], first['01'])
+
+    def test_shards_from_records(self):
+        '''Tests that stored KMR records are used when there are any'''
+        KMRRecord.objects.create(
+            uuid=UUIDS[2], title='Borg', description='', geojson='{}', author='', payload={}, fetched_time=timezone.now()
+        )
+        manifest = self.build()
+        self.assertEqual(list(manifest), ['00'])
+        with gzip.open(kmr_sitemaps.shard_path('00')) as f:
+            self.assertIn(UUIDS[2], f.read().decode())
@@ -0,0 +1,70 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase, override_settings
+
+from ...utilities import cached_upstream_call, fetch_raa_lamning_for_view
+from ..helpers import SynchronousThread
+
+
+class CachedUpstreamCallTest(TestCase):
+    """Tests the stale-while-revalidate cache used for upstream requests"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_value_is_cached(self):
+        """Tests that fresh values are served from the cache"""
+        fetch = mock.Mock(return_value={"title": "Gravfält"})
+        self.assertEqual(cached_upstream_call("test-key", fetch, ttl=60), {"title": "Gravfält"})
+        self.assertEqual(cached_upstream_call("test-key", fetch, ttl=60), {"title": "Gravfält"})
+        self.assertEqual(fetch.call_count, 1)
+
+    @mock.patch("core.utilities.threading.Thread", SynchronousThread)
+    def test_stale_value_is_served_while_refreshed(self):
+        """Tests that stale values are returned while being refreshed in the background"""
+        fetch = mock.Mock(side_effect=[{"version": 1}, {"version": 2}])
+        cached_upstream_call("test-key", fetch, ttl=60, stale_ttl=60)
+
+        entry = cache.get("test-key")
+        entry["fresh_until"] = time.time() - 1
+        cache.set("test-key", entry)
+
+        self.assertEqual(cached_upstream_call("test-key", fetch, ttl=60, stale_ttl=60), {"version": 1})
+        self.assertEqual(cached_upstream_call("test-key", fetch, ttl=60, stale_ttl=60), {"version": 2})
+        self.assertEqual(fetch.call_count, 2)
+
+    @mock.patch("core.utilities.threading.Thread", SynchronousThread)
+    def test_failed_refresh_keeps_stale_value(self):
+        """Tests that a failing refresh does not evict the stale value"""
+        fetch = mock.Mock(side_effect=[{"version": 1}, Exception("RAA services are not available.")])
+        cached_upstream_call("test-key", fetch, ttl=60, stale_ttl=60)
+
+        entry = cache.get("test-key")
+        entry["fresh_until"] = time.time() - 1
+        cache.set("test-key", entry)
+
+        self.assertEqual(cached_upstream_call("test-key", fetch, ttl=60, stale_ttl=60), {"version": 1})
+        self.assertIsNone(cache.get("test-key:refreshing"))
+
+    def test_not_found_is_cached(self):
+        """Tests that missing records are cached only when a not found TTL is given"""
+        fetch = mock.Mock(return_value=False)
+        cached_upstream_call("test-key", fetch, ttl=60)
+        cached_upstream_call("test-key", fetch, ttl=60)
+        self.assertEqual(fetch.call_count, 2)
+
+        cached_upstream_call("other-key", fetch, ttl=60, not_found_ttl=60)
+        cached_upstream_call("other-key", fetch, ttl=60, not_found_ttl=60)
+        self.assertEqual(fetch.call_count, 3)
+
+    @override_settings(RAA_LAMNING_NOT_FOUND_CACHE_TTL=60)
+    def test_raa_lamning_not_found_is_cached(self):
+        """Tests that missing KMR records are not fetched again"""
+        with mock.patch("core.utilities.fetch_raa_lamning", return_value=False) as fetch:
+            for _ in range(2):
+                with self.assertRaises(Http404):
+                    fetch_raa_lamning_for_view("9ce3e04e-7959-4075-b4dc-8f0cd2207304")
+            self.assertEqual(fetch.call_count, 1)
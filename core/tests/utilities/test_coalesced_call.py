@@ -0,0 +1,105 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ...utilities import coalesced_call
+
+
+class CoalescedCallTest(SimpleTestCase):
+    """Tests the single-flight coalescing of upstream fetches"""
+
+    def setUp(self):
+        cache.clear()
+
+    def run_concurrently(self, fetch, callers=8):
+        """Calls coalesced_call() from several threads, returns the results and errors once all callers waited"""
+        release = threading.Event()
+        outcomes = list()
+
+        def call():
+            try:
+                outcomes.append(coalesced_call("record", lambda: release.wait() and fetch()))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        # let all threads reach the in-flight call before it completes
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_a_fetch(self):
+        """Tests that concurrent callers in a process share one in-flight fetch"""
+        fetch = mock.Mock(return_value={"title": "Gravfält"})
+        self.assertEqual(self.run_concurrently(fetch), [{"title": "Gravfält"}] * 8)
+        fetch.assert_called_once()
+
+    def test_errors_are_shared(self):
+        """Tests that waiting callers receive the error of the in-flight fetch"""
+        fetch = mock.Mock(side_effect=ValueError)
+        outcomes = self.run_concurrently(fetch)
+        fetch.assert_called_once()
+        self.assertEqual(len(outcomes), 8)
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes))
+
+    def test_private_cache_is_not_used_between_workers(self):
+        """Tests that a lock in a cache private to the process is not waited for"""
+        cache.add("record:in-flight", "other-worker")
+        self.assertEqual(coalesced_call("record", lambda: "fetched"), "fetched")
+
+
+@mock.patch("core.utilities.cache_is_shared", return_value=True)
+class CoalescedCallAcrossWorkersTest(SimpleTestCase):
+    """Tests the coalescing of fetches between workers sharing a cache"""
+
+    def setUp(self):
+        cache.clear()
+
+    def run_other_worker(self, action):
+        timer = threading.Timer(0.1, action)
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_waits_for_other_worker(self, shared):
+        """Tests that a fetch made by another worker is used instead of fetching again"""
+        cache.add("record:in-flight", "other-worker")
+
+        def other_worker():
+            cache.set("record:result:other-worker", {"value": {"title": "Gravfält"}})
+            cache.delete("record:in-flight")
+
+        self.run_other_worker(other_worker)
+        fetch = mock.Mock()
+        self.assertEqual(coalesced_call("record", fetch), {"title": "Gravfält"})
+        fetch.assert_not_called()
+
+    def test_earlier_results_are_not_used(self, shared):
+        """Tests that a caller waits for the current fetch rather than using the result of an earlier one"""
+        cache.set("record:result:earlier-worker", {"value": "earlier"})
+        cache.add("record:in-flight", "other-worker")
+
+        def other_worker():
+            cache.set("record:result:other-worker", {"value": "current"})
+            cache.delete("record:in-flight")
+
+        self.run_other_worker(other_worker)
+        self.assertEqual(coalesced_call("record", mock.Mock()), "current")
+
+    def test_fetches_when_other_worker_fails(self, shared):
+        """Tests that callers fetch themselves when the other worker gives up without a result"""
+        cache.add("record:in-flight", "other-worker")
+        self.run_other_worker(lambda: cache.delete("record:in-flight"))
+
+        self.assertEqual(coalesced_call("record", lambda: "fetched"), "fetched")
+
+    def test_lock_is_released(self, shared):
+        """Tests that the lock is released once the fetch is done"""
+        self.assertEqual(coalesced_call("record", lambda: "fetched"), "fetched")
+        self.assertIsNone(cache.get("record:in-flight"))
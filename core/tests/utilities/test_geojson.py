@@ -1,6 +1,6 @@
 from django.test import TestCase
 
-from ...utilities import centroid_from_feature, convert_geojson_to_schema_org, validate_geojson
+from ...utilities import centroid_from_feature, convert_geojson_to_schema_org, georss_from_feature, validate_geojson
 
 
 class GeoJSONTest(TestCase):
@@ -22,6 +22,17 @@ class GeoJSONTest(TestCase):
         geo_point = '{"type":"Feature","properties":{},"geometry":{"type":"Point","coordinates":[-9.667969,49.382373]}}'
         self.assertEqual(centroid_from_feature(geo_point), (-9.667969, 49.382373))
 
+    def test_georss_from_feature(self):
+        """Tests that GeoRSS coordinates are latitude first and rounded like the geojson library"""
+        geo_line = '{"type":"Feature","geometry":{"type":"LineString","coordinates":[[17.000246506461547,58.73422091201479],[17,58]]},"properties":null}'
+        self.assertEqual(georss_from_feature(geo_line), ("georss:line", "58.734221 17.000247 58 17"))
+
+        geo_polygon = '{"type":"Feature","properties":{},"geometry":{"type":"Polygon","coordinates":[[[-25.136719,38.134557],[5.625,54.775346],[-25.136719,38.134557]]]}}'
+        self.assertEqual(georss_from_feature(geo_polygon), ("georss:polygon", "38.134557 -25.136719 54.775346 5.625 38.134557 -25.136719"))
+
+        geo_multipoint = '{"type":"Feature","properties":{},"geometry":{"type":"MultiPoint","coordinates":[[13.0743,60.5963]]}}'
+        self.assertIsNone(georss_from_feature(geo_multipoint))
+
     def test_schema_org_from_geojson(self):
         """Tests that the GeoJSON to schema.org conversion works"""
 
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from ...utilities import GRID_COLUMNS, grid_cell_from_coordinates, grid_cell_ranges_from_bbox
+
+
+class GridTest(TestCase):
+    """Tests the spatial grid used by the bounding box API"""
+
+    def test_grid_cell_from_coordinates(self):
+        """Tests that coordinates are placed in the expected grid cell"""
+        self.assertEqual(grid_cell_from_coordinates(-90, -180), 0)
+        self.assertEqual(grid_cell_from_coordinates(-90, -179.95), 0)
+        self.assertEqual(grid_cell_from_coordinates(-89.85, -180), GRID_COLUMNS)
+        self.assertEqual(grid_cell_from_coordinates(60.5963, 13.0743), 1505 * GRID_COLUMNS + 1930)
+
+        # coordinates on the edge of the world are clamped to the last cell
+        self.assertEqual(grid_cell_from_coordinates(90, 180), grid_cell_from_coordinates(89.99, 179.99))
+
+    def test_grid_cell_ranges_from_bbox(self):
+        """Tests that a bounding box is expanded to one range of cells per grid row"""
+        ranges = grid_cell_ranges_from_bbox(60.06115, 13.0557, 60.60, 13.43)
+        self.assertEqual(len(ranges), 7)
+        self.assertEqual(ranges[0], (1500 * GRID_COLUMNS + 1930, 1500 * GRID_COLUMNS + 1934))
+        self.assertEqual(ranges[-1], (1506 * GRID_COLUMNS + 1930, 1506 * GRID_COLUMNS + 1934))
+
+        for lat, lon in [(60.5963, 13.0743), (60.06115, 13.0557), (60.60, 13.43)]:
+            cell = grid_cell_from_coordinates(lat, lon)
+            self.assertTrue(any(first <= cell <= last for first, last in ranges))
+
+    def test_grid_cell_ranges_from_inverted_bbox(self):
+        """Tests that an inverted bounding box does not cover any cells"""
+        self.assertEqual(grid_cell_ranges_from_bbox(60.6, 13.0, 60.0, 13.4), [])
@@ -0,0 +1,47 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ...kmr_index import build_index, get_index
+from ...utilities import is_raa_id
+
+KNOWN = ["401055fc-e795-4e2c-8e34-c45dfde18e61", "b65fe084-53f3-4ae4-8234-e1efb598e522"]
+
+
+class KMRIndexTest(TestCase):
+    """Tests the memory-mapped KMR UUID index"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "kmr-index.bin")
+        build_index(KNOWN + KNOWN[:1], self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_membership(self):
+        """Tests lookups of known, unknown and malformed identifiers"""
+        with override_settings(KMR_INDEX_PATH=self.path):
+            index = get_index()
+            self.assertEqual(len(index), 2)
+            for identifier in KNOWN:
+                self.assertIn(identifier, index)
+            self.assertNotIn("00000000-0000-0000-0000-000000000000", index)
+            self.assertNotIn("not-a-uuid", index)
+
+    def test_missing_index(self):
+        """Tests that no index is returned when it has not been built"""
+        with override_settings(KMR_INDEX_PATH=self.path + ".missing"):
+            self.assertIsNone(get_index())
+
+    def test_is_raa_id_uses_index(self):
+        """Tests that is_raa_id only contacts kulturarvsdata.se for UUIDs missing from the index"""
+        with override_settings(KMR_INDEX_PATH=self.path), mock.patch("core.utilities.upstream.head") as head:
+            head.return_value.status_code = 404
+            self.assertTrue(is_raa_id(KNOWN[0]))
+            head.assert_not_called()
+
+            self.assertFalse(is_raa_id("00000000-0000-4000-8000-000000000000"))
+            head.assert_called_once()
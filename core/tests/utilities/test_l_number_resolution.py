@@ -0,0 +1,52 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ...models import KMRRecord, LNumberResolution
+from ...utilities import cached_resolve_l_number
+
+UUID = "13dfb99b-db36-4ac6-975c-1bc606dea81b"
+
+
+class LNumberResolutionTest(TestCase):
+    """Tests the persistent L-number resolution cache"""
+
+    def test_resolution_is_stored(self):
+        """Tests that resolved L-numbers are served from the database on later lookups"""
+        with mock.patch("core.utilities.resolve_l_number", return_value=UUID) as resolve:
+            self.assertEqual(cached_resolve_l_number("L2018:1200"), UUID)
+            self.assertEqual(cached_resolve_l_number("L2018:1200"), UUID)
+        resolve.assert_called_once()
+
+        with mock.patch("core.utilities.resolve_l_number") as resolve:
+            response = self.client.get(reverse("identification_resolver", kwargs={"identifier": "L2018:1200"}))
+            self.assertEqual(response.url, f"https://fornpunkt.se/raa/lamning/{UUID}")
+            response = self.client.get(reverse("l_number_redirection", kwargs={"l_number": "L2018:1200"}))
+            self.assertEqual(response.url, f"/raa/lamning/{UUID}")
+        resolve.assert_not_called()
+
+    def test_negative_resolution_expires(self):
+        """Tests that missing L-numbers are cached until L_NUMBER_NOT_FOUND_TTL has passed"""
+        with mock.patch("core.utilities.resolve_l_number", return_value=None) as resolve:
+            self.assertIsNone(cached_resolve_l_number("L1998:99999"))
+            self.assertIsNone(cached_resolve_l_number("L1998:99999"))
+            resolve.assert_called_once()
+
+            LNumberResolution.objects.update(resolved_time=timezone.now() - timedelta(days=2))
+            self.assertIsNone(cached_resolve_l_number("L1998:99999"))
+            self.assertEqual(resolve.call_count, 2)
+
+    def test_preload_command(self):
+        """Tests that the preload command stores the L-numbers of mirrored records"""
+        KMRRecord.objects.create(
+            uuid=UUID, title="Boplats", description="", geojson="{}", author="RAÄ",
+            payload={"lamningsnummer": "L2018:1200"}, fetched_time=timezone.now(),
+        )
+        call_command("preload-l-number-resolutions", stdout=io.StringIO())
+
+        self.assertEqual(str(LNumberResolution.objects.get(l_number="L2018:1200").uuid), UUID)
@@ -0,0 +1,148 @@
+import asyncio
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase
+
+from ... import upstream
+
+
+class UpstreamClientTest(SimpleTestCase):
+    """Tests the shared upstream HTTP client"""
+
+    def setUp(self):
+        upstream._metrics.clear()
+        upstream._breakers.update({service: upstream.CircuitBreaker(service) for service in upstream.SERVICES})
+
+    def test_sessions_are_shared(self):
+        """Tests that each service reuses a single pooled session"""
+        self.assertIs(upstream.get_session("raa"), upstream.get_session("raa"))
+        self.assertIsNot(upstream.get_session("raa"), upstream.get_session("kulturarvsdata"))
+
+    def test_async_clients_are_closed_with_their_loop(self):
+        """Tests that async clients are shared within an event loop and closed when it shuts down"""
+        async def get_clients():
+            return upstream.get_async_client("raa"), upstream.get_async_client("raa")
+
+        client, same_client = asyncio.run(get_clients())
+        self.assertIs(client, same_client)
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(asyncio.run(get_clients())[0], client)
+        self.assertEqual(len(upstream._async_clients), 0)
+
+    def test_default_timeout_and_metrics(self):
+        """Tests that service timeouts are applied and calls are recorded"""
+        session = mock.Mock()
+        session.request.return_value = mock.Mock(status_code=200)
+        with mock.patch("core.upstream.get_session", return_value=session):
+            upstream.get("raa", "https://app.raa.se/")
+            upstream.get("raa", "https://app.raa.se/", timeout=1)
+
+        self.assertEqual(session.request.call_args_list[0].kwargs["timeout"], (3.05, 10))
+        self.assertEqual(session.request.call_args_list[1].kwargs["timeout"], 1)
+
+        metrics = upstream.get_metrics()["raa"]
+        self.assertEqual(metrics["calls"], 2)
+        self.assertEqual(metrics["errors"], 0)
+
+    def test_errors_are_recorded(self):
+        """Tests that failed calls are counted as errors and re-raised"""
+        session = mock.Mock()
+        session.request.side_effect = requests.exceptions.ConnectTimeout()
+        with mock.patch("core.upstream.get_session", return_value=session):
+            with self.assertRaises(requests.exceptions.RequestException):
+                upstream.head("kulturarvsdata", "https://kulturarvsdata.se/")
+
+        self.assertEqual(session.request.call_args.kwargs["allow_redirects"], False)
+        self.assertEqual(upstream.get_metrics()["kulturarvsdata"]["errors"], 1)
+
+
+class CircuitBreakerTest(TestCase):
+    """Tests the per service circuit breaker"""
+
+    def setUp(self):
+        upstream._breakers.update({service: upstream.CircuitBreaker(service) for service in upstream.SERVICES})
+        self.session = mock.Mock()
+        self.session.request.side_effect = requests.exceptions.ConnectTimeout()
+
+    def tearDown(self):
+        upstream._breakers.update({service: upstream.CircuitBreaker(service) for service in upstream.SERVICES})
+
+    def fail_calls(self, count):
+        with mock.patch("core.upstream.get_session", return_value=self.session):
+            for _ in range(count):
+                with self.assertRaises(requests.exceptions.RequestException):
+                    upstream.get("raa", "https://app.raa.se/")
+
+    def test_circuit_opens_and_fails_fast(self):
+        """Tests that the circuit opens after repeated failures and stops calling the service"""
+        self.fail_calls(upstream.BREAKER_MIN_CALLS)
+        self.assertEqual(upstream.get_breaker("raa").state, upstream.OPEN)
+
+        self.session.request.reset_mock()
+        with mock.patch("core.upstream.get_session", return_value=self.session):
+            with self.assertRaises(upstream.UpstreamUnavailable):
+                upstream.get("raa", "https://app.raa.se/")
+        self.session.request.assert_not_called()
+
+        # other services are unaffected
+        self.assertEqual(upstream.get_status()["kulturarvsdata"]["state"], upstream.CLOSED)
+
+    def test_half_open_probe(self):
+        """Tests that a single probe is let through after the cool down and closes the circuit on success"""
+        self.fail_calls(upstream.BREAKER_MIN_CALLS)
+        breaker = upstream.get_breaker("raa")
+        breaker.opened_at -= upstream.BREAKER_OPEN_SECONDS
+
+        # a failed probe opens the circuit again
+        self.fail_calls(1)
+        self.assertEqual(breaker.state, upstream.OPEN)
+
+        breaker.opened_at -= upstream.BREAKER_OPEN_SECONDS
+        self.session.request.side_effect = None
+        self.session.request.return_value = mock.Mock(status_code=200)
+        with mock.patch("core.upstream.get_session", return_value=self.session):
+            upstream.get("raa", "https://app.raa.se/")
+        self.assertEqual(breaker.state, upstream.CLOSED)
+
+    def test_cancelled_probe_is_released(self):
+        """Tests that a probe cancelled before it has an outcome lets the next call probe"""
+        self.fail_calls(upstream.BREAKER_MIN_CALLS)
+        breaker = upstream.get_breaker("raa")
+        breaker.opened_at -= upstream.BREAKER_OPEN_SECONDS
+
+        async def hanging_request(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        async def cancel_probe():
+            client = mock.Mock(request=hanging_request)
+            with mock.patch("core.upstream.get_async_client", return_value=client):
+                probe = asyncio.create_task(upstream.aget("raa", "https://app.raa.se/"))
+                await asyncio.sleep(0)
+                probe.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await probe
+
+        asyncio.run(cancel_probe())
+        self.assertEqual(breaker.state, upstream.HALF_OPEN)
+        self.assertIsNone(breaker.probe_started)
+        breaker.before_call()
+
+    def test_probe_timeout(self):
+        """Tests that a probe without an outcome stops holding back other calls after a timeout"""
+        self.fail_calls(upstream.BREAKER_MIN_CALLS)
+        breaker = upstream.get_breaker("raa")
+        breaker.opened_at -= upstream.BREAKER_OPEN_SECONDS
+        breaker.before_call()
+        with self.assertRaises(upstream.UpstreamUnavailable):
+            breaker.before_call()
+
+        breaker.probe_started -= upstream.BREAKER_PROBE_TIMEOUT
+        breaker.before_call()
+
+    def test_open_circuit_results_in_504(self):
+        """Tests that views fail fast into the 504 path while the circuit is open"""
+        self.fail_calls(upstream.BREAKER_MIN_CALLS)
+        with mock.patch("core.upstream.get_session", return_value=self.session):
+            response = self.client.get("/api/l-number-redirection/L2018:1200")
+        self.assertEqual(response.status_code, 504)
@@ -0,0 +1,95 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ...models import Lamning
+from ...utilities import validate_geojson
+
+
+class LamningExportTest(TestCase):
+    """Tests related to the lamning export API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="test", password="31(21)2HJHJ")
+        cls.user.save()
+
+        for i in range(3):
+            lamning = Lamning.objects.create(
+                title=f"Testlämning {i}",
+                description="Testlämning",
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+                observation_type="FO",
+                user=cls.user,
+            )
+            lamning.tags.add("testtagg", f"testtagg_{i}")
+
+    def export(self, requested_format):
+        self.client.force_login(user=self.user)
+        response = self.client.get(reverse("api_lamnings_export") + f"?format={requested_format}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def test_tsv_export(self):
+        """Tests that the TSV export holds a header and one row per lamning"""
+        response, content = self.export("tsv")
+        self.assertEqual(response["Content-Type"], "text/tsv")
+
+        rows = list(csv.reader(StringIO(content), delimiter="\t"))
+        self.assertEqual(rows[0][0], "id")
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][5], "test")
+        self.assertIn("testtagg", rows[1][4].split("|"))
+
+    def test_geojson_export(self):
+        """Tests that the GeoJSON export is a valid FeatureCollection"""
+        response, content = self.export("geojson")
+        self.assertEqual(response["Content-Type"], "application/geo+json")
+        self.assertEqual(validate_geojson(content), True)
+        self.assertEqual(len(json.loads(content)["features"]), 3)
+
+    def test_jsonld_export(self):
+        """Tests that the JSON-LD export is wrapped in the usual context"""
+        response, content = self.export("jsonld")
+        self.assertEqual(response["Content-Type"], "application/ld+json")
+
+        data = json.loads(content)
+        self.assertEqual(data["@context"][0], "https://www.w3.org/ns/anno.jsonld")
+        self.assertEqual(len(data["@graph"]), 3)
+        self.assertEqual(data["@graph"][0]["@type"], "schema:CreativeWork")
+
+    def test_export_requires_login(self):
+        """Tests that anonymous users can not export lamnings"""
+        response = self.client.get(reverse("api_lamnings_export") + "?format=geojson")
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_query_count(self):
+        """Tests that the number of queries does not depend on the number of exported lamnings"""
+        self.client.force_login(user=self.user)
+
+        def consume(requested_format):
+            response = self.client.get(reverse("api_lamnings_export") + f"?format={requested_format}")
+            return b"".join(response.streaming_content)
+
+        # session, user, lamnings with users and tags
+        for requested_format in ["tsv", "geojson", "jsonld"]:
+            with self.assertNumQueries(4):
+                consume(requested_format)
+
+        for i in range(10):
+            lamning = Lamning.objects.create(
+                title=f"Fler lämningar {i}",
+                description="Testlämning",
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+                user=self.user,
+            )
+            lamning.tags.add(f"fler_{i}")
+
+        for requested_format in ["tsv", "geojson", "jsonld"]:
+            with self.assertNumQueries(4):
+                consume(requested_format)
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+
+class UpstreamStatusViewTest(TestCase):
+    '''Tests the upstream status API'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        cls.admin = User.objects.create_superuser(username='admin', password='31(21)2HJHJ')
+
+    def test_requires_admin(self):
+        '''Tests that only admins can see the status'''
+        response = self.client.get(reverse('api_upstream_status'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api_upstream_status'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_status(self):
+        '''Tests that the circuit state of every service is listed'''
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('api_upstream_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()['raa']['state'], ['closed', 'open', 'half_open'])
+        self.assertIn('kulturarvsdata', response.json())
@@ -0,0 +1,139 @@
+import asyncio
+import tempfile
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+
+from ... import async_utilities, async_views
+from ...models import KMRLamningType, LNumberResolution
+from ...urls import content_negotiation
+
+UUID = '401055fc-e795-4e2c-8e34-c45dfde18e61'
+RAA_PAYLOAD = {
+    'lamning_id': UUID,
+    'lamningsnummer': 'L1975:5318',
+    'lamningstyp_namn': 'Borg',
+    'beskrivning': 'Borgruin, 150x100 m.',
+    'publicerad_av_organisation': 'Riksantikvarieämbetet',
+    'nuvarande_lage': {
+        'geometri': {'type': 'Point', 'coordinates': [17.0122, 58.7527]},
+        'geografisk_indelning': {
+            'socken': [{'socken_namn': 'Nyköping'}],
+            'landskap': [{'landskap_namn': 'Södermanland'}],
+        },
+    },
+}
+LAYERS = 'arkreg_v1.0:publicerade_lamningar_geometrier,arkreg_v1.0:publicerade_lamningar_centrumpunkt'
+CLICK = {
+    'SERVICE': 'WMS', 'VERSION': '1.3.0', 'REQUEST': 'GetFeatureInfo', 'QUERY_LAYERS': LAYERS, 'LAYERS': LAYERS,
+    'INFO_FORMAT': 'application/json', 'CRS': 'EPSG:3857', 'WIDTH': 256, 'HEIGHT': 256, 'I': 10, 'J': 10,
+    'BBOX': '0,0,2560,2560',
+}
+
+
+def upstream_response(status_code=200, **kwargs):
+    return mock.AsyncMock(return_value=httpx.Response(status_code, **kwargs))
+
+
+class AsyncViewsTest(TestCase):
+    '''Tests the async versions of the upstream-bound views'''
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def test_raa_lamning(self):
+        '''Tests that KMR lamnings are fetched with the async client and cached'''
+        with mock.patch('core.upstream.aget', upstream_response(json=RAA_PAYLOAD)) as aget:
+            response = await async_views.raa_lamning(self.factory.get(f'/raa/lamning/{UUID}'), UUID)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Borg (L1975:5318) Nyköping socken, Södermanland', response.content.decode())
+
+            await async_views.raa_lamning(self.factory.get(f'/raa/lamning/{UUID}'), UUID)
+        self.assertEqual(aget.await_count, 1)
+
+    async def test_raa_lamning_errors(self):
+        '''Tests that missing lamnings give a 404 and upstream errors a 504'''
+        with mock.patch('core.upstream.aget', upstream_response(404, json={})):
+            response = await async_views.raa_lamning(self.factory.get(f'/raa/lamning/{UUID}'), UUID)
+        self.assertEqual(response.status_code, 404)
+
+        cache.clear()
+        with mock.patch('core.upstream.aget', side_effect=requests.exceptions.ConnectTimeout):
+            response = await async_views.raa_lamning(self.factory.get(f'/raa/lamning/{UUID}'), UUID)
+        self.assertEqual(response.status_code, 504)
+
+    async def test_identification_resolver(self):
+        '''Tests that L-numbers are resolved with the async client and stored'''
+        search = {'total_size': 1, 'results': [{'lamning_id': UUID}]}
+        with mock.patch('core.upstream.apost', upstream_response(json=search)) as apost:
+            response = await async_views.identification_resolver(self.factory.get('/'), 'L1975:5318')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.url, f'https://fornpunkt.se/raa/lamning/{UUID}')
+
+            await async_views.identification_resolver(self.factory.get('/'), 'L1975:5318')
+        self.assertEqual(apost.await_count, 1)
+        self.assertTrue(await LNumberResolution.objects.filter(l_number='L1975:5318', uuid=UUID).aexists())
+
+    async def test_get_feature_info(self):
+        '''Tests that map clicks are proxied, cached and validated'''
+        features = {'type': 'FeatureCollection', 'features': []}
+        with mock.patch('core.upstream.aget', upstream_response(json=features)) as aget:
+            response = await async_views.get_feature_info(self.factory.get('/raa/wms-proxy', CLICK))
+            self.assertEqual(response.status_code, 200)
+            await async_views.get_feature_info(self.factory.get('/raa/wms-proxy', CLICK))
+        self.assertEqual(aget.await_count, 1)
+
+        response = await async_views.get_feature_info(self.factory.get('/raa/wms-proxy', {'I': 'a'}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_lantmateriet_proxy(self):
+        '''Tests that tiles fetched with the async client are stored in the tile cache'''
+        route = 'open/topowebb-ccby/v1/wmts/1.0.0/topowebb/default/3857/5/16/17.png'
+        headers = {'Content-Type': 'image/png', 'Cache-Control': 'max-age=3600'}
+        with tempfile.TemporaryDirectory() as directory, override_settings(LANTMATERIET_TILE_CACHE_DIR=directory):
+            with mock.patch('core.upstream.aget', upstream_response(content=b'tile', headers=headers)) as aget:
+                response = await async_views.lantmateriet_proxy(self.factory.get('/'), route)
+                self.assertEqual(response['X-Cache'], 'MISS')
+                self.assertEqual(b''.join(response.streaming_content), b'tile')
+                response.close()
+
+                response = await async_views.lantmateriet_proxy(self.factory.get('/'), route)
+                self.assertEqual(response['X-Cache'], 'HIT')
+                response.close()
+            self.assertEqual(aget.await_count, 1)
+
+    async def test_raa_type(self):
+        '''Tests that a page of a KMR lamning type is rendered and the next page prefetched'''
+        await KMRLamningType.objects.acreate(name='Boplats', raa_id=74, description='Plats där människor bott.', slug='boplats')
+        page = {'total': 250, 'results': [{'id': UUID, 'description': 'Sida 1', 'type': 'Boplats', 'label': 'L2018:1200'}]}
+        with mock.patch('core.async_utilities.aget_soch_search_result', mock.AsyncMock(return_value=page)) as search:
+            response = await async_views.raa_type(self.factory.get('/raa/typer/boplats'), 'boplats')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Sida 1', response.content.decode())
+
+            await asyncio.gather(*async_utilities._background_tasks)
+        self.assertEqual(search.await_count, 2)
+        self.assertEqual(search.await_args.kwargs['offset'], 100)
+        self.assertEqual((await KMRLamningType.objects.aget(slug='boplats')).total_hits, 250)
+
+    async def test_concurrent_calls_are_coalesced(self):
+        '''Tests that concurrent callers of the same key share a single call'''
+        calls = list()
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        results = await asyncio.gather(*(async_utilities.acoalesced_call('test', fetch) for _ in range(5)))
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_content_negotiation_of_async_views(self):
+        '''Tests that content negotiation including an async view is itself async'''
+        self.assertTrue(iscoroutinefunction(content_negotiation({}, async_views.raa_lamning)))
@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
@@ -57,4 +59,97 @@ class BBOXAPITest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(validate_geojson(response.content), True)
         self.assertEqual(response['Content-Type'], 'application/geo+json')
-        self.assertContains(response, lamning.title)
\ No newline at end of file
+        self.assertContains(response, lamning.title)
+
+    def test_lamnings_without_geojson_feature(self):
+        '''Tests that lamnings missing a pre-encoded feature are built in bulk rather than per lamning'''
+        user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        for number in range(5):
+            lamning = Lamning.objects.create(
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+                title=f'Test {number}',
+                description='Test beskrivning',
+                user=user,
+            )
+            lamning.tags.add('testtagg')
+        Lamning.objects.update(geojson_feature='')
+
+        # the lamnings, their rows again with users and their tags
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('bbox') + '?south=60.06115&east=13.43&north=60.60&west=13.0557', **self.headers)
+        features = json.loads(response.content)['features']
+        self.assertEqual(len(features), 5)
+        self.assertEqual(features[0]['properties']['tags'], ['testtagg'])
+
+
+    def test_response_across_grid_cells(self):
+        '''Tests that lamnings in different grid cells are returned while lamnings outside the box are not'''
+        user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        user.save()
+
+        inside_west = Lamning.objects.create(
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+            title='Väster',
+            description='Test beskrivning',
+            user=user,
+        )
+        inside_east = Lamning.objects.create(
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.3512,60.3012]}}',
+            title='Öster',
+            description='Test beskrivning',
+            user=user,
+        )
+        # same grid cell as inside_west but outside the requested box
+        outside = Lamning.objects.create(
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0501,60.5963]}}',
+            title='Utanför',
+            description='Test beskrivning',
+            user=user,
+        )
+        self.assertNotEqual(inside_west.grid_cell, inside_east.grid_cell)
+        self.assertEqual(inside_west.grid_cell, outside.grid_cell)
+
+        response = self.client.get(reverse('bbox') + '?south=60.06115&east=13.43&north=60.60&west=13.0557', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, inside_west.title)
+        self.assertContains(response, inside_east.title)
+        self.assertNotContains(response, outside.title)
+
+    def test_clustered_response(self):
+        '''Tests that clustered requests return one feature per occupied cell and are allowed for large boxes'''
+        user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        user.save()
+
+        for coordinates in ['[13.0743,60.5963]', '[13.0812,60.5912]', '[16.3512,59.0812]']:
+            Lamning.objects.create(
+                geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":%s}}' % coordinates,
+                title='Test',
+                description='Test beskrivning',
+                user=user,
+            )
+
+        response = self.client.get(reverse('bbox') + '?south=55&east=20&north=65&west=10&cluster=0.5', **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(validate_geojson(response.content), True)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+
+        features = json.loads(response.content)['features']
+        self.assertEqual(sorted(f['properties']['count'] for f in features), [1, 2])
+        for feature in features:
+            self.assertEqual(feature['properties']['cluster'], True)
+            self.assertEqual(len(feature['properties']['lamning_id']), 7)
+
+    def test_clustered_response_limits(self):
+        '''Tests that clustered requests with too many cells or invalid cell sizes are rejected'''
+        response = self.client.get(reverse('bbox') + '?south=55&east=20&north=65&west=10&cluster=0.01', **self.headers)
+        self.assertContains(response, 'Felaktig förfrågan.', status_code=400)
+
+        response = self.client.get(reverse('bbox') + '?south=55&east=20&north=65&west=10&cluster=0', **self.headers)
+        self.assertContains(response, 'Felaktig förfrågan.', status_code=400)
+
+        response = self.client.get(reverse('bbox') + '?south=55&east=20&north=65&west=10&cluster=stor', **self.headers)
+        self.assertContains(response, 'Minst en parameter har ett felaktigt värde.', status_code=400)
+
+        # large boxes are still rejected without clustering
+        response = self.client.get(reverse('bbox') + '?south=55&east=20&north=65&west=10', **self.headers)
+        self.assertContains(response, 'Felaktig förfrågan.', status_code=400)
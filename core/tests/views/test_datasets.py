@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ...models import Comment, Lamning
+
+
+class DatasetDescriptionViewTest(TestCase):
+    '''Tests the DCAT/VoID description of our datasets'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        cls.lamning = Lamning.objects.create(
+            title='Testlämning',
+            description='Testlämning',
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+            observation_type='FO',
+            user=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_description(self):
+        '''Tests that the description is generated from the current statistics'''
+        response = self.client.get(reverse('datasets'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/turtle; charset=utf-8')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        content = response.content.decode()
+        self.assertIn('void:entities 1 ;\n    void:uriSpace "https://fornpunkt.se/lamning/"', content)
+        self.assertIn('<https://fornpunkt.se/apis/export/lamnings?format=geojson>', content)
+        self.assertIn('foaf:mbox <mailto:hej@fornpunkt.se>', content)
+
+    def test_access_rights(self):
+        '''Tests that distributions requiring authentication are marked as such'''
+        content = self.client.get(reverse('datasets')).content.decode()
+        for line in content.splitlines():
+            if 'dcat:accessURL' in line:
+                self.assertIn('dcterms:accessRights', line)
+        self.assertIn(
+            "format=tsv> ; dcat:mediaType \"text/tab-separated-values\" ; "
+            "dcterms:accessRights <https://fornpunkt.se/datasets#inloggad>",
+            content
+        )
+
+    @mock.patch('core.views.cache_is_shared', return_value=True)
+    def test_conditional_requests(self, shared):
+        '''Tests that unchanged descriptions result in 304 responses without queries'''
+        etag = self.client.get(reverse('datasets'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('datasets'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_private_cache_is_not_used(self):
+        '''Tests that the description is not cached in a cache private to the process, which other workers can't invalidate'''
+        etag = self.client.get(reverse('datasets'))['ETag']
+        # bulk_create() sends no signals, like a change made by another worker
+        Comment.objects.bulk_create([Comment(user=self.user, content='Kommentar', lamning=self.lamning)])
+
+        response = self.client.get(reverse('datasets'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch('core.views.cache_is_shared', return_value=True)
+    def test_invalidated_on_changes(self, shared):
+        '''Tests that the description is regenerated when the data changes'''
+        etag = self.client.get(reverse('datasets'))['ETag']
+        Comment.objects.create(user=self.user, content='Kommentar', lamning=self.lamning)
+
+        response = self.client.get(reverse('datasets'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
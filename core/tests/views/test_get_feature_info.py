@@ -0,0 +1,69 @@
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+LAYERS = 'arkreg_v1.0:publicerade_lamningar_geometrier,arkreg_v1.0:publicerade_lamningar_centrumpunkt'
+FEATURES = {'type': 'FeatureCollection', 'features': [{'properties': {'lamning_id': '13dfb99b-db36-4ac6-975c-1bc606dea81b'}}]}
+
+
+def click(bbox, size, i, j, **extra):
+    return {
+        'SERVICE': 'WMS', 'VERSION': '1.3.0', 'REQUEST': 'GetFeatureInfo', 'FORMAT': 'image/png',
+        'QUERY_LAYERS': LAYERS, 'LAYERS': LAYERS, 'INFO_FORMAT': 'application/json', 'FEATURE_COUNT': 10,
+        'CRS': 'EPSG:3857', 'STYLES': '', 'WIDTH': size, 'HEIGHT': size, 'I': i, 'J': j,
+        'BBOX': ','.join(str(value) for value in bbox), **extra,
+    }
+
+
+class GetFeatureInfoViewTest(TestCase):
+    '''Tests the KMR GetFeatureInfo proxy'''
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, params, side_effect=None):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = FEATURES
+        with mock.patch('core.views.upstream.get', return_value=response, side_effect=side_effect) as get:
+            result = self.client.get(reverse('proxy'), params)
+        return result, get
+
+    def test_clicks_on_the_same_pixel_share_a_cached_response(self):
+        '''Tests that a pixel clicked in a tile and in an image results in a single upstream request'''
+        response, get = self.get(click((0, 0, 2560, 2560), 256, 10, 10, TILED='true'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), FEATURES)
+        params = get.call_args.kwargs['params']
+        self.assertEqual((params['WIDTH'], params['I'], params['FEATURE_COUNT']), (5, 2, 10))
+        self.assertNotIn('TILED', params)
+
+        response, get = self.get(click((-400, 1950, 610, 2960), 101, 50, 50))
+        self.assertEqual(response.json(), FEATURES)
+        get.assert_not_called()
+
+    def test_different_pixels(self):
+        '''Tests that neighbouring pixels are not mixed up'''
+        _, first = self.get(click((0, 0, 2560, 2560), 256, 10, 10))
+        _, second = self.get(click((0, 0, 2560, 2560), 256, 11, 10))
+        self.assertNotEqual(first.call_args.kwargs['params']['BBOX'], second.call_args.kwargs['params']['BBOX'])
+
+    def test_invalid_requests(self):
+        '''Tests that unsupported queries are rejected without an upstream request'''
+        for params in (
+            click((0, 0, 2560, 2560), 256, 10, 10, CRS='EPSG:4326'),
+            click((0, 0, 2560, 2560), 256, 10, 10, QUERY_LAYERS='other:layer'),
+            click((0, 0, 2560, 2560), 0, 10, 10),
+            {'BBOX': 'a,b,c,d'},
+        ):
+            response, get = self.get(params)
+            self.assertEqual(response.status_code, 400)
+            get.assert_not_called()
+
+    def test_upstream_error(self):
+        '''Tests that upstream errors result in a JSON 504'''
+        response, _ = self.get(click((0, 0, 2560, 2560), 256, 10, 10), side_effect=requests.exceptions.ReadTimeout)
+        self.assertEqual(response.status_code, 504)
+        self.assertIn('error', response.json())
@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+
+import requests
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ...models import AccessToken, KMRRecord
+
+MIRRORED = "13dfb99b-db36-4ac6-975c-1bc606dea81b"
+UNKNOWN = "9ce3e04e-7959-4075-b4dc-8f0cd2207304"
+
+
+def resolve_l_number(l_number):
+    if l_number == "L2018:1200":
+        return MIRRORED
+    if l_number == "L2018:1":
+        raise requests.exceptions.ConnectTimeout
+    return None
+
+
+class IdentificationResolverBatchViewTest(TestCase):
+    '''Tests the batch identification resolver API view'''
+    @classmethod
+    def setUpTestData(cls):
+        KMRRecord.objects.create(
+            uuid=MIRRORED, title='Boplats', description='', geojson='{}', author='RAÄ', payload={},
+            fetched_time=timezone.now()
+        )
+
+    def post(self, body, content_type='application/json', query=''):
+        with mock.patch('core.views.resolve_l_number', side_effect=resolve_l_number), \
+                mock.patch('core.utilities.upstream.head') as head, \
+                mock.patch('core.kmr_index.get_index', return_value=None):
+            head.return_value.status_code = 404
+            response = self.client.post(
+                reverse('identification_resolver_batch') + query, body, content_type=content_type
+            )
+        self.head = head
+        return response
+
+    def test_json_batch(self):
+        '''Tests per identifier statuses of a JSON list'''
+        response = self.post(json.dumps([MIRRORED, UNKNOWN, 'L2018:1200', 'L1998:99999', 'L2018:1', 'badvalue']))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data[MIRRORED], {
+            'status': 'found', 'uuid': MIRRORED, 'url': f'https://fornpunkt.se/raa/lamning/{MIRRORED}'
+        })
+        self.assertEqual(data['L2018:1200']['uuid'], MIRRORED)
+        self.assertEqual(data[UNKNOWN], {'status': 'not_found'})
+        self.assertEqual(data['L1998:99999'], {'status': 'not_found'})
+        self.assertEqual(data['L2018:1'], {'status': 'error'})
+        self.assertEqual(data['badvalue'], {'status': 'invalid'})
+
+        # only the UUID that is not mirrored locally is checked upstream
+        self.head.assert_called_once()
+
+    def test_ndjson_batch(self):
+        '''Tests NDJSON input and external targets'''
+        response = self.post(f'"{MIRRORED}"\n"L2018:1200"\n', 'application/x-ndjson', '?target=kulturarvsdata')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['L2018:1200']['url'], f'https://kulturarvsdata.se/raa/lamning/{MIRRORED}')
+
+    def test_bad_requests(self):
+        '''Tests malformed and too large batches'''
+        self.assertEqual(self.post('not json').status_code, 400)
+        self.assertEqual(self.post(json.dumps({'identifiers': [MIRRORED]})).status_code, 400)
+        self.assertEqual(self.post(json.dumps([MIRRORED] * 1001)).status_code, 400)
+
+    def test_anonymous_batch_limit(self):
+        '''Tests that anonymous callers can send smaller batches than callers with an access token'''
+        identifiers = [f'L2018:{number}' for number in range(100, 151)]
+        self.assertEqual(self.post(json.dumps(identifiers)).status_code, 400)
+
+        user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        token = AccessToken.objects.create(user=user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.token}'
+        self.assertEqual(self.post(json.dumps(identifiers)).status_code, 200)
+
+    def test_uuids_are_normalized(self):
+        '''Tests that uppercase, braced and unhyphenated UUIDs are resolved from the local mirror'''
+        spellings = [MIRRORED.upper(), '{' + MIRRORED + '}', MIRRORED.replace('-', '')]
+        data = self.post(json.dumps(spellings)).json()
+        for spelling in spellings:
+            self.assertEqual(data[spelling]['uuid'], MIRRORED)
+        self.head.assert_not_called()
+
+    def test_get_not_allowed(self):
+        '''Tests that the batch resolver only accepts POST'''
+        response = self.client.get(reverse('identification_resolver_batch'))
+        self.assertEqual(response.status_code, 405)
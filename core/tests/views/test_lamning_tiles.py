@@ -0,0 +1,102 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ...models import Lamning
+from ...utilities import validate_geojson
+from ...vector_tiles import encode_geometry, tile_bounds
+
+
+class LamningTileAPITest(TestCase):
+    '''Tests of the vector tile API'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.headers = {
+            'HTTP_USER_AGENT': 'Maskros',
+        }
+        cls.user = User.objects.create_user(username='test', password='31(21)2HJHJ')
+        cls.user.save()
+
+        cls.lamning = Lamning.objects.create(
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+            title='Testlämning',
+            description='Test beskrivning',
+            user=cls.user,
+        )
+        cls.lamning.tags.add('testtagg')
+
+    def test_geojson_tile(self):
+        '''Tests that the GeoJSON tile holds the lamnings within the tile'''
+        response = self.client.get(reverse('lamning_tile_geojson', kwargs={'z': 14, 'x': 8787, 'y': 4703}), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(validate_geojson(response.content), True)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        self.assertIn('max-age', response['Cache-Control'])
+
+        data = json.loads(response.content)
+        self.assertEqual(len(data['features']), 1)
+        self.assertEqual(data['features'][0]['properties']['title'], 'Testlämning')
+
+    def test_geojson_tile_without_lamnings(self):
+        '''Tests that neighbouring tiles do not hold the lamning'''
+        response = self.client.get(reverse('lamning_tile_geojson', kwargs={'z': 14, 'x': 8788, 'y': 4703}), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['features']), 0)
+
+    def test_geojson_tile_border(self):
+        '''Tests that a lamning on the border of two tiles is only held by one of them'''
+        west, _, _, _ = tile_bounds(14, 8832, 4703)
+        Lamning.objects.create(
+            geojson=json.dumps({'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [west, 60.5963]}}),
+            title='Gränslämning',
+            description='Test beskrivning',
+            user=self.user,
+        )
+
+        holding = list()
+        for x in (8831, 8832):
+            response = self.client.get(reverse('lamning_tile_geojson', kwargs={'z': 14, 'x': x, 'y': 4703}), **self.headers)
+            titles = [feature['properties']['title'] for feature in json.loads(response.content)['features']]
+            if 'Gränslämning' in titles:
+                holding.append(x)
+        self.assertEqual(holding, [8832])
+
+    def test_mvt_tile(self):
+        '''Tests that the vector tile is encoded with the lamning properties'''
+        response = self.client.get(reverse('lamning_tile_mvt', kwargs={'z': 14, 'x': 8787, 'y': 4703}), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn(b'lamnings', response.content)
+        self.assertIn('Testlämning'.encode('utf-8'), response.content)
+        self.assertIn(self.lamning.hashid.encode('utf-8'), response.content)
+
+    def test_empty_mvt_tile(self):
+        '''Tests that tiles without lamnings are empty'''
+        response = self.client.get(reverse('lamning_tile_mvt', kwargs={'z': 14, 'x': 100, 'y': 100}), **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+
+    def test_invalid_tile(self):
+        '''Tests that low zoom levels and tiles outside of the world are rejected'''
+        response = self.client.get(reverse('lamning_tile_mvt', kwargs={'z': 4, 'x': 8, 'y': 4}), **self.headers)
+        self.assertContains(response, 'Felaktig förfrågan.', status_code=400)
+
+        response = self.client.get(reverse('lamning_tile_geojson', kwargs={'z': 14, 'x': 16384, 'y': 4703}), **self.headers)
+        self.assertContains(response, 'Felaktig förfrågan.', status_code=400)
+
+    def test_polygon_clipping(self):
+        '''Tests that polygons are clipped to the tile and encoded as a single closed ring'''
+        # z14 tile 8787/4703 spans roughly 13.074-13.096 lon, the polygon extends past both of its edges
+        polygon = {
+            'type': 'Polygon',
+            'coordinates': [[[13.07, 60.59], [13.2, 60.59], [13.2, 60.6], [13.07, 60.6], [13.07, 60.59]]],
+        }
+        geometry_type, commands = encode_geometry(polygon, 14, 8787, 4703)
+        self.assertEqual(geometry_type, 3)
+        # MoveTo(1), LineTo(n), ClosePath(1)
+        self.assertEqual(commands[0], 9)
+        self.assertEqual(commands[-1], 15)
+        self.assertEqual(commands[3] & 0x7, 2)
@@ -0,0 +1,119 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from requests.structures import CaseInsensitiveDict
+import requests
+
+from ... import tile_cache
+
+
+def upstream_response(status_code=200, content=b'tile', headers=None):
+    response = mock.Mock(status_code=status_code)
+    response.headers = CaseInsensitiveDict({'Content-Type': 'image/png', **(headers or {})})
+    response.iter_content.return_value = [content]
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    return response
+
+
+class LantmaterietProxyTest(TestCase):
+    '''Tests the disk cache of the Lantmäteriet proxy'''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(LANTMATERIET_TILE_CACHE_DIR=self.directory.name)
+        self.settings.enable()
+        self.url = reverse('lantmateriet_proxy', kwargs={'route': 'open/topowebb-ccby/v1/wmts/1.0.0/topowebb/default/3857/5/16/17.png'})
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def get(self, response, query='?a=1&B=2'):
+        with mock.patch('core.views.upstream.get', return_value=response) as get:
+            result = self.client.get(self.url + query)
+            content = b''.join(result.streaming_content) if result.streaming else result.content
+        return result, content, get
+
+    def test_miss_then_hit(self):
+        '''Tests that tiles are stored and served from disk for normalized queries'''
+        response, content, get = self.get(upstream_response(headers={'Cache-Control': 'max-age=3600', 'ETag': '"1"'}))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(content, b'tile')
+
+        response, content, get = self.get(upstream_response(content=b'other'), query='?b=2&A=1')
+        get.assert_not_called()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response['ETag'], '"1"')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(content, b'tile')
+
+    def test_revalidation(self):
+        '''Tests that expired tiles are revalidated with conditional requests'''
+        self.get(upstream_response(headers={'Cache-Control': 'no-cache', 'ETag': '"1"'}))
+
+        response, content, get = self.get(upstream_response(status_code=304, headers={'Cache-Control': 'max-age=60'}))
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"1"')
+        self.assertEqual(response['X-Cache'], 'REVALIDATED')
+        self.assertEqual(content, b'tile')
+
+        response, content, get = self.get(upstream_response())
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_stale_tile_on_upstream_error(self):
+        '''Tests that expired tiles are served when Lantmäteriet is unavailable'''
+        self.get(upstream_response(headers={'Cache-Control': 'no-cache'}))
+        response, content, _ = self.get(upstream_response(status_code=503))
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(content, b'tile')
+
+        failed = upstream_response(status_code=503)
+        response, _, _ = self.get(failed, query='?uncached=1')
+        self.assertEqual(response.status_code, 504)
+        # the streamed connection is returned to the pool
+        failed.close.assert_called_once()
+
+    def test_read_error(self):
+        '''Tests that a failing read from Lantmäteriet results in a 504 without leaving partial files behind'''
+        response = upstream_response(headers={'Cache-Control': 'max-age=3600'})
+        response.iter_content.side_effect = requests.exceptions.ConnectionError()
+        response, _, _ = self.get(response)
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual([files for _, _, files in os.walk(self.directory.name) if files], [])
+
+    def test_tile_evicted_during_request(self):
+        '''Tests that a tile evicted by another worker while Lantmäteriet is asked about it is still served'''
+        self.get(upstream_response(headers={'Cache-Control': 'no-cache'}))
+
+        for status_code, cache_status in ((304, 'REVALIDATED'), (503, 'STALE')):
+            def evict_and_respond(*args, **kwargs):
+                tile_cache.evict(max_size=0)
+                return upstream_response(status_code=status_code)
+
+            with mock.patch('core.views.upstream.get', side_effect=evict_and_respond):
+                response = self.client.get(self.url + '?a=1&B=2')
+                self.assertEqual(response['X-Cache'], cache_status)
+                self.assertEqual(b''.join(response.streaming_content), b'tile')
+            # restores the evicted tile
+            self.get(upstream_response(headers={'Cache-Control': 'no-cache'}))
+
+    def test_no_store(self):
+        '''Tests that responses which may not be stored are passed through'''
+        response, content, _ = self.get(upstream_response(headers={'Cache-Control': 'no-store'}))
+        self.assertEqual(content, b'tile')
+        response, _, get = self.get(upstream_response(headers={'Cache-Control': 'no-store'}))
+        get.assert_called_once()
+
+    def test_eviction(self):
+        '''Tests that the least recently used tiles are evicted first'''
+        for key, age in (('a' * 64, 30), ('b' * 64, 20), ('c' * 64, 10)):
+            tile = tile_cache.store(key, [b'x' * 100], {}, 0)
+            os.utime(tile['path'], (0, 1000 - age))
+
+        tile_cache.evict(max_size=250)
+        self.assertIsNone(tile_cache.get('a' * 64))
+        self.assertIsNotNone(tile_cache.get('b' * 64))
+        self.assertIsNotNone(tile_cache.get('c' * 64))
@@ -0,0 +1,132 @@
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.test import TestCase
+from django.urls import reverse
+
+from ...models import Comment, CustomTag, KMRLamningType, Lamning
+
+
+@mock.patch('core.page_cache.cache_is_shared', return_value=True)
+class PageCacheTest(TestCase):
+    '''Tests the cache of pages rendered for anonymous visitors'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='31(21)2HJHJ')
+        cls.lamning = Lamning.objects.create(
+            title='Testlämning',
+            description='Testlämning',
+            geojson='{"type":"Feature","geometry":{"type":"Point","coordinates":[13.0743,60.5963]}}',
+            observation_type='FO',
+            user=cls.user
+        )
+        cls.lamning.tags.add('testtagg')
+        cls.tag = CustomTag.objects.get(slug='testtagg')
+
+    def setUp(self):
+        cache.clear()
+
+    def lamning_url(self):
+        return reverse('lamning', kwargs={'pk': self.lamning.pk})
+
+    def tag_url(self):
+        return reverse('tag', kwargs={'slug': 'testtagg'})
+
+    def test_anonymous_pages_are_cached(self, shared):
+        '''Tests that a second anonymous request is served without querying the database'''
+        for url in (self.lamning_url(), self.tag_url(), reverse('tag_list'), reverse('raa_type_list'), reverse('map')):
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'HIT')
+            self.assertEqual(response.status_code, 200)
+
+    def test_key_includes_query_and_content_type(self, shared):
+        '''Tests that other query strings and negotiated representations are not served the cached page'''
+        self.client.get(reverse('tag_list'))
+        self.assertEqual(self.client.get(reverse('tag_list') + '?sida=1')['X-Page-Cache'], 'MISS')
+
+        self.client.get(self.lamning_url())
+        response = self.client.get(self.lamning_url(), HTTP_ACCEPT='application/ld+json')
+        self.assertEqual(response['Content-Type'], 'application/ld+json')
+
+    def test_authenticated_users_bypass_cache(self, shared):
+        '''Tests that logged in users get freshly rendered pages which are not stored'''
+        self.client.force_login(user=self.user)
+        response = self.client.get(self.lamning_url())
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, 'Redigera')
+
+        self.client.logout()
+        response = self.client.get(self.lamning_url())
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, 'Redigera')
+
+    def test_lamning_changes_purge_pages(self, shared):
+        '''Tests that changing a lamning purges its page and the pages of its tags'''
+        self.client.get(self.lamning_url())
+        self.client.get(self.tag_url())
+        self.client.get(reverse('tag_list'))
+
+        self.lamning.title = 'Ändrad lämning'
+        self.lamning.save()
+        self.assertContains(self.client.get(self.lamning_url()), 'Ändrad lämning')
+        self.assertContains(self.client.get(self.tag_url()), 'Ändrad lämning')
+        # pages not showing the lamning are kept
+        self.assertEqual(self.client.get(reverse('tag_list'))['X-Page-Cache'], 'HIT')
+
+        self.lamning.delete()
+        self.assertNotContains(self.client.get(self.tag_url()), 'Ändrad lämning')
+
+    def test_tagging_purges_pages(self, shared):
+        '''Tests that adding and removing tags purges the pages of the lamning and the tags'''
+        self.client.get(self.lamning_url())
+        self.client.get(reverse('tag', kwargs={'slug': 'ny-tagg'}))
+
+        self.lamning.tags.add('ny tagg')
+        self.assertContains(self.client.get(self.lamning_url()), 'ny tagg')
+        self.assertContains(self.client.get(reverse('tag', kwargs={'slug': 'ny-tagg'})), 'Testlämning')
+
+        self.lamning.tags.clear()
+        self.assertNotContains(self.client.get(self.tag_url()), 'Testlämning')
+
+    def test_comment_tag_and_user_changes_purge_pages(self, shared):
+        '''Tests that comments, tags and users purge the pages showing them'''
+        self.client.get(self.lamning_url())
+        Comment.objects.create(user=self.user, lamning=self.lamning, content='En testkommentar')
+        self.assertContains(self.client.get(self.lamning_url()), 'En testkommentar')
+
+        self.tag.name = 'Omdöpt tagg'
+        self.tag.save()
+        self.assertContains(self.client.get(self.lamning_url()), 'Omdöpt tagg')
+        self.assertContains(self.client.get(reverse('tag_list')), 'Omdöpt tagg')
+
+        self.user.first_name = 'Testa'
+        self.user.save()
+        self.assertContains(self.client.get(self.tag_url()), 'Testa')
+
+        self.client.get(reverse('raa_type_list'))
+        KMRLamningType.objects.create(name='Boplats', slug='boplats', raa_id=1, description='')
+        self.assertContains(self.client.get(reverse('raa_type_list')), 'Boplats')
+
+    def test_pages_with_messages_are_not_cached(self, shared):
+        '''Tests that pending messages skip the cache so that they are shown to the visitor'''
+        self.client.get(reverse('map'))
+
+        storage = CookieStorage(HttpRequest())
+        self.client.cookies['messages'] = storage._encode([Message(messages.INFO, 'Ett meddelande')])
+        response = self.client.get(reverse('map'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_private_cache_is_not_used(self, shared):
+        '''Tests that pages are not cached in a cache private to the process, which other workers can't purge'''
+        shared.return_value = False
+        self.client.get(self.lamning_url())
+        response = self.client.get(self.lamning_url())
+        self.assertFalse(response.has_header('X-Page-Cache'))
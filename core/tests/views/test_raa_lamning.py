@@ -1,7 +1,14 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
 from ...models import LamningWikipediaLink
+from ...utilities import format_raa_lamning
+from ...views import raa_lamning_annotations
+from ..models.test_kmr_record import UUID, raa_payload
 
 
 class KmrWikipediaLinkTest(TestCase):
@@ -20,3 +27,46 @@ class KmrWikipediaLinkTest(TestCase):
         response = self.client.get(reverse('raa_lamning', kwargs={'record_id': '401055fc-e795-4e2c-8e34-c45dfde18e61'}))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'https://sv.wikipedia.org/wiki/Nyk%C3%B6pingshus')
+
+
+class RaaLamningConcurrencyTest(TestCase):
+    '''Tests that the KMR lamning is fetched while our annotations are queried'''
+    @classmethod
+    def setUpTestData(cls):
+        LamningWikipediaLink.objects.create(
+            kmr_lamning=UUID,
+            wikipedia='https://sv.wikipedia.org/wiki/Nyk%C3%B6pingshus',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fetch_overlaps_queries(self):
+        '''Tests that the upstream fetch runs in another thread and overlaps the database queries'''
+        queried = threading.Event()
+        overlapped = list()
+
+        def fetch(uuid):
+            # only set if the annotations are queried while the fetch is in flight
+            overlapped.append(queried.wait(timeout=5))
+            return format_raa_lamning(raa_payload(uuid))
+
+        def annotations(record_id):
+            result = raa_lamning_annotations(record_id)
+            queried.set()
+            return result
+
+        with mock.patch('core.utilities.cached_fetch_raa_lamning', side_effect=fetch), \
+                mock.patch('core.views.raa_lamning_annotations', side_effect=annotations):
+            response = self.client.get(reverse('raa_lamning', kwargs={'record_id': UUID}))
+
+        self.assertEqual(overlapped, [True])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Borg (L1975:5318) Nyköping socken, Södermanland')
+        self.assertContains(response, 'https://sv.wikipedia.org/wiki/Nyk%C3%B6pingshus')
+
+    def test_upstream_error(self):
+        '''Tests that upstream errors raised in the worker thread result in a 504'''
+        with mock.patch('core.utilities.cached_fetch_raa_lamning', side_effect=Exception):
+            response = self.client.get(reverse('raa_lamning', kwargs={'record_id': UUID}))
+        self.assertEqual(response.status_code, 504)
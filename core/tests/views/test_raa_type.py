@@ -0,0 +1,66 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ...models import KMRLamningType
+from ..helpers import SynchronousThread
+
+
+def soch_page(query, offset=0, limit=100):
+    return {
+        "total": 250,
+        "results": [
+            {"id": "13dfb99b-db36-4ac6-975c-1bc606dea81b", "description": f"Sida {offset // limit + 1}",
+             "type": "Boplats", "label": "L2018:1200"},
+        ],
+    }
+
+
+class RaaTypeViewTest(TestCase):
+    '''Tests the listing of KMR lamnings of a type'''
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamning_type = KMRLamningType.objects.create(
+            name='Boplats', raa_id=74, description='Plats där människor bott.', slug='boplats'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, page):
+        return self.client.get(reverse('raa_type', kwargs={'slug': 'boplats'}) + f'?sida={page}')
+
+    def test_pages_are_cached_and_prefetched(self):
+        '''Tests that a page is cached, the next page is prefetched and the total is stored'''
+        with mock.patch('core.utilities.get_soch_search_result', side_effect=soch_page) as search, \
+                mock.patch('core.utilities.threading.Thread', SynchronousThread):
+            response = self.get(1)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Sida 1')
+            self.assertEqual(search.call_count, 2)
+            self.assertEqual(search.call_args.kwargs['offset'], 100)
+
+            response = self.get(2)
+            self.assertContains(response, 'Sida 2')
+            self.assertEqual(search.call_count, 3)
+
+            self.get(1)
+            self.assertEqual(search.call_count, 3)
+
+        self.assertEqual(KMRLamningType.objects.get(slug='boplats').total_hits, 250)
+
+    def test_pages_past_the_end(self):
+        '''Tests that pages after the last known page and malformed pages are not requested upstream'''
+        KMRLamningType.objects.filter(slug='boplats').update(total_hits=250)
+        with mock.patch('core.utilities.get_soch_search_result') as search:
+            self.assertEqual(self.get(4).status_code, 404)
+            self.assertEqual(self.get('a').status_code, 404)
+            self.assertEqual(self.get(0).status_code, 404)
+        search.assert_not_called()
+
+    def test_upstream_error(self):
+        '''Tests that upstream errors result in a 504'''
+        with mock.patch('core.utilities.get_soch_search_result', side_effect=Exception):
+            self.assertEqual(self.get(1).status_code, 504)
@@ -0,0 +1,178 @@
+"""
+Disk cache for map tiles proxied from Lantmäteriet.
+
+Each tile is stored as two files named after a hash of its route and normalized query: the body and a JSON
+file with its metadata. The modification time of the body is updated on every hit so that the least recently
+used tiles can be evicted once the cache grows past LANTMATERIET_TILE_CACHE_MAX_SIZE.
+"""
+
+import email.utils
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+# upstream headers stored with a tile and passed on to clients
+PASSTHROUGH_HEADERS = ["Cache-Control", "Expires", "Last-Modified", "ETag", "Access-Control-Allow-Origin"]
+
+# the total size is only checked every this many stored tiles
+EVICTION_INTERVAL = 100
+# eviction removes tiles until the cache is below this share of the maximum size
+EVICTION_TARGET = 0.9
+
+_counters = {"hits": 0, "misses": 0, "revalidations": 0, "stale": 0, "evictions": 0}
+_counters_lock = threading.Lock()
+_writes_since_eviction = 0
+
+
+def count(counter, value=1):
+    with _counters_lock:
+        _counters[counter] += value
+
+
+def get_counters():
+    """Returns the hit and miss counters of this process."""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def cache_key(route: str, query) -> str:
+    """Returns the key of a tile, WMS parameter names are case-insensitive so they are lower cased before sorting."""
+    parameters = sorted((key.lower(), value) for key, values in query.lists() for value in values)
+    normalized = route.strip("/") + "?" + "&".join(f"{key}={value}" for key, value in parameters)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _paths(key):
+    directory = os.path.join(settings.LANTMATERIET_TILE_CACHE_DIR, key[:2])
+    return os.path.join(directory, key), os.path.join(directory, key + ".json")
+
+
+def expiry_from_headers(headers):
+    """Returns when a response expires as a timestamp, 0 if it must be revalidated, or None if it may not be stored."""
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+
+    max_age = re.search(r"(?:^|[\s,])max-age=(\d+)", cache_control)
+    if max_age:
+        return time.time() + int(max_age.group(1))
+
+    if headers.get("Expires"):
+        try:
+            return email.utils.parsedate_to_datetime(headers["Expires"]).timestamp()
+        except (TypeError, ValueError):
+            return 0
+
+    return time.time() + settings.LANTMATERIET_TILE_CACHE_DEFAULT_TTL
+
+
+def get(key):
+    """Returns the metadata of a cached tile with the path of its body, or None if it is not cached."""
+    body_path, metadata_path = _paths(key)
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        # marks the tile as recently used
+        os.utime(body_path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    metadata["path"] = body_path
+    metadata["fresh"] = metadata["expires"] > time.time()
+    return metadata
+
+
+def open_body(tile):
+    """
+    Opens the body of a cached tile, or returns None if it has been evicted since its metadata was read.
+    An opened body can be read even if another worker evicts the tile afterwards.
+    """
+    try:
+        return open(tile["path"], "rb")
+    except FileNotFoundError:
+        return None
+
+
+def store(key, chunks, headers, expires):
+    """Writes a tile to the cache from an iterable of chunks, returns its metadata."""
+    global _writes_since_eviction
+    body_path, metadata_path = _paths(key)
+    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+
+    # written to temporary files first so that readers never see partial tiles
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(body_path), delete=False) as f:
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+        except BaseException:
+            # such as a read timeout from Lantmäteriet, eviction never removes temporary files
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, body_path)
+
+    metadata = {
+        "content_type": headers.get("Content-Type", "application/octet-stream"),
+        "headers": {header: headers[header] for header in PASSTHROUGH_HEADERS if header in headers},
+        "expires": expires,
+    }
+    update(key, metadata)
+
+    with _counters_lock:
+        _writes_since_eviction += 1
+        evict_now = _writes_since_eviction >= EVICTION_INTERVAL
+        if evict_now:
+            _writes_since_eviction = 0
+    if evict_now:
+        evict()
+
+    metadata["path"] = body_path
+    return metadata
+
+
+def update(key, metadata):
+    """Replaces the metadata of a cached tile, used after a successful revalidation."""
+    _, metadata_path = _paths(key)
+    metadata = {k: v for k, v in metadata.items() if k not in ("path", "fresh")}
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(metadata_path), delete=False) as f:
+        json.dump(metadata, f)
+    os.replace(f.name, metadata_path)
+
+
+def evict(max_size=None):
+    """Removes the least recently used tiles until the cache is below its maximum size."""
+    max_size = max_size if max_size is not None else settings.LANTMATERIET_TILE_CACHE_MAX_SIZE
+    tiles = list()
+    total_size = 0
+    for directory, _, files in os.walk(settings.LANTMATERIET_TILE_CACHE_DIR):
+        for name in files:
+            if name.endswith(".json") or name.startswith("tmp"):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            tiles.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+            total_size += stat.st_size
+
+    if total_size <= max_size:
+        return
+
+    for _, size, path in sorted(tiles):
+        for file in (path + ".json", path):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+        count("evictions")
+        total_size -= size
+        if total_size <= max_size * EVICTION_TARGET:
+            break
@@ -0,0 +1,333 @@
+"""
+Shared HTTP client for the upstream services FornPunkt integrates with.
+
+Every service gets its own requests.Session so that connections are kept alive and pooled per host,
+together with connect/read timeouts and a retry policy for idempotent requests.
+
+Each service also has a circuit breaker. When too many recent calls fail or are slow the circuit opens
+and calls fail immediately with UpstreamUnavailable, after a cool down a single probe call is let through
+and closes the circuit again if it succeeds.
+
+The async functions (aget, apost, ahead) are used by the views in core.async_views when served over ASGI.
+They share the circuit breakers and metrics but use one pooled httpx.AsyncClient per service and event loop,
+which is closed when the loop shuts down.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SERVICES = {
+    # app.raa.se, Fornsök API and search
+    "raa": {"connect_timeout": 3.05, "read_timeout": 10, "retries": 2},
+    # kulturarvsdata.se, K-samsök and URI resolution
+    "kulturarvsdata": {"connect_timeout": 3.05, "read_timeout": 10, "retries": 2},
+    # karta.raa.se, WMS GetFeatureInfo
+    "raa_karta": {"connect_timeout": 3.05, "read_timeout": 10, "retries": 1},
+    # maps.lantmateriet.se, WMS/WMTS tiles
+    "lantmateriet": {"connect_timeout": 3.05, "read_timeout": 10, "retries": 1},
+    # fornpunkt.se itself
+    "fornpunkt": {"connect_timeout": 3.05, "read_timeout": 10, "retries": 1},
+}
+
+# circuit breaker thresholds, calls slower than BREAKER_SLOW_CALL seconds count as failures
+BREAKER_WINDOW = 60
+BREAKER_MIN_CALLS = 10
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_SLOW_CALL = 5
+BREAKER_OPEN_SECONDS = 30
+# a probe without an outcome after this many seconds no longer holds back the next one
+BREAKER_PROBE_TIMEOUT = 60
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """Raised instead of calling a service while its circuit is open."""
+
+
+class CircuitBreaker:
+    """Tracks the outcome of recent calls to a service, the state is kept per process."""
+
+    def __init__(self, service):
+        self.service = service
+        self.state = CLOSED
+        self.calls = deque()  # (time, failed)
+        self.opened_at = None
+        self.probe_started = None
+        self.lock = threading.Lock()
+
+    def _trim(self, now):
+        while self.calls and self.calls[0][0] < now - BREAKER_WINDOW:
+            self.calls.popleft()
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.probe_started = None
+
+    def before_call(self):
+        """Raises UpstreamUnavailable unless a call may be made."""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= BREAKER_OPEN_SECONDS:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and (
+                self.probe_started is None or now - self.probe_started >= BREAKER_PROBE_TIMEOUT
+            ):
+                self.probe_started = now
+                return
+        raise UpstreamUnavailable(f"The circuit of {self.service} is open.")
+
+    def after_call(self, duration, failed):
+        failed = failed or duration > BREAKER_SLOW_CALL
+        now = time.monotonic()
+        with self.lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self.calls.clear()
+                    self.probe_started = None
+                return
+
+            self.calls.append((now, failed))
+            self._trim(now)
+            failures = sum(1 for _, call_failed in self.calls if call_failed)
+            if (
+                self.state == CLOSED
+                and len(self.calls) >= BREAKER_MIN_CALLS
+                and failures / len(self.calls) >= BREAKER_FAILURE_RATE
+            ):
+                self._open(now)
+
+    def abandon_call(self):
+        """Called instead of after_call() for calls cancelled before they had an outcome, releases a probe."""
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_started = None
+
+    def status(self):
+        now = time.monotonic()
+        with self.lock:
+            self._trim(now)
+            failures = sum(1 for _, failed in self.calls if failed)
+            return {
+                "state": self.state,
+                "recent_calls": len(self.calls),
+                "recent_failures": failures,
+                "open_for": round(now - self.opened_at, 1) if self.state != CLOSED else None,
+            }
+
+
+_breakers = {service: CircuitBreaker(service) for service in SERVICES}
+
+
+def get_breaker(service):
+    return _breakers[service]
+
+
+def get_status():
+    """Returns the circuit state and metrics of every service for this process."""
+    metrics = get_metrics()
+    return {
+        service: {**breaker.status(), "metrics": metrics.get(service)}
+        for service, breaker in _breakers.items()
+    }
+
+
+_sessions = dict()
+_sessions_lock = threading.Lock()
+
+_metrics = dict()
+_metrics_lock = threading.Lock()
+
+
+def _create_session(service):
+    config = SERVICES[service]
+    retry = Retry(
+        total=config["retries"],
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        # POST is used for searches at RAÄ but is never retried as it is not idempotent
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+
+    session = requests.Session()
+    session.headers["User-Agent"] = "FornPunkt (https://fornpunkt.se)"
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(service):
+    """Returns the pooled session of a service."""
+    session = _sessions.get(service)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(service)
+            if session is None:
+                session = _sessions[service] = _create_session(service)
+    return session
+
+
+def _record(service, duration, error):
+    with _metrics_lock:
+        metrics = _metrics.setdefault(
+            service, {"calls": 0, "errors": 0, "total_duration": 0.0, "max_duration": 0.0}
+        )
+        metrics["calls"] += 1
+        metrics["errors"] += int(error)
+        metrics["total_duration"] += duration
+        metrics["max_duration"] = max(metrics["max_duration"], duration)
+
+
+def get_metrics():
+    """Returns call counts and durations (in seconds) per service for this process."""
+    with _metrics_lock:
+        return {
+            service: {
+                **metrics,
+                "average_duration": metrics["total_duration"] / metrics["calls"] if metrics["calls"] else 0.0,
+            }
+            for service, metrics in _metrics.items()
+        }
+
+
+def request(service, method, url, **kwargs):
+    """Issues a request to a service, raises requests.RequestException on connection errors, timeouts and open circuits."""
+    config = SERVICES[service]
+    kwargs.setdefault("timeout", (config["connect_timeout"], config["read_timeout"]))
+
+    breaker = _breakers[service]
+    breaker.before_call()
+
+    start = time.monotonic()
+    try:
+        response = get_session(service).request(method, url, **kwargs)
+    except Exception:
+        duration = time.monotonic() - start
+        _record(service, duration, error=True)
+        breaker.after_call(duration, failed=True)
+        raise
+
+    duration = time.monotonic() - start
+    _record(service, duration, error=response.status_code >= 500)
+    breaker.after_call(duration, failed=response.status_code >= 500)
+    return response
+
+
+def get(service, url, **kwargs):
+    return request(service, "GET", url, **kwargs)
+
+
+def post(service, url, **kwargs):
+    return request(service, "POST", url, **kwargs)
+
+
+def head(service, url, **kwargs):
+    # same default as requests.head()
+    kwargs.setdefault("allow_redirects", False)
+    return request(service, "HEAD", url, **kwargs)
+
+
+# pooled async clients per event loop and service, closed when the loop shuts down
+_async_clients = weakref.WeakKeyDictionary()
+
+# references to the tasks closing the clients, the event loop only keeps weak references to tasks
+_closing_tasks = set()
+
+
+def _create_async_client(service):
+    config = SERVICES[service]
+    return httpx.AsyncClient(
+        headers={"User-Agent": "FornPunkt (https://fornpunkt.se)"},
+        timeout=httpx.Timeout(config["read_timeout"], connect=config["connect_timeout"]),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        # only connection errors are retried by httpx
+        transport=httpx.AsyncHTTPTransport(retries=config["retries"]),
+    )
+
+
+async def _close_async_clients(loop, clients):
+    """Waits until the remaining tasks of the event loop are cancelled as it shuts down, then closes its clients."""
+    try:
+        await loop.create_future()
+    finally:
+        del _async_clients[loop]
+        for client in clients.values():
+            await client.aclose()
+
+
+def get_async_client(service):
+    """Returns the pooled async client of a service for the running event loop."""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = dict()
+        task = loop.create_task(_close_async_clients(loop, clients))
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+
+    client = clients.get(service)
+    if client is None:
+        client = clients[service] = _create_async_client(service)
+    return client
+
+
+async def arequest(service, method, url, **kwargs):
+    """
+    Async version of request(), returns a httpx.Response.
+    Errors are raised as requests exceptions so that callers can share their error handling with the sync views.
+    """
+    breaker = _breakers[service]
+    breaker.before_call()
+
+    start = time.monotonic()
+    try:
+        response = await get_async_client(service).request(method, url, **kwargs)
+    except asyncio.CancelledError:
+        # the view was cancelled, e.g. as the client disconnected, which says nothing about the service
+        breaker.abandon_call()
+        raise
+    except Exception as e:
+        duration = time.monotonic() - start
+        _record(service, duration, error=True)
+        breaker.after_call(duration, failed=True)
+        if isinstance(e, httpx.TimeoutException):
+            raise requests.exceptions.Timeout(str(e)) from e
+        if isinstance(e, httpx.HTTPError):
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        raise
+
+    duration = time.monotonic() - start
+    _record(service, duration, error=response.status_code >= 500)
+    breaker.after_call(duration, failed=response.status_code >= 500)
+    return response
+
+
+async def aget(service, url, **kwargs):
+    return await arequest(service, "GET", url, **kwargs)
+
+
+async def apost(service, url, **kwargs):
+    return await arequest(service, "POST", url, **kwargs)
+
+
+async def ahead(service, url, **kwargs):
+    # httpx does not follow redirects by default, same as requests.head()
+    return await arequest(service, "HEAD", url, **kwargs)
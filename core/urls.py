@@ -1,9 +1,9 @@
-from django.contrib.sitemaps.views import sitemap
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
 from django.urls import path, register_converter
 from django.views.generic import RedirectView, TemplateView
 
-from . import feeds, views
-from .sitemaps import sitemaps
+from . import async_views, feeds, views
 from .utilities import HashIdConverter
 
 register_converter(HashIdConverter, 'hashid')
@@ -23,20 +23,50 @@ def logged_in_switch_view(logged_in_view, logged_out_view):
 def content_negotiation(content_formats, default_view):
     '''Returns a view that will return the correct view based on the accept header'''
 
-    def negotiate(request, *args, **kwargs):
+    def select_view(request):
         # split media types, normalize, and finaly remove parameters
         requested_formats = request.headers.get('accept', '').lower().split(',')
         requested_formats = [f.split(';')[0].strip() for f in requested_formats]
 
         for requested_format in requested_formats:
             if requested_format in content_formats:
-                return content_formats[requested_format](request, *args, **kwargs)
+                return content_formats[requested_format]
+
+        return default_view
+
+    def negotiate(request, *args, **kwargs):
+        return select_view(request)(request, *args, **kwargs)
 
-        return default_view(request, *args, **kwargs)
+    async def async_negotiate(request, *args, **kwargs):
+        view = select_view(request)
+        if iscoroutinefunction(view):
+            return await view(request, *args, **kwargs)
+        return await sync_to_async(view)(request, *args, **kwargs)
 
+    if any(iscoroutinefunction(view) for view in [default_view, *content_formats.values()]):
+        return async_negotiate
     return negotiate
 
 
+# views waiting on upstream services, see fornfind/asgi.py
+if settings.ASYNC_UPSTREAM_VIEWS:
+    upstream_views = {
+        'raa_lamning': async_views.raa_lamning,
+        'raa_type': async_views.raa_type,
+        'get_feature_info': async_views.get_feature_info,
+        'lantmateriet_proxy': async_views.lantmateriet_proxy,
+        'identification_resolver': async_views.identification_resolver,
+    }
+else:
+    upstream_views = {
+        'raa_lamning': views.raa_lamning,
+        'raa_type': views.RaaTypeView.as_view(),
+        'get_feature_info': views.get_feature_info,
+        'lantmateriet_proxy': views.lantmateriet_proxy,
+        'identification_resolver': views.identification_resolver,
+    }
+
+
 lamning_negotiation_formats = {
     'text/html': views.LamningView.as_view(),
     'application/ld+json': views.lamning_jsonld,
@@ -46,7 +76,7 @@ lamning_negotiation_formats = {
 }
 
 raa_lamning_negotiation_formats = {
-    'text/html': views.raa_lamning,
+    'text/html': upstream_views['raa_lamning'],
     'application/ld+json': views.raa_lamning_jsonld,
     'application/rss+xml': feeds.RaaLamningCommentFeed(),
     'application/json': views.raa_lamning_jsonld,
@@ -83,7 +113,9 @@ urlpatterns = [
     path('auth/activate/<str:uidb64>/<str:token>', views.activate_account, name='activate_account'),
     path('feedback', views.FeedbackCreateView.as_view(), name='feedback_create'),
     path('installningar', views.SettingsView.as_view(), name='settings'),
-    path('fp-internal-sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('fp-internal-sitemap.xml', views.sitemap_index, name='django.contrib.sitemaps.views.index'),
+    path('fp-internal-sitemap-<section>.xml', views.cached_sitemap, name='django.contrib.sitemaps.views.sitemap'),
+    path('kmr-sitemap-<str:name>.xml.gz', views.kmr_sitemap, name='kmr_sitemap'),
     path('anvandare/<str:slug>', views.UserView.as_view(), name='profile'),
     path('anvandare/<str:slug>/lamningar.rss', feeds.UserLamningsFeed(), name='user_lamnings_rss'),
 
@@ -108,13 +140,18 @@ urlpatterns = [
     path('tagg/<str:slug>/redigera', views.TagUpdateView.as_view(), name='tag_update'),
 
     path('api/lamnings/bbox', views.bbox, name='bbox'),
+    path('api/lamnings/tiles/<int:z>/<int:x>/<int:y>.mvt', views.lamning_tile, {'tile_format': 'mvt'}, name='lamning_tile_mvt'),
+    path('api/lamnings/tiles/<int:z>/<int:x>/<int:y>.geojson', views.lamning_tile, {'tile_format': 'geojson'}, name='lamning_tile_geojson'),
     path('api/create-comment/<lamning>', views.create_comment, name='create_comment'),
     path('api/annotation-links/create', views.api_lamning_annotation_link_create, name='api_annotation_links_create'), # NOTE: deprecated
     # l-number redirection API v1 deprecated
     path('api/l-number-redirection/<l_number>', views.l_number_redirection, name='l_number_redirection'),
 
+    path('api/upstream-status', views.api_upstream_status, name='api_upstream_status'),
+
     # l-number redirection API v2
-    path('apis/kmr-identification-resolver/v1/<identifier>', views.identification_resolver, name='identification_resolver'),
+    path('apis/kmr-identification-resolver/v1/batch', views.identification_resolver_batch, name='identification_resolver_batch'),
+    path('apis/kmr-identification-resolver/v1/<identifier>', upstream_views['identification_resolver'], name='identification_resolver'),
 
     # NOTE: deprecated
     # export API v1
@@ -142,16 +179,16 @@ urlpatterns = [
 
     path('raa/lamning/<str:record_id>.jsonld', views.raa_lamning_jsonld, name='raa_lamning_jsonld'),
     path('raa/lamning/<str:record_id>.rss', feeds.RaaLamningCommentFeed(), name='raa_lamning_comment_rss'),
-    path('raa/lamning/<str:record_id>', content_negotiation(raa_lamning_negotiation_formats, views.raa_lamning), name='raa_lamning'),
+    path('raa/lamning/<str:record_id>', content_negotiation(raa_lamning_negotiation_formats, upstream_views['raa_lamning']), name='raa_lamning'),
 
     path('raa/typer', views.RaaTypeListView.as_view(), name='raa_type_list'),
-    path('raa/typer/<str:slug>', views.RaaTypeView.as_view(), name='raa_type'),
+    path('raa/typer/<str:slug>', upstream_views['raa_type'], name='raa_type'),
 
-    path('raa/wms-proxy', views.get_feature_info, name='proxy'),
+    path('raa/wms-proxy', upstream_views['get_feature_info'], name='proxy'),
 
-    path('lm/proxy/<path:route>', views.lantmateriet_proxy, name='lantmateriet_proxy'),
+    path('lm/proxy/<path:route>', upstream_views['lantmateriet_proxy'], name='lantmateriet_proxy'),
 
-    path('datasets', views.dataset_rdf_proxy, name='datasets'),
+    path('datasets', views.dataset_description, name='datasets'),
     path('.well-known/void', RedirectView.as_view(permanent=False, pattern_name='datasets'), name='void'),
 
     path('robots.txt', TemplateView.as_view(template_name='core/robots.txt', content_type='text/plain')),
@@ -1,18 +1,32 @@
 import json
+import math
+import re
+import threading
+import time
+from datetime import timedelta
+from itertools import islice
 from json.decoder import JSONDecodeError
+from pathlib import Path
 from urllib.parse import ParseResult, parse_qs, urlencode, urlparse
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import geojson
 import sentry_sdk as sentry
 import requests
 from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.exceptions import ValidationError
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.http.response import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
 from hashids import Hashids
 from taggit.utils import _parse_tags
 
+from . import kmr_index, upstream
+
 hashids = Hashids(settings.HASHIDS_SALT, min_length=7)
 
 
@@ -50,19 +64,60 @@ def replace_url_parameter(url, key, value):
     return ParseResult(scheme, netloc, path, params, query, fragment).geturl()
 
 
+API_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, OPTIONS, HEAD",
+}
+
+
 class JsonApiResponse(JsonResponse):
     def __init__(self, *args, content_type="application/json", json_dumps_params=None, **kwargs):
         json_dumps_params = {"ensure_ascii": False, **(json_dumps_params or {})}
-        headers = {
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, OPTIONS, HEAD",
-        }
 
-        kwargs.setdefault("headers", headers)
+        kwargs.setdefault("headers", API_HEADERS)
 
         super().__init__(*args, json_dumps_params=json_dumps_params, content_type=content_type, safe=False, **kwargs)
 
 
+class EncodedJsonApiResponse(HttpResponse):
+    """Same as JsonApiResponse but for content which already has been encoded as JSON"""
+
+    def __init__(self, content, *args, content_type="application/json", **kwargs):
+        kwargs.setdefault("headers", API_HEADERS)
+
+        super().__init__(content, *args, content_type=content_type, **kwargs)
+
+
+def feature_collection_from_fragments(features) -> str:
+    """Joins pre-encoded GeoJSON features into a FeatureCollection."""
+    return '{"type": "FeatureCollection", "features": [' + ", ".join(features) + "]}"
+
+
+def stream_json_list(fragments, prefix="[", suffix="]"):
+    """Yields a JSON list, wrapped by prefix and suffix, from an iterable of pre-encoded fragments."""
+    yield prefix
+    for i, fragment in enumerate(fragments):
+        yield fragment if i == 0 else ", " + fragment
+    yield suffix
+
+
+def stream_feature_collection(features):
+    """Yields a GeoJSON FeatureCollection from an iterable of pre-encoded features."""
+    yield from stream_json_list(features, prefix='{"type": "FeatureCollection", "features": [', suffix="]}")
+
+
+def batch_strings(strings, batch_size=500):
+    """Joins an iterable of strings into larger chunks to avoid writing tiny chunks when streaming."""
+    batch = list()
+    for string in strings:
+        batch.append(string)
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = list()
+    if batch:
+        yield "".join(batch)
+
+
 def validate_observation_type(observation_type: str) -> bool:
     """Validates an observation type."""
     if observation_type in ["FO", "RO", "MO"]:
@@ -108,6 +163,168 @@ def centroid_from_feature(geojson_data: str) -> tuple:
         return tuple((round(c_lon, 8), round(c_lat, 8)))
 
 
+# GeoRSS elements per GeoJSON geometry type and a function returning the rings/lines of coordinates to list
+GEORSS_ELEMENTS = {
+    "Point": ("georss:point", lambda coordinates: [coordinates]),
+    "LineString": ("georss:line", lambda coordinates: coordinates),
+    "Polygon": ("georss:polygon", lambda coordinates: coordinates[0]),
+}
+
+
+def georss_from_feature(geojson_data: str):
+    """
+    Returns the GeoRSS (element, text) of a GeoJSON feature, or None for unsupported geometries.
+    Coordinates are rounded to 6 decimals like geojson.loads() but without building any geojson objects.
+    """
+    geometry = json.loads(geojson_data).get("geometry") or {}
+    if geometry.get("type") not in GEORSS_ELEMENTS:
+        return None
+
+    element, coordinates = GEORSS_ELEMENTS[geometry["type"]]
+    return element, " ".join(f"{round(c[1], 6)} {round(c[0], 6)}" for c in coordinates(geometry["coordinates"]))
+
+
+def verbose_lamning_feature(geojson_data: str, lamning_id: int, title, description, creator, tags, observation_type):
+    """Returns the GeoJSON feature of a lamning with its properties, tags is a list of tag names."""
+    feature = json.loads(geojson_data)
+    feature["properties"] = {
+        "title": title,
+        "description": description,
+        "lamning_id": h_encode(lamning_id),
+        "creator": creator,
+        "tags": tags,
+        "uri": f"https://fornpunkt.se{reverse('lamning', args=[lamning_id])}",
+        "observation_type": "falt" if observation_type == "FO" else "fjarr",
+    }
+    return feature
+
+
+# the spatial grid used to index lamnings, cells are 0.1 degrees in both directions
+GRID_CELLS_PER_DEGREE = 10
+GRID_ROWS = 180 * GRID_CELLS_PER_DEGREE
+GRID_COLUMNS = 360 * GRID_CELLS_PER_DEGREE
+
+
+def _grid_position(lat: float, lon: float) -> tuple:
+    """Returns the (row, column) of the grid cell holding the given coordinate."""
+    row = math.floor((lat + 90) * GRID_CELLS_PER_DEGREE)
+    column = math.floor((lon + 180) * GRID_CELLS_PER_DEGREE)
+    return (min(max(row, 0), GRID_ROWS - 1), min(max(column, 0), GRID_COLUMNS - 1))
+
+
+def grid_cell_from_coordinates(lat: float, lon: float) -> int:
+    """Returns the index of the grid cell holding the given coordinate."""
+    row, column = _grid_position(lat, lon)
+    return row * GRID_COLUMNS + column
+
+
+def set_grid_cells(lamnings):
+    """Sets the grid cell of each lamning from its center, used for batches of lamnings loaded without save()."""
+    for lamning in lamnings:
+        lamning.grid_cell = grid_cell_from_coordinates(lamning.center_lat, lamning.center_lon)
+
+
+def grid_cell_ranges_from_bbox(south: float, west: float, north: float, east: float, max_ranges=None) -> list:
+    """
+    Returns the grid cells covering a bounding box as (first, last) ranges, one per grid row.
+    If there would be more than max_ranges ranges a single range spanning all rows is returned instead.
+    """
+    first_row, first_column = _grid_position(south, west)
+    last_row, last_column = _grid_position(north, east)
+    if max_ranges and last_row - first_row + 1 > max_ranges:
+        return [(first_row * GRID_COLUMNS + first_column, last_row * GRID_COLUMNS + last_column)]
+
+    return [
+        (row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column) for row in range(first_row, last_row + 1)
+    ]
+
+
+def update_in_batches(queryset, fields, update, batch_size=1000) -> int:
+    """
+    Passes the objects of a queryset to update() in batches and stores the given fields of each batch.
+    bulk_update() bypasses save() so changed_time is kept as is, returns the number of updated objects.
+    """
+    objects = queryset.iterator(chunk_size=batch_size)
+    updated = 0
+    while batch := list(islice(objects, batch_size)):
+        update(batch)
+        queryset.model._default_manager.bulk_update(batch, fields)
+        updated += len(batch)
+    return updated
+
+
+FEATURE_INFO_LAYERS = {
+    "arkreg_v1.0:publicerade_lamningar_geometrier",
+    "arkreg_v1.0:publicerade_lamningar_centrumpunkt",
+    "publicerade_lamningar_geometrier",
+    "publicerade_lamningar_centrumpunkt",
+}
+# size in pixels of the canonical GetFeatureInfo map, the clicked pixel is in the center
+FEATURE_INFO_SIZE = 5
+FEATURE_INFO_MAX_FEATURES = 50
+WEB_MERCATOR_EXTENT = 20037508.342789244
+
+
+def normalize_feature_info_query(query) -> dict:
+    """
+    Converts a WMS GetFeatureInfo query in EPSG:3857 to a canonical query for the clicked pixel.
+    The click is snapped to the global pixel grid of the map resolution so that clicks on the same pixel,
+    from any tile or image, result in identical queries. Raises ValueError for unsupported queries.
+    """
+    query = {key.upper(): value for key, value in query.items()}
+
+    if query.get("CRS", query.get("SRS", "")).upper() != "EPSG:3857":
+        raise ValueError("Only EPSG:3857 is supported.")
+
+    layers = query.get("QUERY_LAYERS", query.get("LAYERS", "")).split(",")
+    if not layers or not all(layer in FEATURE_INFO_LAYERS for layer in layers):
+        raise ValueError("Unsupported layers.")
+
+    minx, miny, maxx, maxy = (float(value) for value in query["BBOX"].split(","))
+    width, height = int(query["WIDTH"]), int(query["HEIGHT"])
+    # WMS 1.3.0 uses I/J while older versions use X/Y
+    i, j = float(query.get("I", query.get("X"))), float(query.get("J", query.get("Y")))
+    if width <= 0 or height <= 0 or not all(math.isfinite(v) for v in (minx, miny, maxx, maxy)):
+        raise ValueError("Invalid map.")
+
+    # rounded so that floating point noise in the client does not result in different queries
+    resolution = float(f"{(maxx - minx) / width:.6g}")
+    if resolution <= 0:
+        raise ValueError("Invalid map.")
+
+    x = minx + (i + 0.5) * (maxx - minx) / width
+    y = maxy - (j + 0.5) * (maxy - miny) / height
+    column = math.floor((x + WEB_MERCATOR_EXTENT) / resolution)
+    row = math.floor((WEB_MERCATOR_EXTENT - y) / resolution)
+
+    half = FEATURE_INFO_SIZE // 2
+    west = -WEB_MERCATOR_EXTENT + (column - half) * resolution
+    north = WEB_MERCATOR_EXTENT - (row - half) * resolution
+    bbox = (west, north - FEATURE_INFO_SIZE * resolution, west + FEATURE_INFO_SIZE * resolution, north)
+
+    try:
+        feature_count = min(max(int(query.get("FEATURE_COUNT", 1)), 1), FEATURE_INFO_MAX_FEATURES)
+    except ValueError:
+        feature_count = 1
+
+    return {
+        "SERVICE": "WMS",
+        "VERSION": "1.3.0",
+        "REQUEST": "GetFeatureInfo",
+        "LAYERS": ",".join(layers),
+        "QUERY_LAYERS": ",".join(layers),
+        "STYLES": "",
+        "CRS": "EPSG:3857",
+        "BBOX": ",".join(f"{value:.4f}" for value in bbox),
+        "WIDTH": FEATURE_INFO_SIZE,
+        "HEIGHT": FEATURE_INFO_SIZE,
+        "I": half,
+        "J": half,
+        "INFO_FORMAT": "application/json",
+        "FEATURE_COUNT": feature_count,
+    }
+
+
 def convert_geojson_to_schema_org(geojson_data: str) -> dict:
     """Converts GeoJSON to Schema.org"""
     parsed_geojson = geojson.loads(geojson_data)
@@ -153,18 +370,97 @@ def is_possible_raa_id(identifier: str):
 
 
 def is_raa_id(identifier: str):
-    """Checks if a given string is a UUID used by RAÄ by issuing a HTTP HEAD request to kulturarvsdata.se"""
+    """Checks if a given string is a UUID used by RAÄ, identifiers missing from the local index are checked with a HTTP HEAD request to kulturarvsdata.se"""
     if not is_possible_raa_id(identifier):
         return False
+
+    index = kmr_index.get_index()
+    if index is not None and identifier in index:
+        return True
+
     try:
-        r = requests.head(f"https://kulturarvsdata.se/raa/lamning/{identifier}")
-    except requests.exceptions.ConnectionError:
+        r = upstream.head("kulturarvsdata", f"https://kulturarvsdata.se/raa/lamning/{identifier}")
+    except requests.exceptions.RequestException:
         return False
     if r.status_code == 200:
         return True
     return False
 
 
+L_NUMBER_REGEX = re.compile(r"^L\d{4}:\d+$")
+
+
+FORNSOK_SEARCH_URL = "https://app.raa.se/open/fornsok/proxy/api/lamning/search/lamning"
+
+
+def fornsok_search_query(number: str) -> dict:
+    """Returns the body of a Fornsök search for a L-number or RAÄ-number."""
+    return {"criteria": {"lamningsnummer_eller_raa_nummer": [number]}}
+
+
+def lamning_id_from_search(response_data: dict, unique=False):
+    """Returns the UUID of the first lamning in a Fornsök search result, or None if there is no (unique) match."""
+    try:
+        if unique and response_data["total_size"] != 1:
+            return None
+        return response_data["results"][0]["lamning_id"]
+    except (KeyError, IndexError):
+        return None
+
+
+def resolve_l_number(l_number: str):
+    """Resolves a L-number to the UUID of the first matching KMR lamning using Fornsök, returns None if there is no match"""
+    r = upstream.post("raa", FORNSOK_SEARCH_URL, json=fornsok_search_query(l_number))
+    return lamning_id_from_search(r.json())
+
+
+def resolve_raa_number(raa_number: str):
+    """Resolves a RAÄ-number or L-number to the UUID of a KMR lamning using Fornsök, returns None unless there is exactly one match"""
+    r = upstream.post("raa", FORNSOK_SEARCH_URL, json=fornsok_search_query(raa_number))
+    return lamning_id_from_search(r.json(), unique=True)
+
+
+def cached_resolve_l_number(l_number: str):
+    """Resolves a L-number using the resolution table before asking Fornsök, missing L-numbers are retried after L_NUMBER_NOT_FOUND_TTL"""
+    stored, uuid = stored_l_number_resolution(l_number)
+    if stored:
+        return uuid
+
+    uuid = coalesced_call(f"l-number:{l_number}", lambda: resolve_l_number(l_number))
+    store_l_number_resolutions({l_number: uuid})
+    return uuid
+
+
+def stored_l_number_resolution(l_number: str):
+    """Returns (True, uuid) for L-numbers in the resolution table that need no new lookup, otherwise (False, None)."""
+    # avoid a circular import, models depends on this module
+    from .models import LNumberResolution
+
+    resolution = LNumberResolution.objects.filter(l_number=l_number).first()
+    if resolution and (
+        resolution.uuid
+        or resolution.resolved_time > timezone.now() - timedelta(seconds=settings.L_NUMBER_NOT_FOUND_TTL)
+    ):
+        return True, str(resolution.uuid) if resolution.uuid else None
+    return False, None
+
+
+def store_l_number_resolutions(resolutions: dict):
+    """Stores a mapping of L-numbers to UUIDs (or None) in the resolution table."""
+    from .models import LNumberResolution
+
+    now = timezone.now()
+    LNumberResolution.objects.bulk_create(
+        [
+            LNumberResolution(l_number=l_number, uuid=uuid, resolved_time=now)
+            for l_number, uuid in resolutions.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["l_number"],
+        update_fields=["uuid", "resolved_time"],
+    )
+
+
 def create_meta_description(description: str) -> str:
     """Ensures a string is no longer than 150, so that it can be used in meta:desc elements"""
     if len(description) <= 150:
@@ -191,6 +487,14 @@ def ld_wrap_graph(graph):
     }
 
 
+def ld_stream_graph(nodes):
+    """Yields the same document as ld_wrap_graph() for an iterable of nodes, without holding all of them."""
+    document = json.dumps(ld_wrap_graph([]), ensure_ascii=False)
+    prefix, suffix = document.rsplit("[]", 1)
+    nodes = (json.dumps(node, ensure_ascii=False) for node in nodes)
+    yield from stream_json_list(nodes, prefix=prefix + "[", suffix="]" + suffix)
+
+
 def tag_parser(tags: str) -> list:
     """Custom tag parser for FornPunkt to ensure lower case tags."""
     return _parse_tags(tags.lower())
@@ -207,14 +511,205 @@ def fix_raa_record_description(description: str) -> str:
     return description
 
 
-def fetch_raa_lamning(uuid):
-    """Fetches a RAA lamning. Returns false if the lamning does not exist. Raises an error if RAA services can't be accessed."""
+DATASET_DESCRIPTION_CACHE_KEY = "dataset-description"
+
+# published in the dataset description, the same license and contact as stated on the site
+DATASET_LICENSE = "https://creativecommons.org/publicdomain/zero/1.0/"
+DATASET_CONTACT = "hej@fornpunkt.se"
+
+# seconds callers wait for a fetch made by another worker before fetching themselves
+COALESCE_TIMEOUT = 10
+# the interval between polls for the result of another worker is doubled up to the maximum
+COALESCE_POLL_INTERVAL = 0.05
+COALESCE_MAX_POLL_INTERVAL = 1
+
+_in_flight = dict()
+_in_flight_lock = threading.Lock()
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def cache_is_shared() -> bool:
+    """False for caches private to each process, where coalescing between workers is pointless."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def coalesce_lock_key(key):
+    return f"{key}:in-flight"
+
+
+def coalesce_result_key(key, token):
+    # each lock acquisition gets its own result so that a later fetch is never answered with an earlier result
+    return f"{key}:result:{token}"
+
+
+def coalesce_poll_intervals():
+    """Yields the waits between polls for the result of another worker until COALESCE_TIMEOUT has passed."""
+    deadline = time.monotonic() + COALESCE_TIMEOUT
+    interval = COALESCE_POLL_INTERVAL
+    while time.monotonic() < deadline:
+        yield interval
+        interval = min(interval * 2, COALESCE_MAX_POLL_INTERVAL)
+
+
+def _coalesce_across_workers(key, fetch):
+    """
+    Lets a single worker run fetch() for a key while the others wait for its result in the cache.
+    Requires a cache shared by the workers, two workers might both fetch if its add() is not atomic as for the
+    file based cache.
+    """
+    if not cache_is_shared():
+        return fetch()
+
+    lock_key = coalesce_lock_key(key)
+    token = uuid4().hex
+    if cache.add(lock_key, token, timeout=COALESCE_TIMEOUT):
+        try:
+            value = fetch()
+            cache.set(coalesce_result_key(key, token), {"value": value}, timeout=COALESCE_TIMEOUT)
+            return value
+        finally:
+            # the lock might have expired and been taken by another worker during a slow fetch
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    leader = cache.get(lock_key)
+    if leader is not None:
+        result_key = coalesce_result_key(key, leader)
+        for interval in coalesce_poll_intervals():
+            time.sleep(interval)
+            result = cache.get(result_key)
+            if result is not None:
+                return result["value"]
+            if cache.get(lock_key) != leader:
+                # the result is stored before the lock is released
+                result = cache.get(result_key)
+                if result is not None:
+                    return result["value"]
+                break
+
+    # the other worker failed, is too slow or finished before its lock was read
+    return fetch()
+
+
+def coalesced_call(key, fetch):
+    """
+    Returns the result of fetch() while sharing a single in-flight call between concurrent callers of the same key,
+    within the process using thread primitives and between workers using a lock in a shared cache.
+    """
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        leader = call is None
+        if leader:
+            call = _in_flight[key] = _InFlightCall()
+
+    if not leader:
+        call.done.wait()
+        if call.error:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _coalesce_across_workers(key, fetch)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+        call.done.set()
+
+
+# seconds a background refresh of a cached upstream value may take before another one is started
+REFRESH_LOCK_TIMEOUT = 60
+
+
+def refresh_lock_key(key):
+    return f"{key}:refreshing"
+
+
+def cached_upstream_entry(value, ttl, stale_ttl, not_found_ttl):
+    """
+    Returns the cache entry and timeout to store a value fetched by cached_upstream_call() with,
+    None if it should not be stored. Falsy values are considered "not found".
+    """
+    if value:
+        return {"entry": {"value": value, "fresh_until": time.time() + ttl}, "timeout": ttl + stale_ttl}
+    if not_found_ttl:
+        return {"entry": {"value": value, "fresh_until": time.time() + not_found_ttl}, "timeout": not_found_ttl}
+    return None
+
+
+def is_stale(entry) -> bool:
+    return entry["fresh_until"] < time.time()
+
+
+def _store_cached_upstream_value(key, value, ttl, stale_ttl, not_found_ttl):
+    stored = cached_upstream_entry(value, ttl, stale_ttl, not_found_ttl)
+    if stored:
+        cache.set(key, stored["entry"], timeout=stored["timeout"])
+
+
+def _refresh_cached_upstream_value(key, fetch, ttl, stale_ttl, not_found_ttl):
+    try:
+        _store_cached_upstream_value(key, fetch(), ttl, stale_ttl, not_found_ttl)
+    except Exception as e:
+        # the stale value is kept until it expires
+        sentry.capture_exception(e)
+    finally:
+        cache.delete(refresh_lock_key(key))
+
+
+def cached_upstream_call(key, fetch, ttl, stale_ttl=0, not_found_ttl=0):
+    """
+    Returns the result of fetch() through the cache.
+    Stale values (older than ttl but younger than ttl + stale_ttl) are returned directly while a single
+    background thread refreshes them. Falsy results are only cached for not_found_ttl seconds.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        value = coalesced_call(key, fetch)
+        _store_cached_upstream_value(key, value, ttl, stale_ttl, not_found_ttl)
+        return value
+
+    if is_stale(entry) and cache.add(refresh_lock_key(key), True, timeout=REFRESH_LOCK_TIMEOUT):
+        threading.Thread(
+            target=_refresh_cached_upstream_value,
+            args=(key, fetch, ttl, stale_ttl, not_found_ttl),
+            daemon=True,
+        ).start()
+
+    return entry["value"]
+
+
+def prefetch_upstream_call(key, fetch, ttl, stale_ttl=0, not_found_ttl=0):
+    """Fills the cache entry used by cached_upstream_call() in a background thread unless it is already cached."""
+    if cache.get(key) is None and cache.add(refresh_lock_key(key), True, timeout=REFRESH_LOCK_TIMEOUT):
+        threading.Thread(
+            target=_refresh_cached_upstream_value,
+            args=(key, fetch, ttl, stale_ttl, not_found_ttl),
+            daemon=True,
+        ).start()
+
+
+def raa_lamning_url(uuid):
+    return f"https://app.raa.se/open/fornsok/api/lamning/lamning/{uuid}"
+
+
+def request_raa_lamning(uuid):
+    """Requests the raw record of a RAA lamning. Returns false if the lamning does not exist. Raises an error if RAA services can't be accessed."""
 
     if not is_possible_raa_id(uuid):
         return False
 
     try:
-        r = requests.get(f"https://app.raa.se/open/fornsok/api/lamning/lamning/{uuid}")
+        r = upstream.get("raa", raa_lamning_url(uuid))
         raa_data = r.json()
     except requests.exceptions.RequestException as e:
         raise Exception("RAA services are not available.") from e
@@ -222,6 +717,11 @@ def fetch_raa_lamning(uuid):
     if r.status_code == 404:
         return False
 
+    return raa_data
+
+
+def format_raa_lamning(raa_data):
+    """Extracts the fields used by FornPunkt from a raw RAA lamning record."""
     try:
         raa_data["beskrivning"] = fix_raa_record_description(raa_data["beskrivning"])
     except KeyError as e:
@@ -245,14 +745,48 @@ def fetch_raa_lamning(uuid):
     return item
 
 
+def fetch_raa_lamning(uuid):
+    """Fetches a RAA lamning. Returns false if the lamning does not exist. Raises an error if RAA services can't be accessed."""
+    raa_data = request_raa_lamning(uuid)
+    if not raa_data:
+        return False
+
+    return format_raa_lamning(raa_data)
+
+
 class UpstreamTimeoutExeption(Exception):
     pass
 
 
-def fetch_raa_lamning_for_view(uuid):
-    """Fetches and RAÄ lamning while returning errors for use from a view."""
+def cached_fetch_raa_lamning(uuid):
+    """Same as fetch_raa_lamning() but through the cache, KMR records are rarely changed."""
+    if not is_possible_raa_id(uuid):
+        return False
+
+    return cached_upstream_call(
+        f"raa-lamning:{uuid}",
+        lambda: fetch_raa_lamning(uuid),
+        ttl=settings.RAA_LAMNING_CACHE_TTL,
+        stale_ttl=settings.RAA_LAMNING_CACHE_STALE_TTL,
+        not_found_ttl=settings.RAA_LAMNING_NOT_FOUND_CACHE_TTL,
+    )
+
+
+def stored_raa_lamning(uuid):
+    """Returns a RAÄ lamning mirrored by the sync-kmr-records command, or None if it is not stored locally."""
+    # avoid a circular import, models depends on this module
+    from .models import KMRRecord
+
+    if not is_possible_raa_id(uuid):
+        return None
+    record = KMRRecord.objects.filter(uuid=uuid).first()
+    return record.as_raa_lamning if record else None
+
+
+def fetch_raa_lamning_from_upstream_for_view(uuid):
+    """Fetches a RAÄ lamning through the cache while returning errors for use from a view, makes no database queries."""
     try:
-        lamning = fetch_raa_lamning(uuid)
+        lamning = cached_fetch_raa_lamning(uuid)
     except Exception as e:
         raise UpstreamTimeoutExeption()
 
@@ -262,29 +796,27 @@ def fetch_raa_lamning_for_view(uuid):
     return lamning
 
 
-def get_soch_search_result(query, offset=0, limit=100):
-    """Get search results from SOCH."""
-    url = "https://www.kulturarvsdata.se/ksamsok/api"
-    params = {
+def fetch_raa_lamning_for_view(uuid):
+    """Fetches and RAÄ lamning while returning errors for use from a view."""
+    # records mirrored by the sync-kmr-records command are served without contacting RAÄ
+    return stored_raa_lamning(uuid) or fetch_raa_lamning_from_upstream_for_view(uuid)
+
+
+SOCH_API_URL = "https://www.kulturarvsdata.se/ksamsok/api"
+
+
+def soch_search_params(query, offset=0, limit=100) -> dict:
+    return {
         "method": "search",
         "query": query,
         "recordSchema": "presentation",
         "startRecord": offset,
         "hitsPerPage": limit,
     }
-    headers = {
-        "Accept": "application/json",
-    }
 
-    try:
-        response = requests.get(url, params=params, headers=headers)
-        data = response.json()
-    except JSONDecodeError as e:
-        raise Exception("RAA services are not available.") from e
-
-    if response.status_code != 200:
-        raise Exception("RAA services are not available.")
 
+def format_soch_search_result(data) -> dict:
+    """Extracts the fields used by FornPunkt from a SOCH search result."""
     formatted_data = {}
     formatted_data["total"] = data["result"]["totalHits"]
     formatted_data["results"] = []
@@ -303,6 +835,70 @@ def get_soch_search_result(query, offset=0, limit=100):
     return formatted_data
 
 
+def get_soch_search_result(query, offset=0, limit=100):
+    """Get search results from SOCH."""
+    headers = {
+        "Accept": "application/json",
+    }
+
+    try:
+        response = upstream.get(
+            "kulturarvsdata", SOCH_API_URL, params=soch_search_params(query, offset, limit), headers=headers
+        )
+        data = response.json()
+    except JSONDecodeError as e:
+        raise Exception("RAA services are not available.") from e
+
+    if response.status_code != 200:
+        raise Exception("RAA services are not available.")
+
+    return format_soch_search_result(data)
+
+
+SOCH_PAGE_SIZE = 100
+
+
+def soch_type_query(type_name: str) -> str:
+    return f'itemClassName="{type_name}" AND serviceName="kmr_lamningar"'
+
+
+def _soch_type_page_call(type_id: int, type_name: str, page: int) -> dict:
+    """Returns the cached_upstream_call() arguments for a page of KMR lamnings of a type."""
+    return {
+        # the RAÄ id is used in the key as type names contain spaces and non-ASCII characters
+        "key": f"soch-type:{type_id}:{page}",
+        "fetch": lambda: get_soch_search_result(
+            soch_type_query(type_name), offset=(page - 1) * SOCH_PAGE_SIZE, limit=SOCH_PAGE_SIZE
+        ),
+        "ttl": settings.SOCH_PAGE_CACHE_TTL,
+        "stale_ttl": settings.SOCH_PAGE_CACHE_STALE_TTL,
+    }
+
+
+def cached_soch_type_page(type_id: int, type_name: str, page: int) -> dict:
+    """Returns a page of KMR lamnings of a type from SOCH through the cache."""
+    return cached_upstream_call(**_soch_type_page_call(type_id, type_name, page))
+
+
+def prefetch_soch_type_page(type_id: int, type_name: str, page: int):
+    """Fetches a page of KMR lamnings of a type in the background so that it is cached when requested."""
+    prefetch_upstream_call(**_soch_type_page_call(type_id, type_name, page))
+
+
+KMR_SITEMAPS_DIR = settings.BASE_DIR + "/core/static/kmr-sitemaps"
+
+
+def read_kmr_sitemap(path: str) -> list:
+    """Returns the KMR UUIDs listed in one of the plain text KMR sitemaps."""
+    with open(path) as f:
+        return [line.strip().rsplit("/", 1)[-1] for line in f if line.strip()]
+
+
+def list_kmr_sitemaps(directory=None) -> list:
+    """Returns the paths of all plain text KMR sitemaps in order."""
+    return sorted(str(path) for path in Path(directory or KMR_SITEMAPS_DIR).glob("*.txt"))
+
+
 observation_types_defination = {
     "@context": {
         "@language": "sv",
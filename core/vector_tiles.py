@@ -0,0 +1,306 @@
+"""
+Minimal Mapbox Vector Tile (v2) encoder for FornPunkt lamnings.
+
+The encoder only supports what the map needs: a single layer with points, lines and
+polygons (and their multi variants) with string/number/boolean properties.
+https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+import math
+import struct
+
+MIN_TILE_ZOOM = 10
+MAX_TILE_ZOOM = 22
+
+TILE_EXTENT = 4096
+# geometries are clipped to the tile extended by this many units to hide seams between tiles
+TILE_BUFFER = 64
+
+_MOVE_TO = 1
+_LINE_TO = 2
+_CLOSE_PATH = 7
+
+_POINT = 1
+_LINESTRING = 2
+_POLYGON = 3
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple:
+    """Returns the (west, south, east, north) bounds of a XYZ tile in WGS84."""
+
+    def lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / 2**z))))
+
+    def lon(tile_x):
+        return tile_x / 2**z * 360 - 180
+
+    return (lon(x), lat(y + 1), lon(x + 1), lat(y))
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    """Checks that a tile exists and is within the zoom levels served."""
+    return MIN_TILE_ZOOM <= z <= MAX_TILE_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def _project(z: int, x: int, y: int):
+    """Returns a function projecting WGS84 coordinates to tile coordinates."""
+    scale = 2**z * TILE_EXTENT
+
+    def project(coordinate):
+        lon, lat = coordinate[0], max(min(coordinate[1], 85.0511287798), -85.0511287798)
+        px = (lon + 180) / 360 * scale
+        py = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2 * scale
+        return (px - x * TILE_EXTENT, py - y * TILE_EXTENT)
+
+    return project
+
+
+def _quantize(points: list) -> list:
+    """Rounds points to the integer tile grid while dropping repeated points."""
+    quantized = list()
+    for px, py in points:
+        point = (int(round(px)), int(round(py)))
+        if not quantized or quantized[-1] != point:
+            quantized.append(point)
+    return quantized
+
+
+def _clip_line(points: list, low: float, high: float) -> list:
+    """Clips a line to a square using Liang-Barsky, returns a list of lines."""
+    lines = list()
+    current = list()
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        t0, t1 = 0.0, 1.0
+        visible = True
+        for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+            if p == 0:
+                if q < 0:
+                    visible = False
+                    break
+                continue
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                visible = False
+                break
+
+        if not visible:
+            if current:
+                lines.append(current)
+                current = list()
+            continue
+
+        start = (x0 + t0 * dx, y0 + t0 * dy)
+        end = (x0 + t1 * dx, y0 + t1 * dy)
+        if not current:
+            current.append(start)
+        current.append(end)
+        if t1 < 1.0:
+            lines.append(current)
+            current = list()
+
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _clip_ring(points: list, low: float, high: float) -> list:
+    """Clips a polygon ring to a square using Sutherland-Hodgman."""
+    edges = (
+        (lambda p: p[0] >= low, lambda a, b: (low, a[1] + (b[1] - a[1]) * (low - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[0] <= high, lambda a, b: (high, a[1] + (b[1] - a[1]) * (high - a[0]) / (b[0] - a[0]))),
+        (lambda p: p[1] >= low, lambda a, b: (a[0] + (b[0] - a[0]) * (low - a[1]) / (b[1] - a[1]), low)),
+        (lambda p: p[1] <= high, lambda a, b: (a[0] + (b[0] - a[0]) * (high - a[1]) / (b[1] - a[1]), high)),
+    )
+
+    output = points
+    for inside, intersect in edges:
+        if not output:
+            break
+        ring, output = output, list()
+        previous = ring[-1]
+        for point in ring:
+            if inside(point):
+                if not inside(previous):
+                    output.append(intersect(previous, point))
+                output.append(point)
+            elif inside(previous):
+                output.append(intersect(previous, point))
+            previous = point
+    return output
+
+
+def _ring_area(ring: list) -> float:
+    """Signed area of a ring in tile coordinates, positive means clockwise on screen."""
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 31)
+
+
+def _command(command_id: int, count: int) -> int:
+    return (command_id & 0x7) | (count << 3)
+
+
+class _GeometryWriter:
+    """Writes MVT geometry commands with cursor relative coordinates."""
+
+    def __init__(self):
+        self.commands = list()
+        self.cursor = (0, 0)
+
+    def _append_point(self, point):
+        self.commands.append(_zigzag(point[0] - self.cursor[0]))
+        self.commands.append(_zigzag(point[1] - self.cursor[1]))
+        self.cursor = point
+
+    def points(self, points):
+        self.commands.append(_command(_MOVE_TO, len(points)))
+        for point in points:
+            self._append_point(point)
+
+    def line(self, points, close=False):
+        self.commands.append(_command(_MOVE_TO, 1))
+        self._append_point(points[0])
+        self.commands.append(_command(_LINE_TO, len(points) - 1))
+        for point in points[1:]:
+            self._append_point(point)
+        if close:
+            self.commands.append(_command(_CLOSE_PATH, 1))
+
+
+def encode_geometry(geometry: dict, z: int, x: int, y: int):
+    """Clips and encodes a GeoJSON geometry for a tile, returns (type, commands) or None if nothing remains."""
+    project = _project(z, x, y)
+    low, high = -TILE_BUFFER, TILE_EXTENT + TILE_BUFFER
+    geometry_type = geometry["type"]
+    writer = _GeometryWriter()
+
+    if geometry_type in ("Point", "MultiPoint"):
+        coordinates = [geometry["coordinates"]] if geometry_type == "Point" else geometry["coordinates"]
+        points = [project(c) for c in coordinates]
+        points = _quantize([p for p in points if low <= p[0] <= high and low <= p[1] <= high])
+        if not points:
+            return None
+        writer.points(points)
+        return _POINT, writer.commands
+
+    if geometry_type in ("LineString", "MultiLineString"):
+        lines = [geometry["coordinates"]] if geometry_type == "LineString" else geometry["coordinates"]
+        for line in lines:
+            for clipped in _clip_line([project(c) for c in line], low, high):
+                clipped = _quantize(clipped)
+                if len(clipped) >= 2:
+                    writer.line(clipped)
+        if not writer.commands:
+            return None
+        return _LINESTRING, writer.commands
+
+    if geometry_type in ("Polygon", "MultiPolygon"):
+        polygons = [geometry["coordinates"]] if geometry_type == "Polygon" else geometry["coordinates"]
+        for polygon in polygons:
+            for ring_number, ring in enumerate(polygon):
+                # the closing point is implied by ClosePath
+                clipped = _quantize(_clip_ring([project(c) for c in ring[:-1]], low, high))
+                if len(clipped) > 1 and clipped[0] == clipped[-1]:
+                    clipped = clipped[:-1]
+                if len(clipped) < 3:
+                    if ring_number == 0:
+                        break  # without an exterior ring the holes are meaningless
+                    continue
+
+                area = _ring_area(clipped)
+                if area == 0:
+                    if ring_number == 0:
+                        break
+                    continue
+                # exterior rings must be clockwise and interior rings counter clockwise
+                if (ring_number == 0) != (area > 0):
+                    clipped.reverse()
+                writer.line(clipped, close=True)
+        if not writer.commands:
+            return None
+        return _POLYGON, writer.commands
+
+    return None
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def _key(field_number: int, wire_type: int) -> bytes:
+    return _varint((field_number << 3) | wire_type)
+
+
+def _length_delimited(field_number: int, payload: bytes) -> bytes:
+    return _key(field_number, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field_number: int, values: list) -> bytes:
+    return _length_delimited(field_number, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint((value << 1) ^ (value >> 63))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+def encode_tile(layer_name: str, features: list, z: int, x: int, y: int) -> bytes:
+    """Encodes GeoJSON features as a single layer vector tile, features outside the tile are left out."""
+    keys, key_index = list(), dict()
+    values, value_index = list(), dict()
+    encoded_features = list()
+
+    for feature in features:
+        encoded_geometry = encode_geometry(feature["geometry"], z, x, y)
+        if not encoded_geometry:
+            continue
+        geometry_type, commands = encoded_geometry
+
+        tags = list()
+        for key, value in (feature.get("properties") or {}).items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = ",".join(str(v) for v in value)
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value), value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend([key_index[key], value_index[value_key]])
+
+        encoded_feature = _packed(2, tags) + _key(3, 0) + _varint(geometry_type) + _packed(4, commands)
+        encoded_features.append(_length_delimited(2, encoded_feature))
+
+    if not encoded_features:
+        return b""
+
+    layer = _key(15, 0) + _varint(2) + _length_delimited(1, layer_name.encode("utf-8"))
+    layer += b"".join(encoded_features)
+    layer += b"".join(_length_delimited(3, key.encode("utf-8")) for key in keys)
+    layer += b"".join(_length_delimited(4, _encode_value(value)) for value in values)
+    layer += _key(5, 0) + _varint(TILE_EXTENT)
+
+    return _length_delimited(3, layer)
@@ -1,10 +1,15 @@
 import base64
 import csv
+import hashlib
 import json
-import re
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from functools import wraps
 from itertools import chain
 from operator import attrgetter
+from urllib.parse import urlencode
+from uuid import UUID
 
 import requests
 import sentry_sdk
@@ -17,21 +22,28 @@ from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import LoginView
 from django.contrib.messages.views import SuccessMessageMixin
+from django.contrib.sitemaps.views import SitemapIndexItem, sitemap
+from django.contrib.sitemaps.views import index as django_sitemap_index
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
-from django.db.models import Count, Q
-from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
-                         HttpResponseForbidden, HttpResponseRedirect,
-                         JsonResponse)
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.db.models.functions import Floor
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseBadRequest, HttpResponseForbidden,
+                         HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.middleware.csrf import CsrfViewMiddleware
 from django.urls import reverse, reverse_lazy
-from django.utils.datastructures import MultiValueDictKeyError
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import (http_date, parse_http_date,
+                               urlsafe_base64_decode, urlsafe_base64_encode)
 from django.utils.safestring import mark_safe
 from django.views import generic
 from django.views.decorators.clickjacking import xframe_options_exempt
@@ -41,14 +53,31 @@ from django.views.decorators.http import require_POST
 from geojson import FeatureCollection
 from taggit.utils import edit_string_for_tags
 
+from . import kmr_index, kmr_sitemaps, page_cache, tile_cache, upstream
 from .forms import LoginForm, SignUpForm
 from .models import (AccessToken, Annotation, Comment, CustomTag, Feedback,
-                     KMRLamningType, Lamning, LamningWikipediaLink, UserDetails)
-from .utilities import (JsonApiResponse, UpstreamTimeoutExeption,
-                        create_meta_description, fetch_raa_lamning_for_view,
-                        get_soch_search_result, is_possible_raa_id, is_raa_id,
-                        ld_wrap_graph, observation_types_defination,
-                        replace_url_parameter, tag_parser)
+                     KMRLamningType, KMRRecord, Lamning, LamningWikipediaLink,
+                     LNumberResolution, UserDetails)
+from .sitemaps import sitemaps
+from .utilities import (API_HEADERS, DATASET_CONTACT,
+                        DATASET_DESCRIPTION_CACHE_KEY, DATASET_LICENSE,
+                        L_NUMBER_REGEX, SOCH_PAGE_SIZE, EncodedJsonApiResponse,
+                        JsonApiResponse, UpstreamTimeoutExeption, batch_strings,
+                        cached_resolve_l_number, cached_soch_type_page,
+                        cache_is_shared, cached_upstream_call,
+                        coalesced_call,
+                        create_meta_description,
+                        feature_collection_from_fragments,
+                        fetch_raa_lamning_from_upstream_for_view,
+                        grid_cell_ranges_from_bbox, h_encode,
+                        is_possible_raa_id, is_raa_id, ld_stream_graph,
+                        ld_wrap_graph, normalize_feature_info_query,
+                        observation_types_defination, prefetch_soch_type_page,
+                        replace_url_parameter, resolve_l_number,
+                        resolve_raa_number, store_l_number_resolutions,
+                        stored_raa_lamning, stream_feature_collection,
+                        tag_parser)
+from .vector_tiles import encode_tile, is_valid_tile, tile_bounds
 
 
 def get_access_token_from_request(request):
@@ -82,7 +111,35 @@ def write_access_token_or_csrf(function):
     return _wrapped_view
 
 
-class LandingView(generic.TemplateView):
+class AnonymousPageCacheMixin:
+    """
+    Serves the page from core.page_cache to anonymous visitors, get_page_tags() returns the tags the rendered page
+    depends on so that changes of the data shown purge it.
+    """
+
+    page_content_type = "text/html"
+
+    def get_page_tags(self, context):
+        return []
+
+    def dispatch(self, request, *args, **kwargs):
+        if not page_cache.is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        response = page_cache.get(request, self.page_content_type)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, "render"):
+            # rendered here as the CSRF token is only requested while rendering
+            response.render()
+            if page_cache.is_cacheable_response(request, response):
+                page_cache.store(request, self.page_content_type, response, self.get_page_tags(response.context_data))
+        return response
+
+
+class LandingView(AnonymousPageCacheMixin, generic.TemplateView):
     """FornPunkt's main landing page"""
 
     template_name = "core/landing.html"
@@ -174,7 +231,7 @@ class LamningEmbedView(generic.DetailView):
         return context
 
 
-class LamningView(generic.DetailView):
+class LamningView(AnonymousPageCacheMixin, generic.DetailView):
     """View for lamning registered in FornPunkt"""
 
     model = Lamning
@@ -197,6 +254,14 @@ class LamningView(generic.DetailView):
         context["tags"] = self.object.tags.all()
         return context
 
+    def get_page_tags(self, context):
+        users = {self.object.user_id, *(comment.user_id for comment in context["comments"])}
+        return [
+            f"lamning:{self.object.id}",
+            *(f"user:{user_id}" for user_id in users if user_id),
+            *(f"tag:{tag.slug}" for tag in context["tags"]),
+        ]
+
 
 def lamning_jsonld(request, pk):
     """JSON-LD representation of a lamning"""
@@ -284,7 +349,7 @@ class DeleteLamning(LoginRequiredMixin, generic.edit.DeleteView):
         return lamning
 
 
-class MapView(generic.TemplateView):
+class MapView(AnonymousPageCacheMixin, generic.TemplateView):
     """Static map view other than metadata"""
 
     template_name = "core/karta.html"
@@ -363,7 +428,10 @@ class UserView(generic.DetailView):
 
         recent_lamnings = Lamning.objects.filter(user=self.object).order_by("-created_time")[:50]
         context["has_geojson"] = bool(recent_lamnings)
-        context["geojson"] = FeatureCollection([lamning.verbose_geojson for lamning in recent_lamnings])
+        # the collection is embedded in a script element so "<" is escaped to prevent it from being closed
+        context["geojson"] = feature_collection_from_fragments(
+            [lamning.encoded_geojson for lamning in recent_lamnings]
+        ).replace("<", "\\u003c")
 
         context["profile_user"] = self.object
 
@@ -408,6 +476,73 @@ class SettingsView(LoginRequiredMixin, generic.TemplateView):
             return redirect("settings")
 
 
+# limits for the clustered bounding box API
+MIN_CLUSTER_CELL_SIZE = 0.01
+MAX_CLUSTER_CELL_SIZE = 10
+MAX_CLUSTER_CELLS = 10000
+
+
+def get_lamnings_in_bbox(south, west, north, east, half_open=False):
+    """
+    Returns the public lamnings with a centroid inside the given bounding box.
+    With half_open the north and east edges are excluded, so that adjacent boxes such as tiles never share a lamning.
+    """
+    # the grid cell ranges narrows the query down using the (hidden, grid_cell) index
+    # while the centroid filters ensure that only lamnings inside the actual box are returned
+    grid_cell_filter = Q()
+    for first_cell, last_cell in grid_cell_ranges_from_bbox(south, west, north, east, max_ranges=32):
+        grid_cell_filter |= Q(grid_cell__range=(first_cell, last_cell))
+
+    if half_open:
+        edge_filter = Q(center_lon__lt=east) & Q(center_lat__lt=north)
+    else:
+        edge_filter = Q(center_lon__lte=east) & Q(center_lat__lte=north)
+
+    return (
+        Lamning.objects.filter(hidden=False)
+        .filter(grid_cell_filter)
+        .filter(edge_filter & Q(center_lon__gte=west) & Q(center_lat__gte=south))
+    )
+
+
+def encoded_lamning_features(queryset) -> list:
+    """
+    Returns the pre-encoded GeoJSON features of the lamnings. Only the features are loaded, lamnings missing one
+    get it built with their users and tags loaded in bulk rather than per deferred field.
+    """
+    lamnings = list(queryset.only("id", "geojson_feature"))
+    missing = [lamning.id for lamning in lamnings if not lamning.geojson_feature]
+    built = dict()
+    if missing:
+        rebuilt = Lamning.objects.filter(id__in=missing).select_related("user").prefetch_related("tags")
+        built = {lamning.id: lamning.build_geojson_feature() for lamning in rebuilt}
+    return [lamning.geojson_feature or built[lamning.id] for lamning in lamnings]
+
+
+def cluster_lamnings_in_bbox(south, west, north, east, cell_size):
+    """Returns one GeoJSON point per occupied cell_size sized cell, with the number of lamnings in the cell."""
+    clusters = (
+        get_lamnings_in_bbox(south, west, north, east)
+        .annotate(cell_lat=Floor(F("center_lat") / cell_size), cell_lon=Floor(F("center_lon") / cell_size))
+        .values("cell_lat", "cell_lon")
+        .annotate(count=Count("id"), representative=Min("id"), lat=Avg("center_lat"), lon=Avg("center_lon"))
+        .order_by()  # the default ordering would otherwise be added to the GROUP BY
+    )
+
+    return [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(c["lon"], 8), round(c["lat"], 8)]},
+            "properties": {
+                "cluster": True,
+                "count": c["count"],
+                "lamning_id": h_encode(c["representative"]),
+            },
+        }
+        for c in clusters
+    ]
+
+
 def bbox(request):
     """Bounding box GeoJSON API"""
 
@@ -418,43 +553,100 @@ def bbox(request):
             status=400,
         )
 
-    # check if south, west, north, east are set #TODO we actually have this check below (MultiValueDictKeyError)
+    # check if south, west, north, east are set
     if not all(k in request.GET for k in ("south", "west", "north", "east")):
         return JsonApiResponse(
             {"error": "Minst en parameter saknas."},
             status=400,
         )
 
-    # TODO: can this be moved to after the queryset to save a check? or would the queryset be evaluated?
-    # block users from trying to export all of fornpunkt.se using the map API
     try:
-        if abs(float(request.GET["south"]) - float(request.GET["north"])) > 2:
+        south, west, north, east = (float(request.GET[k]) for k in ("south", "west", "north", "east"))
+    except ValueError:
+        return JsonApiResponse(
+            {"error": "Minst en parameter har ett felaktigt värde."},
+            status=400,
+        )
+
+    if not all(math.isfinite(v) for v in (south, west, north, east)):
+        return JsonApiResponse(
+            {"error": "Minst en parameter har ett felaktigt värde."},
+            status=400,
+        )
+
+    if "cluster" in request.GET:
+        try:
+            cell_size = float(request.GET["cluster"])
+        except ValueError:
+            return JsonApiResponse(
+                {"error": "Minst en parameter har ett felaktigt värde."},
+                status=400,
+            )
+
+        # clustered responses are bounded by the number of cells rather than the size of the box
+        if not MIN_CLUSTER_CELL_SIZE <= cell_size <= MAX_CLUSTER_CELL_SIZE or (
+            math.ceil(abs(north - south) / cell_size) * math.ceil(abs(east - west) / cell_size) > MAX_CLUSTER_CELLS
+        ):
             return JsonApiResponse(
                 {"error": "Felaktig förfrågan."},
                 status=400,
             )
-    except ValueError:
+
+        feature_collection = FeatureCollection(cluster_lamnings_in_bbox(south, west, north, east, cell_size))
+        return JsonApiResponse(feature_collection, content_type="application/geo+json")
+
+    # block users from trying to export all of fornpunkt.se using the map API
+    if abs(south - north) > 2:
         return JsonApiResponse(
-            {"error": "Minst en parameter har ett felaktigt värde."},
+            {"error": "Felaktig förfrågan."},
             status=400,
         )
 
-    try:
-        queryset = Lamning.objects.filter(hidden=False).filter(
-            Q(center_lon__lte=request.GET["east"])
-            & Q(center_lon__gte=request.GET["west"])
-            & Q(center_lat__gte=request.GET["south"])
-            & Q(center_lat__lte=request.GET["north"])
-        ).select_related("user").prefetch_related("tags")
-    except MultiValueDictKeyError:
-        return JsonApiResponse({"error": "Minst en parameter saknas."}, status=400)
-    except ValueError:
-        return JsonApiResponse({"error": "Minst en parameter har ett felaktigt värde."}, status=400)
+    feature_collection = feature_collection_from_fragments(
+        encoded_lamning_features(get_lamnings_in_bbox(south, west, north, east))
+    )
+
+    return EncodedJsonApiResponse(feature_collection, content_type="application/geo+json")
+
+
+def lamning_tile(request, z, x, y, tile_format):
+    """Vector tile API serving lamnings as Mapbox Vector Tiles or GeoJSON"""
+
+    if not request.META.get("HTTP_USER_AGENT"):
+        return JsonApiResponse(
+            {"error": "User-Agent saknas."},
+            status=400,
+        )
+
+    if not is_valid_tile(z, x, y):
+        return JsonApiResponse(
+            {"error": "Felaktig förfrågan."},
+            status=400,
+        )
+
+    west, south, east, north = tile_bounds(z, x, y)
+    headers = {**API_HEADERS, "Cache-Control": "public, max-age=300"}
+
+    if tile_format == "geojson":
+        # features are assigned to the tile holding their centroid and are returned unclipped
+        feature_collection = feature_collection_from_fragments(
+            encoded_lamning_features(get_lamnings_in_bbox(south, west, north, east, half_open=True))
+        )
+        return EncodedJsonApiResponse(feature_collection, content_type="application/geo+json", headers=headers)
 
-    lamnings_geojson = [lamning.verbose_geojson for lamning in queryset]
-    feature_collection = FeatureCollection(lamnings_geojson)
+    # include lamnings with a centroid in the neighbouring tiles as their geometries might overlap this tile
+    margin_lon, margin_lat = (east - west) / 2, (north - south) / 2
+    queryset = get_lamnings_in_bbox(south - margin_lat, west - margin_lon, north + margin_lat, east + margin_lon)
+    tile = encode_tile("lamnings", [json.loads(feature) for feature in encoded_lamning_features(queryset)], z, x, y)
 
-    return JsonApiResponse(feature_collection, content_type="application/geo+json")
+    return HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile", headers=headers)
+
+
+class Echo:
+    """A file-like object for csv.writer which returns the written row instead of storing it."""
+
+    def write(self, value):
+        return value
 
 
 def api_lamnings_export(request):
@@ -476,30 +668,22 @@ def api_lamnings_export(request):
         lamnings = Lamning.objects.filter(user=request.user)
 
     if requested_format == "tsv":
-        response = HttpResponse(content_type="text/tsv")
-        writer = csv.writer(response, delimiter="\t")
-        writer.writerow(["id", "titel", "beskrivning", "geojson", "taggar", "användare", "skapad", "ändrad"])
-        for lamning in lamnings:
-            writer.writerow(
-                [
-                    lamning.hashid,
-                    lamning.title,
-                    lamning.description,
-                    lamning.geojson,
-                    "|".join([tag.name for tag in lamning.tags.all()]),
-                    lamning.user,
-                    lamning.created_time,
-                    lamning.changed_time,
-                ]
-            )
-        return response
+        writer = csv.writer(Echo(), delimiter="\t")
+        rows = chain(
+            [writer.writerow(Lamning.TSV_HEADER)],
+            (writer.writerow(lamning.tsv_row) for lamning in Lamning.iterate_with_relations(lamnings)),
+        )
+        return StreamingHttpResponse(batch_strings(rows), content_type="text/tsv")
     elif requested_format == "geojson":
-        lamnings_geojson = [lamning.verbose_geojson for lamning in lamnings]
-        feature_collection = FeatureCollection(lamnings_geojson)
-        return JsonApiResponse(feature_collection, content_type="application/geo+json")
+        features = (lamning.encoded_geojson for lamning in Lamning.iterate_with_relations(lamnings))
+        return StreamingHttpResponse(
+            batch_strings(stream_feature_collection(features)), content_type="application/geo+json", headers=API_HEADERS
+        )
     else:
-        lamnings_jsonld = [lamning.json_ld for lamning in lamnings]
-        return JsonApiResponse(ld_wrap_graph(lamnings_jsonld), content_type="application/ld+json")
+        graph = (lamning.json_ld for lamning in Lamning.iterate_with_relations(lamnings))
+        return StreamingHttpResponse(
+            batch_strings(ld_stream_graph(graph)), content_type="application/ld+json", headers=API_HEADERS
+        )
 
 
 def api_tags_export(request):
@@ -520,6 +704,18 @@ def api_tags_export(request):
     return JsonApiResponse(ld_wrap_graph(graph), content_type="application/ld+json")
 
 
+def api_upstream_status(request):
+    """Circuit breaker state and request metrics of the upstream services, for admins."""
+    access_token = get_access_token_from_request(request)
+    if access_token:
+        request.user = access_token.user
+
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Du måste vara inloggad som admin för att se status för externa tjänster.")
+
+    return JsonApiResponse({**upstream.get_status(), "lantmateriet_tile_cache": tile_cache.get_counters()})
+
+
 def api_comments_export(request):
     """Method for exporting all comments to json-ld."""
     scope = request.GET.get("scope", None)
@@ -762,7 +958,7 @@ def api_lamning_create(request):
     return response
 
 
-class TagListView(generic.list.ListView):
+class TagListView(AnonymousPageCacheMixin, generic.list.ListView):
     """View for listing all tags."""
 
     model = CustomTag
@@ -787,6 +983,9 @@ class TagListView(generic.list.ListView):
         context["canonical"] = mark_safe(context["canonical"])
         return context
 
+    def get_page_tags(self, context):
+        return ["tags"]
+
     def get_queryset(self):
         allowed_filters = ["saknar_wikipedia", "saknar_beskrivning"]
 
@@ -801,7 +1000,7 @@ class TagListView(generic.list.ListView):
         return queryset
 
 
-class TagView(generic.DetailView, generic.list.MultipleObjectMixin):
+class TagView(AnonymousPageCacheMixin, generic.DetailView, generic.list.MultipleObjectMixin):
     """Tag view which also lists all sites for the tag."""
 
     template_name = "core/tags/tag.html"
@@ -821,6 +1020,10 @@ class TagView(generic.DetailView, generic.list.MultipleObjectMixin):
             context["canonical"] = f"/tagg/{self.object.slug}?sida={current_page}"
         return context
 
+    def get_page_tags(self, context):
+        users = {lamning.user_id for lamning in context["object_list"] if lamning.user_id}
+        return [f"tag:{self.object.slug}", *(f"user:{user_id}" for user_id in users)]
+
 
 class TagUpdateView(UserPassesTestMixin, generic.edit.UpdateView):
     """Update view for tags only accessible to "redigerare" which only can edit the description."""
@@ -843,10 +1046,38 @@ def tag_jsonld(request, slug):
     return JsonApiResponse(ld_wrap_graph(tag.json_ld), content_type="application/ld+json")
 
 
+def raa_lamning_annotations(record_id):
+    """Queries our comments, Wikipedia links and annotations of a KMR lamning, shared by its HTML and JSON-LD views."""
+    return {
+        "comments": list(
+            Comment.objects.filter(hidden=False, raa_lamning=record_id).select_related("user").order_by("created_time")
+        ),
+        "wikipedia_links": list(LamningWikipediaLink.objects.filter(kmr_lamning=record_id).order_by("pk")),
+        "annotations": list(Annotation.objects.filter(subject=record_id)),
+    }
+
+
+def fetch_raa_lamning_with_annotations(record_id):
+    """
+    Returns a KMR lamning together with our annotations of it.
+    Lamnings not mirrored locally are fetched from RAÄ in a thread of their own while the annotations are queried,
+    so the latency is the slowest of the two rather than their sum.
+    """
+    lamning = stored_raa_lamning(record_id)
+    if lamning is not None:
+        return lamning, raa_lamning_annotations(record_id)
+
+    # a thread per request, a shared pool would queue the fetches of concurrent requests behind each other
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="raa-lamning") as executor:
+        upstream_fetch = executor.submit(fetch_raa_lamning_from_upstream_for_view, record_id)
+        annotations = raa_lamning_annotations(record_id)
+        return upstream_fetch.result(), annotations
+
+
 def raa_lamning(request, record_id):
     """View for displaying a single lamning from KMR."""
     try:
-        lamning = fetch_raa_lamning_for_view(record_id)
+        lamning, annotations = fetch_raa_lamning_with_annotations(record_id)
     except Http404:
         response = HttpResponse()
         response.status_code = 404
@@ -858,15 +1089,18 @@ def raa_lamning(request, record_id):
         response.content = "Kunde inte hämta infromation ifrån Riksantikvarieämbetet."
         return response
 
+    return render_raa_lamning(request, lamning, annotations)
+
+
+def render_raa_lamning(request, lamning, annotations):
+    """Renders a KMR lamning together with our comments and annotations."""
     context = {**lamning}
-    context["comments"] = Comment.objects.filter(hidden=False).filter(raa_lamning=record_id).order_by("created_time")
-    wikipedia = LamningWikipediaLink.objects.filter(kmr_lamning=record_id).first()
-    annotations = Annotation.objects.filter(subject=record_id)
+    context["comments"] = annotations["comments"]
 
-    if annotations:
-        context["annotations"] = annotations
-    if wikipedia:
-        context["wikipedia"] = wikipedia.wikipedia
+    if annotations["annotations"]:
+        context["annotations"] = annotations["annotations"]
+    if annotations["wikipedia_links"]:
+        context["wikipedia"] = annotations["wikipedia_links"][0].wikipedia
 
     context["is_article"] = True
     return render(request, "core/raa_lamning.html", context)
@@ -874,30 +1108,47 @@ def raa_lamning(request, record_id):
 
 def raa_lamning_jsonld(request, record_id):
     """JSON-LD representation of a lamning from KMR(annotations only)"""
-    comments = Comment.objects.filter(hidden=False).filter(raa_lamning=record_id)
-    wikipedia_annotations = LamningWikipediaLink.objects.filter(kmr_lamning=record_id)
-    annotations = Annotation.objects.filter(subject=record_id)
+    annotations = raa_lamning_annotations(record_id)
 
     graph = list()
-    for comment in comments:
+    for comment in annotations["comments"]:
         graph.append(comment.json_ld)
 
-    for wikipedia_annotation in wikipedia_annotations:
+    for wikipedia_annotation in annotations["wikipedia_links"]:
         graph.append(wikipedia_annotation.json_ld)
 
-    for annotation in annotations:
+    for annotation in annotations["annotations"]:
         graph.append(annotation.json_ld)
 
     return JsonApiResponse(ld_wrap_graph(graph), content_type="application/ld+json")
 
 
+FEATURE_INFO_URL = "https://karta.raa.se/geo/arkreg_v1.0/wms"
+
+
+def feature_info_cache_key(params):
+    return "feature-info:" + hashlib.sha1(urlencode(params).encode("utf-8")).hexdigest()
+
+
 def get_feature_info(request):
-    """Proxy for getting feature info from the RAÄ."""
-    # TODO: errors and such
-    url = "https://karta.raa.se/geo/arkreg_v1.0/wms"
-    r = requests.get(url, params=dict(request.GET))
+    """Proxy for getting feature info from the RAÄ, responses are cached per clicked pixel."""
+    try:
+        params = normalize_feature_info_query(request.GET)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({"error": "Felaktig förfrågan."}, status=400)
+
+    def fetch():
+        r = upstream.get("raa_karta", FEATURE_INFO_URL, params=params)
+        r.raise_for_status()
+        return r.json()
+
+    try:
+        data = cached_upstream_call(feature_info_cache_key(params), fetch, ttl=settings.FEATURE_INFO_CACHE_TTL)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        sentry_sdk.capture_exception(e)
+        return JsonResponse({"error": "Kunde inte hämta information ifrån Riksantikvarieämbetet."}, status=504)
 
-    return JsonResponse(r.json(), safe=False)
+    return JsonResponse(data, safe=False)
 
 
 class CustomLoginView(LoginView):
@@ -976,7 +1227,7 @@ def activate_account(request, uidb64, token):
     return redirect("login")
 
 
-class ObservationTypesView(generic.TemplateView):
+class ObservationTypesView(AnonymousPageCacheMixin, generic.TemplateView):
     """Page for listing all observation types."""
 
     template_name = "core/observationstyper.html"
@@ -1000,60 +1251,174 @@ def observationtypes_jsonld(request):
     return JsonApiResponse(graph, content_type="application/ld+json")
 
 
-def l_number_redirection(request, l_number):
-    """View for redirecting L-numbers to the correct page."""
-    r = requests.post(
-        "https://app.raa.se/open/fornsok/proxy/api/lamning/search/lamning",
-        json={"criteria": {"lamningsnummer_eller_raa_nummer": [l_number]}},
-    )
+def upstream_timeout_response():
+    """Response used when RAÄ services time out or are unavailable."""
+    response = HttpResponse()
+    response.status_code = 504
+    response.content = "Kunde inte hämta infromation ifrån Riksantikvarieämbetet."
+    return response
 
-    response_data = r.json()
 
+def l_number_redirection(request, l_number):
+    """View for redirecting L-numbers to the correct page."""
     try:
-        if response_data["total_size"] != 1:
-            raise Http404
-        elif request.GET.get("target") == "kulturarvsdata":
-            # NOTE: this is used by external apps and or reconcilliation services
-            uuid = response_data["results"][0]["lamning_id"]
-            return redirect(f"https://kulturarvsdata.se/raa/lamning/{uuid}")
+        if L_NUMBER_REGEX.match(l_number):
+            uuid = cached_resolve_l_number(l_number)
         else:
-            uuid = response_data["results"][0]["lamning_id"]
-            return redirect(reverse(viewname="raa_lamning", kwargs={"record_id": uuid}))
-    except KeyError as e:
-        raise Http404 from e
+            # RAÄ-numbers are not unique so they are always searched for
+            uuid = resolve_raa_number(l_number)
+    except requests.exceptions.RequestException:
+        return upstream_timeout_response()
+
+    if not uuid:
+        raise Http404
+    elif request.GET.get("target") == "kulturarvsdata":
+        # NOTE: this is used by external apps and or reconcilliation services
+        return redirect(f"https://kulturarvsdata.se/raa/lamning/{uuid}")
+    else:
+        return redirect(reverse(viewname="raa_lamning", kwargs={"record_id": uuid}))
+
+
+def kmr_identifier_url(uuid, target=None):
+    """Returns the URL an identifier resolves to, at FornPunkt or kulturarvsdata.se."""
+    if target == "kulturarvsdata":
+        return f"https://kulturarvsdata.se/raa/lamning/{uuid}"
+    return "https://fornpunkt.se" + reverse(viewname="raa_lamning", kwargs={"record_id": uuid})
 
 
 def identification_resolver(request, identifier):
     """'View for resolving KMR identifiers to a specific record"""
-    l_number_regex = re.compile(r"^L\d{4}:\d+$")
-
     if is_raa_id(identifier):
         result = identifier
-    elif l_number_regex.match(identifier):
-        r = requests.post(
-            "https://app.raa.se/open/fornsok/proxy/api/lamning/search/lamning",
-            json={"criteria": {"lamningsnummer_eller_raa_nummer": [identifier]}},
-        )
-
-        response_data = r.json()
+    elif L_NUMBER_REGEX.match(identifier):
         try:
-            result = response_data["results"][0]["lamning_id"]
-        except (KeyError, IndexError) as e:
-            raise Http404 from e
+            result = cached_resolve_l_number(identifier)
+        except requests.exceptions.RequestException:
+            return upstream_timeout_response()
+        if not result:
+            raise Http404
     else:
         raise Http404
 
-    if request.GET.get("target") == "kulturarvsdata":
-        url = f"https://kulturarvsdata.se/raa/lamning/{result}"
-    else:
-        url = "https://fornpunkt.se" + reverse(viewname="raa_lamning", kwargs={"record_id": result})
+    return identification_resolver_response(request, result)
+
+
+def identification_resolver_response(request, uuid):
+    """Redirects to, or prints, the URL of a resolved identifier."""
+    url = kmr_identifier_url(uuid, request.GET.get("target"))
 
     if request.GET.get("plaintext"):
         return HttpResponse(url, content_type="text/plain")
     return redirect(url)
 
 
-class RaaTypeListView(generic.ListView):
+MAX_BATCH_RESOLVER_IDENTIFIERS = 1000
+# anonymous batches are kept small as each identifier might have to be looked up at RAÄ
+MAX_ANONYMOUS_BATCH_RESOLVER_IDENTIFIERS = 50
+BATCH_RESOLVER_WORKERS = 8
+
+
+def resolve_kmr_identifier(identifier):
+    """Resolves a UUID or L-number not known locally, returns a (status, uuid) tuple."""
+    try:
+        if is_possible_raa_id(identifier):
+            return ("found", identifier) if is_raa_id(identifier) else ("not_found", None)
+
+        uuid = coalesced_call(f"l-number:{identifier}", lambda: resolve_l_number(identifier))
+        return ("found", uuid) if uuid else ("not_found", None)
+    except (requests.exceptions.RequestException, ValueError):
+        return ("error", None)
+
+
+@csrf_exempt
+@require_POST
+def identification_resolver_batch(request):
+    """Resolves a JSON list or NDJSON stream of KMR identifiers to records."""
+    try:
+        if request.content_type == "application/x-ndjson":
+            identifiers = [json.loads(line) for line in request.body.decode("utf-8").splitlines() if line.strip()]
+        else:
+            identifiers = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest("Felaktig förfrågan.")
+
+    if not isinstance(identifiers, list) or not all(isinstance(identifier, str) for identifier in identifiers):
+        return HttpResponseBadRequest("Förfrågan måste vara en lista med identifierare.")
+    authenticated = request.user.is_authenticated or get_access_token_from_request(request)
+    max_identifiers = MAX_BATCH_RESOLVER_IDENTIFIERS if authenticated else MAX_ANONYMOUS_BATCH_RESOLVER_IDENTIFIERS
+    if len(identifiers) > max_identifiers:
+        return HttpResponseBadRequest(
+            f"Högst {max_identifiers} identifierare kan slås upp åt gången"
+            + ("." if authenticated else ", fler med en åtkomstnyckel.")
+        )
+
+    identifiers = list(dict.fromkeys(identifiers))
+    results = dict()
+    # identifiers to look up at RAÄ mapped to their normalized form
+    lookups = dict()
+
+    # UUIDs in the local index or mirror are resolved without contacting RAÄ,
+    # they are normalized first as uppercase, braced and unhyphenated UUIDs are accepted as well
+    index = kmr_index.get_index()
+    uuids = {identifier: str(UUID(identifier)) for identifier in identifiers if is_possible_raa_id(identifier)}
+    mirrored = set(
+        str(uuid) for uuid in KMRRecord.objects.filter(uuid__in=uuids.values()).values_list("uuid", flat=True)
+    )
+
+    resolutions = {
+        resolution.l_number: resolution
+        for resolution in LNumberResolution.objects.filter(
+            l_number__in=[identifier for identifier in identifiers if L_NUMBER_REGEX.match(identifier)]
+        )
+    }
+    not_found_since = timezone.now() - timedelta(seconds=settings.L_NUMBER_NOT_FOUND_TTL)
+
+    for identifier in identifiers:
+        if identifier in uuids:
+            uuid = uuids[identifier]
+            if uuid in mirrored or (index is not None and uuid in index):
+                results[identifier] = ("found", uuid)
+            else:
+                lookups[identifier] = uuid
+        elif L_NUMBER_REGEX.match(identifier):
+            resolution = resolutions.get(identifier)
+            if resolution and resolution.uuid:
+                results[identifier] = ("found", str(resolution.uuid))
+            elif resolution and resolution.resolved_time > not_found_since:
+                results[identifier] = ("not_found", None)
+            else:
+                lookups[identifier] = identifier
+        else:
+            results[identifier] = ("invalid", None)
+
+    if lookups:
+        unresolved = list(dict.fromkeys(lookups.values()))
+        with ThreadPoolExecutor(max_workers=BATCH_RESOLVER_WORKERS) as executor:
+            resolved = dict(zip(unresolved, executor.map(resolve_kmr_identifier, unresolved)))
+        results.update((identifier, resolved[lookup]) for identifier, lookup in lookups.items())
+
+        # resolutions are stored from this thread as the workers have their own database connections
+        store_l_number_resolutions(
+            {
+                identifier: resolved[identifier][1]
+                for identifier in unresolved
+                if L_NUMBER_REGEX.match(identifier) and resolved[identifier][0] != "error"
+            }
+        )
+
+    target = request.GET.get("target")
+    response = dict()
+    for identifier in identifiers:
+        status, uuid = results[identifier]
+        response[identifier] = {"status": status}
+        if uuid:
+            response[identifier]["uuid"] = uuid
+            response[identifier]["url"] = kmr_identifier_url(uuid, target)
+
+    return JsonApiResponse(response)
+
+
+class RaaTypeListView(AnonymousPageCacheMixin, generic.ListView):
     """List of RAA record types."""
 
     model = KMRLamningType
@@ -1069,6 +1434,58 @@ class RaaTypeListView(generic.ListView):
 
         return context
 
+    def get_page_tags(self, context):
+        return ["raa-types"]
+
+
+def raa_type_page(request):
+    """Returns the requested page of a KMR lamning type listing."""
+    try:
+        page = int(request.GET.get("sida", 1))
+    except ValueError as e:
+        raise Http404 from e
+    if page < 1:
+        raise Http404
+    return page
+
+
+def raa_type_page_exists(lamning_type, page):
+    """Pages past the last known page are not passed on to SOCH."""
+    return lamning_type.total_hits is None or page <= lamning_type.total_hits // SOCH_PAGE_SIZE + 1
+
+
+def update_raa_type_total_hits(lamning_type, total_size):
+    if total_size != lamning_type.total_hits:
+        KMRLamningType.objects.filter(pk=lamning_type.pk).update(total_hits=total_size)
+
+
+def raa_type_context(lamning_type, page, total_size):
+    """Returns the description and pagination context of a KMR lamning type listing."""
+    context = dict()
+    context["description"] = create_meta_description(lamning_type.description)
+    context["title"] = lamning_type.name
+
+    total_number_of_pages = total_size // SOCH_PAGE_SIZE + 1
+    current_page = page
+    context["paginator"] = {}
+    context["page_obj"] = {}
+    context["page_obj"]["paginator"] = {}
+    context["page_obj"]["paginator"]["num_pages"] = total_number_of_pages
+    context["page_obj"]["number"] = current_page
+    context["paginator"]["count"] = total_number_of_pages
+    if current_page > 1:
+        context["canonical"] = f"/raa/typer/{lamning_type.slug}?sida={current_page}"
+        context["page_obj"]["previous_page_number"] = current_page - 1
+        context["page_obj"]["has_previous"] = True
+    else:
+        context["page_obj"]["previous_page_number"] = None
+        context["page_obj"]["has_previous"] = False
+
+    if current_page < total_number_of_pages:
+        context["page_obj"]["next_page_number"] = current_page + 1
+        context["page_obj"]["has_next"] = True
+    return context
+
 
 class RaaTypeView(generic.DetailView):
     """List of RAA records of a specific type."""
@@ -1077,39 +1494,33 @@ class RaaTypeView(generic.DetailView):
     template_name = "core/raa_type.html"
     page = 1
 
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except UpstreamTimeoutExeption:
+            return upstream_timeout_response()
+
     def get_context_data(self, **kwargs):
-        # TODO catch upstream errors
-        object_list = get_soch_search_result(
-            f'itemClassName="{self.object.name}" AND serviceName="kmr_lamningar"', offset=(self.page - 1) * 100
-        )
-        total_size = object_list["total"]
-        context = super(RaaTypeView, self).get_context_data(object_list=object_list["results"], **kwargs)
-        context["description"] = create_meta_description(self.object.description)
-        context["title"] = self.object.name
+        if not raa_type_page_exists(self.object, self.page):
+            raise Http404
 
-        total_number_of_pages = total_size // 100 + 1
-        current_page = self.page
-        context["paginator"] = {}
-        context["page_obj"] = {}
-        context["page_obj"]["paginator"] = {}
-        context["page_obj"]["paginator"]["num_pages"] = total_number_of_pages
-        context["page_obj"]["number"] = current_page
-        context["paginator"]["count"] = total_number_of_pages
-        if current_page > 1:
-            context["canonical"] = f"/raa/typer/{self.object.slug}?sida={current_page}"
-            context["page_obj"]["previous_page_number"] = current_page - 1
-            context["page_obj"]["has_previous"] = True
-        else:
-            context["page_obj"]["previous_page_number"] = None
-            context["page_obj"]["has_previous"] = False
+        try:
+            object_list = cached_soch_type_page(self.object.raa_id, self.object.name, self.page)
+        except Exception as e:
+            raise UpstreamTimeoutExeption() from e
+
+        update_raa_type_total_hits(self.object, object_list["total"])
 
-        if current_page < total_number_of_pages:
-            context["page_obj"]["next_page_number"] = current_page + 1
-            context["page_obj"]["has_next"] = True
+        context = super(RaaTypeView, self).get_context_data(object_list=object_list["results"], **kwargs)
+        context.update(raa_type_context(self.object, self.page, object_list["total"]))
+
+        if context["page_obj"].get("has_next"):
+            # crawlers and visitors tend to continue to the next page
+            prefetch_soch_type_page(self.object.raa_id, self.object.name, self.page + 1)
         return context
 
     def get_queryset(self):
-        self.page = int(self.request.GET.get("sida", 1))
+        self.page = raa_type_page(self.request)
 
         return super(RaaTypeView, self).get_queryset()
 
@@ -1138,14 +1549,195 @@ def report_client_error_to_sentry(request):
     return HttpResponse(status=201)
 
 
-def dataset_rdf_proxy(request):
-    """Proxies Turtle RDF for our DCAT/VoID definations."""
-    r = requests.get("https://fornpunkt.se/data/data.ttl")
-    return HttpResponse(r.text, content_type="text/turtle")
+def build_dataset_description():
+    """Renders the DCAT/VoID description of our datasets from the current statistics."""
+    epoch = timezone.make_aware(datetime(1970, 1, 1))
+    lamnings = Lamning.objects.filter(hidden=False).aggregate(count=Count("id"), modified=Max("changed_time"))
+    comments = Comment.objects.filter(hidden=False).aggregate(count=Count("id"), modified=Max("created_time"))
+    annotations = Annotation.objects.aggregate(count=Count("id"), modified=Max("changed_time"))
+    wikipedia_links = LamningWikipediaLink.objects.aggregate(count=Count("id"), modified=Max("created_time"))
+    tags = CustomTag.objects.aggregate(count=Count("id"), modified=Max("changed_time"))
+
+    context = {
+        "lamnings": lamnings["count"],
+        "lamnings_modified": lamnings["modified"] or epoch,
+        "comments": comments["count"],
+        "comments_modified": comments["modified"] or epoch,
+        "annotations": annotations["count"] + wikipedia_links["count"],
+        "annotations_modified": max(annotations["modified"] or epoch, wikipedia_links["modified"] or epoch),
+        "tags": tags["count"],
+        "tags_modified": tags["modified"] or epoch,
+        "license": DATASET_LICENSE,
+        "contact": DATASET_CONTACT,
+    }
+    context["entities"] = context["lamnings"] + context["comments"] + context["annotations"] + context["tags"]
+    context["modified"] = max(
+        context["lamnings_modified"],
+        context["comments_modified"],
+        context["annotations_modified"],
+        context["tags_modified"],
+    )
+
+    body = render_to_string("core/datasets.ttl", context)
+    return {
+        "body": body,
+        "etag": '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"',
+        "last_modified": context["modified"].timestamp(),
+    }
+
+
+def dataset_description(request):
+    """
+    Turtle RDF for our DCAT/VoID definations, cached until the data changes.
+    Only a cache shared by all workers is used, the signals invalidating it only reach the process making a change.
+    """
+    shared = cache_is_shared()
+    description = cache.get(DATASET_DESCRIPTION_CACHE_KEY) if shared else None
+    if description is None:
+        description = build_dataset_description()
+        if shared:
+            cache.set(DATASET_DESCRIPTION_CACHE_KEY, description, timeout=60 * 60 * 24)
+
+    response = get_conditional_response(
+        request, etag=description["etag"], last_modified=int(description["last_modified"])
+    )
+    if response is None:
+        response = HttpResponse(description["body"], content_type="text/turtle; charset=utf-8")
+
+    response["ETag"] = description["etag"]
+    response["Last-Modified"] = http_date(description["last_modified"])
+    return response
+
+
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cached_sitemap(request, section):
+    """
+    A sitemap section, cached until the cache version of the section changes.
+    Sections without a cache version (static pages and flatpages) are cheap and rendered on every request, as are
+    sections whose cache version is None.
+    """
+    if section not in sitemaps:
+        raise Http404(f"No sitemap available for section: {section}")
+
+    site = sitemaps[section]()
+    version = site.cache_version() if hasattr(site, "cache_version") else None
+    if version is None:
+        return sitemap(request, sitemaps, section=section)
+
+    key = f"sitemap:{request.scheme}:{section}:{request.GET.get('p', 1)}:{version}"
+    cached = cache.get(key)
+    if cached is None:
+        response = sitemap(request, sitemaps, section=section)
+        response.render()
+        if response.status_code != 200:
+            return response
+        cached = {"content": response.content, "headers": dict(response.items())}
+        cache.set(key, cached, timeout=SITEMAP_CACHE_TIMEOUT)
+
+    response = HttpResponse(cached["content"])
+    for header, value in cached["headers"].items():
+        response[header] = value
+    return response
+
+
+def sitemap_index(request):
+    """Index of our sitemap sections and the KMR sitemap shards built by the build-kmr-sitemaps command."""
+    response = django_sitemap_index(request, sitemaps)
+    domain = f"{request.scheme}://{get_current_site(request).domain}"
+
+    shard_lastmods = list()
+    for name, shard in kmr_sitemaps.read_manifest().items():
+        lastmod = datetime.fromisoformat(shard["lastmod"])
+        location = domain + reverse("kmr_sitemap", kwargs={"name": name})
+        response.context_data["sitemaps"].append(SitemapIndexItem(location, lastmod))
+        shard_lastmods.append(lastmod)
+
+    # the Last-Modified header is only set by the index view if all sections have a lastmod
+    if "Last-Modified" in response and shard_lastmods:
+        response["Last-Modified"] = http_date(
+            max(parse_http_date(response["Last-Modified"]), *(int(lastmod.timestamp()) for lastmod in shard_lastmods))
+        )
+    return response
+
+
+def kmr_sitemap(request, name):
+    """Serves a gzipped KMR sitemap shard."""
+    if not kmr_sitemaps.SHARD_NAME_REGEX.match(name):
+        raise Http404
+    try:
+        return FileResponse(open(kmr_sitemaps.shard_path(name), "rb"), content_type="application/gzip")
+    except FileNotFoundError as e:
+        raise Http404 from e
+
+
+def cached_tile_response(tile, body, cache_status):
+    """Streams a tile from the Lantmäteriet tile cache, body is its file opened by tile_cache.open_body()."""
+    response = FileResponse(body, content_type=tile["content_type"])
+    for header, value in tile["headers"].items():
+        response[header] = value
+    response["X-Cache"] = cache_status
+    return response
+
+
+def cached_tile(key):
+    """
+    Returns a cached tile and its opened body, or (None, None) if it is not cached. The body is opened up front so
+    that the tile can be served even if another worker evicts it while Lantmäteriet is being asked about it.
+    """
+    tile = tile_cache.get(key)
+    body = tile_cache.open_body(tile) if tile else None
+    return (tile, body) if body else (None, None)
+
+
+def tile_upstream_error_response():
+    return HttpResponse(status=504, content="Kunde inte hämta data från Lantmäteriet.")
+
+
+def lantmateriet_request_headers(tile):
+    """Returns the headers of a Lantmäteriet request, conditional if a cached tile is being revalidated."""
+    headers = {
+        "Authorization": "Basic " + base64.b64encode(f"{settings.LANTMATERIET_USERNAME}:{settings.LANTMATERIET_PASSWORD}".encode()).decode(),
+    }
+    if tile:
+        if "ETag" in tile["headers"]:
+            headers["If-None-Match"] = tile["headers"]["ETag"]
+        if "Last-Modified" in tile["headers"]:
+            headers["If-Modified-Since"] = tile["headers"]["Last-Modified"]
+    return headers
+
+
+def revalidated_tile_response(key, tile, body, response_headers):
+    """Extends the life of a cached tile after a 304 from Lantmäteriet."""
+    tile["expires"] = tile_cache.expiry_from_headers(response_headers) or 0
+    tile["headers"].update({h: response_headers[h] for h in tile_cache.PASSTHROUGH_HEADERS if h in response_headers})
+    tile_cache.update(key, tile)
+    tile_cache.count("revalidations")
+    return cached_tile_response(tile, body, "REVALIDATED")
+
+
+def fetched_tile_response(key, response_headers, chunks):
+    """Stores a tile fetched from Lantmäteriet if its caching headers allow it and returns it."""
+    tile_cache.count("misses")
+    expires = tile_cache.expiry_from_headers(response_headers)
+    if expires is not None:
+        tile = tile_cache.store(key, chunks, response_headers, expires)
+        return cached_tile_response(tile, open(tile["path"], "rb"), "MISS")
+
+    # responses that may not be stored are streamed straight through
+    response = StreamingHttpResponse(chunks, content_type=response_headers.get("Content-Type", "application/octet-stream"))
+    for header in tile_cache.PASSTHROUGH_HEADERS:
+        if header in response_headers:
+            response[header] = response_headers[header]
+    response["X-Cache"] = "MISS"
+    return response
+
 
 def lantmateriet_proxy(request, route):
     """
     Proxies WMS/MWTS requests to Lantmäteriet while adding Basic Auth headers.
+    Tiles are cached on disk and revalidated according to the upstream caching headers.
     This can be used with multiple layers:
     /<view>/<lm-path>
     """
@@ -1153,28 +1745,41 @@ def lantmateriet_proxy(request, route):
     remote_path = route.strip("/")
     url = f"https://maps.lantmateriet.se/{remote_path}"
 
-    headers = {
-        "Authorization": "Basic " + base64.b64encode(f"{settings.LANTMATERIET_USERNAME}:{settings.LANTMATERIET_PASSWORD}".encode()).decode(),
-    }
+    key = tile_cache.cache_key(remote_path, request.GET)
+    tile, body = cached_tile(key)
+    if tile and tile["fresh"]:
+        tile_cache.count("hits")
+        return cached_tile_response(tile, body, "HIT")
+
+    headers = lantmateriet_request_headers(tile)
 
+    r = None
     try:
-        r = requests.get(url, headers=headers, params=request.GET, timeout=10)
-        print(f"Requesting Lantmäteriet WMS/MWTS: {url} with params: {request.GET}")
-        r.raise_for_status()
-        response = HttpResponse(r.content, content_type=r.headers.get("Content-Type", "application/octet-stream"))
+        r = upstream.get("lantmateriet", url, headers=headers, params=request.GET, stream=True)
 
-        headers_to_copy = [
-            'Content-Length', 'Content-Encoding', 'Cache-Control',
-            'Expires', 'Last-Modified', 'ETag', 'Access-Control-Allow-Origin'
-        ]
+        if r.status_code == 304 and tile:
+            r.close()
+            return revalidated_tile_response(key, tile, body, r.headers)
 
-        for header in headers_to_copy:
-            if header in r.headers:
-                response[header] = r.headers[header]
+        r.raise_for_status()
+    except requests.RequestException as e:
+        if r is not None:
+            # returns the streamed connection to the pool
+            r.close()
+        if tile:
+            tile_cache.count("stale")
+            return cached_tile_response(tile, body, "STALE")
 
-        return response
+        sentry_sdk.capture_exception(e)
+        return tile_upstream_error_response()
 
+    if body:
+        body.close()
+
+    try:
+        return fetched_tile_response(key, r.headers, r.iter_content(chunk_size=64 * 1024))
     except requests.RequestException as e:
+        # the tile could not be read from Lantmäteriet
+        r.close()
         sentry_sdk.capture_exception(e)
-        return HttpResponse(status=504, content="Kunde inte hämta data från Lantmäteriet.")
-
+        return tile_upstream_error_response()
@@ -129,6 +129,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'fornfind.wsgi.application'
+ASGI_APPLICATION = 'fornfind.asgi.application'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -173,6 +174,74 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'dashboard'
 LOGIN_URL = '/auth/login/'
 
+# a cache shared by all workers should be used in production, pages, sitemaps and the dataset description are only
+# cached and upstream requests are only coalesced between workers with a shared cache. Redis is preferred as writes
+# take constant time and add() is atomic, Redis evicts entries itself once its maxmemory is reached.
+# The other backends remove 1/CULL_FREQUENCY of their entries once MAX_ENTRIES is reached, Django keeps 300 entries
+# by default which would be far too few for the RAÄ records, pages, feeds and sitemaps. The file based cache lists
+# its directory to count its entries on every write, so it is kept small.
+CACHE_CULL_FREQUENCY = int(os.environ.get('FP_CACHE_CULL_FREQUENCY', 10))
+if os.environ.get('FP_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['FP_REDIS_URL'],
+        }
+    }
+elif os.environ.get('FP_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['FP_CACHE_DIR'],
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('FP_CACHE_MAX_ENTRIES', 10000)),
+                'CULL_FREQUENCY': CACHE_CULL_FREQUENCY,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.environ.get('FP_CACHE_MAX_ENTRIES', 200000)),
+                'CULL_FREQUENCY': CACHE_CULL_FREQUENCY,
+            },
+        }
+    }
+
+# cache lifetimes of records fetched from RAÄ, in seconds
+RAA_LAMNING_CACHE_TTL = int(os.environ.get('RAA_LAMNING_CACHE_TTL', 60 * 60 * 24))
+RAA_LAMNING_CACHE_STALE_TTL = int(os.environ.get('RAA_LAMNING_CACHE_STALE_TTL', 60 * 60 * 24 * 7))
+RAA_LAMNING_NOT_FOUND_CACHE_TTL = int(os.environ.get('RAA_LAMNING_NOT_FOUND_CACHE_TTL', 60 * 60))
+
+# cache lifetimes of KMR lamning type listings fetched from K-samsök, in seconds
+SOCH_PAGE_CACHE_TTL = int(os.environ.get('SOCH_PAGE_CACHE_TTL', 60 * 60 * 24))
+SOCH_PAGE_CACHE_STALE_TTL = int(os.environ.get('SOCH_PAGE_CACHE_STALE_TTL', 60 * 60 * 24 * 7))
+
+# seconds a KMR map click (WMS GetFeatureInfo) response is cached
+FEATURE_INFO_CACHE_TTL = int(os.environ.get('FEATURE_INFO_CACHE_TTL', 60 * 60))
+
+# seconds a L-number without a matching KMR lamning is remembered, resolved L-numbers are kept indefinitely
+L_NUMBER_NOT_FOUND_TTL = int(os.environ.get('L_NUMBER_NOT_FOUND_TTL', 60 * 60 * 24))
+
+# disk cache of tiles proxied from Lantmäteriet, the size is in bytes and the TTL is used when Lantmäteriet sets no caching headers
+LANTMATERIET_TILE_CACHE_DIR = os.environ.get('LANTMATERIET_TILE_CACHE_DIR', os.path.join(BASE_DIR, 'lm-tile-cache'))
+LANTMATERIET_TILE_CACHE_MAX_SIZE = int(os.environ.get('LANTMATERIET_TILE_CACHE_MAX_SIZE', 1024 ** 3))
+LANTMATERIET_TILE_CACHE_DEFAULT_TTL = int(os.environ.get('LANTMATERIET_TILE_CACHE_DEFAULT_TTL', 60 * 60 * 24))
+
+# seconds a page rendered for anonymous visitors is cached, pages are purged earlier when the data they show changes
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60 * 60 * 24))
+
+# serve the upstream-bound views from core.async_views, only useful when deployed with fornfind/asgi.py
+ASYNC_UPSTREAM_VIEWS = 'ASYNC_UPSTREAM_VIEWS' in os.environ and os.environ['ASYNC_UPSTREAM_VIEWS'].lower() == 'true'
+
+# gzipped sitemaps of KMR lamnings, built by the build-kmr-sitemaps command
+KMR_XML_SITEMAPS_DIR = os.environ.get('KMR_XML_SITEMAPS_DIR', os.path.join(BASE_DIR, 'kmr-xml-sitemaps'))
+
+# sorted binary index of known KMR UUIDs, built by the build-kmr-index command
+KMR_INDEX_PATH = os.environ.get('KMR_INDEX_PATH', os.path.join(BASE_DIR, 'kmr-index.bin'))
+
 SECURE_REFERRER_POLICY = 'origin' # for OSM https://wiki.openstreetmap.org/wiki/Blocked_tiles#If_you_are_the_owner/a_developer_of_the_application/website
 
 if 'FP_ENVIRONMENT' in os.environ and os.environ['FP_ENVIRONMENT'] == 'production':